@@ -4,6 +4,8 @@ import numpy as np
 
 class Connection:
 
+    __slots__ = ('origin_node_ID', 'target_node_ID', 'recurrent', 'weight', 'enabled', 'innovation_number')
+
     def __init__(self, weight: float, origin_node_ID: int, target_node_ID: int, innovation_number: int, recurrent: bool = False):
 
         self.origin_node_ID     = origin_node_ID        # ID of origin node
@@ -13,6 +15,20 @@ class Connection:
         self.enabled            = True                  # Is it enabled?
         self.innovation_number  = innovation_number     # Innovation number of connection
 
+    # Copy only the gene fields
+    def clone(self):
+        connection = Connection(self.weight, self.origin_node_ID, self.target_node_ID, self.innovation_number, self.recurrent)
+        connection.enabled = self.enabled
+        return connection
+
+    # Pickle the gene fields
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    # Unpickle (older pickles are plain attribute dicts with the same fields)
+    def __setstate__(self, state):
+        for name in self.__slots__:
+            setattr(self, name, state[name])
 
     # Mutate this connection, called from Genome
     def mutate(self):
@@ -0,0 +1,274 @@
+from concurrent.futures import Future, wait
+from multiprocessing.connection import Listener, Client
+import multiprocessing
+import threading
+import queue
+import time
+import sys
+import os
+
+class Distributed_Evaluator:
+
+    def __init__(self, episode_function: callable, address = ('localhost', 0), authkey: bytes = None, heartbeat_interval: float = 1.0, heartbeat_timeout: float = 10.0, task_timeout: float = None, step_timeout: float = 0.02, default_task_timeout: float = 600.0, max_retries: int = 3, failed_fitness: float = 0, connect_timeout: float = 60.0):
+
+        self.episode_function       = episode_function              # Episode function (CALLABLE with input of a compiled network and the generation number, PICKLABLE)
+        self.address                = address                       # TCP (host, port) tuple or Unix socket path to listen on. Port 0 picks a free port
+        self.authkey                = authkey or os.urandom(16)     # Key workers need to connect
+        self.heartbeat_interval     = heartbeat_interval            # Seconds between heartbeats of a busy worker
+        self.heartbeat_timeout      = heartbeat_timeout             # Worker is considered dead without any message for this long
+        self.task_timeout           = task_timeout                  # Max seconds per episode (None = derived, see timeout_of). Slower workers are dropped and the task re-queued
+        self.step_timeout           = step_timeout                  # Derived task timeout: seconds allowed per timestep of episodes that have max_steps
+        self.default_task_timeout   = default_task_timeout          # Derived task timeout of episodes without max_steps
+        self.max_retries            = max_retries                   # Max times a task is re-queued before it is given up
+        self.failed_fitness         = failed_fitness                # Fitness of a genome whose task was given up, or whose episode raised an error
+        self.connect_timeout        = connect_timeout               # evaluate raises if no worker is connected for this long (None = wait forever)
+        self.tasks                  = {}                            # Pending tasks by task ID: [network, generation number, future, attempts]
+        self.task_queue             = queue.Queue()                 # IDs of tasks waiting for a worker
+        self.next_task_id           = 0                             # ID of next task
+        self.lock                   = threading.Lock()              # Lock for the task bookkeeping
+        self.listener               = None                          # Listener for worker connections (started on first use)
+        self.running                = False                         # Accepting workers?
+        self.workers                = 0                             # Number of connected workers
+        self.workers_lock           = threading.Lock()              # Lock for the worker count (changed by the handler threads)
+
+    # Start listening for workers
+    def start(self):
+        if self.listener == None:
+            self.listener = Listener(self.address, authkey = self.authkey)
+            self.address = self.listener.address
+            self.running = True
+            threading.Thread(target = self.accept_workers, daemon = True).start()
+
+    # Accept worker connections, each one gets its own handler thread
+    def accept_workers(self):
+        while self.running:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                continue
+            threading.Thread(target = self.handle_worker, args = (connection,), daemon = True).start()
+
+    # Serve tasks to one worker until it dies, hangs or we shut down
+    def handle_worker(self, connection):
+
+        # Handshake: tell the worker what to run and how often to report
+        try:
+            connection.send(("setup", self.episode_function, self.heartbeat_interval, self.failed_fitness))
+        except (OSError, EOFError):
+            connection.close()
+            return
+        with self.workers_lock:
+            self.workers += 1
+
+        try:
+            while self.running:
+
+                # Wait for work
+                try:
+                    task_id = self.task_queue.get(timeout = self.heartbeat_interval)
+                except queue.Empty:
+                    continue
+                with self.lock:
+                    task = self.tasks.get(task_id)
+                if task == None:
+                    continue
+
+                # Mark as running on first send (from then on it can't be cancelled), skip tasks that were cancelled while queued
+                if not task[2].running() and not task[2].set_running_or_notify_cancel():
+                    with self.lock:
+                        self.tasks.pop(task_id, None)
+                    continue
+
+                # Send it, then wait for the result while watching heartbeats and the task timeout
+                try:
+                    connection.send(("task", task_id, task[0], task[1]))
+                    if not self.wait_for_result(connection, task_id, self.timeout_of(task[1])):
+                        self.requeue(task_id)
+                        return
+                except (OSError, EOFError):
+                    self.requeue(task_id)
+                    return
+        finally:
+            with self.workers_lock:
+                self.workers -= 1
+            try:
+                connection.send(("stop",))
+            except (OSError, EOFError):
+                pass
+            connection.close()
+
+    # Max seconds for one episode. A hung worker keeps sending heartbeats, so only this reclaims its task. Unless given, it is
+    # derived from the episode length: step_timeout per timestep plus the heartbeat timeout (default_task_timeout for episode
+    # functions without max_steps)
+    def timeout_of(self, generation_number: int) -> float:
+        if self.task_timeout != None:
+            return self.task_timeout
+        if hasattr(self.episode_function, "max_steps"):
+            return self.episode_function.max_steps(generation_number) * self.step_timeout + self.heartbeat_timeout
+        return self.default_task_timeout
+
+    # Wait for the result of a task. Returns False if the worker died or took longer than the timeout
+    def wait_for_result(self, connection, task_id: int, timeout: float) -> bool:
+
+        started = last_seen = time.monotonic()
+        while True:
+
+            # Handle any message from the worker
+            if connection.poll(self.heartbeat_interval):
+                message = connection.recv()
+                last_seen = time.monotonic()
+                if message[0] == "result" and message[1] == task_id:
+                    self.finish(task_id, message[2])
+                    return True
+
+            # Dead (no heartbeats) or hung (task timeout)
+            now = time.monotonic()
+            if now - last_seen > self.heartbeat_timeout:
+                return False
+            if now - started > timeout:
+                return False
+
+    # Store the result of a task
+    def finish(self, task_id: int, result):
+        with self.lock:
+            task = self.tasks.pop(task_id, None)
+        if task != None:
+            task[2].set_result(result)
+
+    # Put a task back in the queue, or give up on it after too many attempts
+    def requeue(self, task_id: int):
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task == None:
+                return
+            task[3] += 1
+            give_up = task[3] > self.max_retries
+            if give_up:
+                del self.tasks[task_id]
+        if give_up:
+            task[2].set_result((self.failed_fitness, {"failed": True}))
+        else:
+            self.task_queue.put(task_id)
+
+    # Submit a single episode. Returns a future of (fitness, episode stats)
+    def submit(self, network, generation_number: int):
+        self.start()
+        future = Future()
+        with self.lock:
+            task_id = self.next_task_id
+            self.next_task_id += 1
+            self.tasks[task_id] = [network, generation_number, future, 0]
+        self.task_queue.put(task_id)
+        return future
+
+    # Evaluate all networks on the connected workers. Returns a list of (fitness, episode stats), in order. Raises TimeoutError
+    # (and cancels the tasks that did not start) if no worker is connected for connect_timeout seconds
+    def evaluate(self, networks: list, generation_number: int):
+
+        futures = [self.submit(network, generation_number) for network in networks]
+
+        idle_since = None
+        while True:
+            _, not_done = wait(futures, timeout = self.heartbeat_interval)
+            if not not_done:
+                return [future.result() for future in futures]
+
+            # Nobody to run the tasks
+            if self.workers > 0 or self.connect_timeout == None:
+                idle_since = None
+            elif idle_since == None:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > self.connect_timeout:
+                for future in not_done:
+                    future.cancel()
+                raise TimeoutError("No worker connected to %s for %g seconds" % (self.address, self.connect_timeout))
+
+    # Stop serving workers
+    def shutdown(self):
+        self.running = False
+        if self.listener != None:
+            self.listener.close()
+            self.listener = None
+
+# Worker: connect to an evaluator and run episodes until told to stop
+def run_worker(address, authkey: bytes):
+
+    connection = Client(address, authkey = authkey)
+    send_lock = threading.Lock()
+
+    # Handshake
+    _, episode_function, heartbeat_interval, failed_fitness = connection.recv()
+
+    # Send heartbeats while busy. If the evaluator is gone (e.g. it dropped us for being too slow), exit right away
+    busy = threading.Event()
+    def heartbeat():
+        while True:
+            time.sleep(heartbeat_interval)
+            if busy.is_set():
+                try:
+                    with send_lock:
+                        connection.send(("heartbeat",))
+                except (OSError, EOFError):
+                    os._exit(1)
+    threading.Thread(target = heartbeat, daemon = True).start()
+
+    # Run tasks
+    while True:
+        try:
+            message = connection.recv()
+        except (OSError, EOFError):
+            return
+        if message[0] == "stop":
+            return
+        _, task_id, network, generation_number = message
+        # An episode that raises fails its genome, not the worker (a worker dying on it would only be restarted to die again)
+        busy.set()
+        try:
+            result = episode_function(network, generation_number)
+        except Exception as e:
+            result = (failed_fitness, {"failed": True, "error": repr(e)})
+        busy.clear()
+        with send_lock:
+            connection.send(("result", task_id, result))
+
+class Local_Cluster:
+
+    def __init__(self, evaluator: Distributed_Evaluator, workers: int = None):
+
+        self.evaluator              = evaluator                     # Evaluator to connect to
+        self.n_workers              = workers or os.cpu_count()     # Number of worker processes
+        self.processes              = []                            # Worker processes
+        self.running                = False                         # Keep workers alive?
+
+    # Start workers (and the evaluator, to know its address), and restart any that die
+    def start(self):
+        self.evaluator.start()
+        self.running = True
+        self.processes = [self.spawn() for _ in range(self.n_workers)]
+        threading.Thread(target = self.supervise, daemon = True).start()
+        return self
+
+    # Start one worker process
+    def spawn(self):
+        process = multiprocessing.Process(target = run_worker, args = (self.evaluator.address, self.evaluator.authkey), daemon = True)
+        process.start()
+        return process
+
+    # Replace crashed workers
+    def supervise(self):
+        while self.running:
+            for i, process in enumerate(self.processes):
+                if not process.is_alive() and self.running:
+                    self.processes[i] = self.spawn()
+            time.sleep(0.5)
+
+    # Stop all workers
+    def stop(self):
+        self.running = False
+        for process in self.processes:
+            process.terminate()
+            process.join()
+
+# Run a worker from the command line: python -m NEAT.Distributed_Evaluator <host> <port> <authkey hex>
+if __name__ == "__main__":
+    run_worker((sys.argv[1], int(sys.argv[2])), bytes.fromhex(sys.argv[3]))
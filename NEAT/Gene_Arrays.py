@@ -0,0 +1,76 @@
+from .config import SPECIES_CONFIG
+import numpy as np
+
+class Gene_Arrays:
+
+    def __init__(self, connections: list):
+
+        # NOTE: connections must be sorted by innovation number. Index i in every array belongs to connections[i]
+        n = len(connections)
+
+        self.innovation_numbers     = np.fromiter((c.innovation_number for c in connections), dtype=np.int64, count=n)  # Innovation numbers (sorted)
+        self.origins                = np.fromiter((c.origin_node_ID for c in connections), dtype=np.int64, count=n)     # Origin node IDs
+        self.targets                = np.fromiter((c.target_node_ID for c in connections), dtype=np.int64, count=n)     # Target node IDs
+        self.weights                = np.fromiter((c.weight for c in connections), dtype=float, count=n)                # Connection weights
+        self.enabled                = np.fromiter((c.enabled for c in connections), dtype=bool, count=n)                # Enabled flags
+
+    # Number of connection genes
+    def __len__(self):
+        return len(self.innovation_numbers)
+
+    # Last innovation number (-1 when there are no genes)
+    def last_innovation(self):
+        return self.innovation_numbers[-1] if len(self.innovation_numbers) else -1
+
+    # Compatibility distance to another set of genes (matching, disjoint and excess genes, and mean weight difference)
+    def compatibility(self, other) -> float:
+
+        # Number of connections of both genomes
+        n_1 = len(self)
+        n_2 = len(other)
+
+        # Matching genes and their summed weight difference
+        _, match_1, match_2 = np.intersect1d(self.innovation_numbers, other.innovation_numbers, assume_unique=True, return_indices=True)
+        n_match = len(match_1)
+        weight_difference = np.abs(self.weights[match_1] - other.weights[match_2]).sum()
+
+        # Excess genes lie beyond the last innovation of the other genome, the remaining unmatched genes are disjoint
+        cut = min(self.last_innovation(), other.last_innovation())
+        n_excess = np.count_nonzero(self.innovation_numbers > cut) + np.count_nonzero(other.innovation_numbers > cut)
+        n_disjoint = n_1 + n_2 - 2 * n_match - n_excess
+
+        return compatibility_score(n_excess, n_disjoint, max(n_1, n_2), weight_difference, n_match)
+
+# Compatibility score from gene counts (works on scalars and on arrays). Plus one match to make sure no division by zero
+def compatibility_score(n_excess, n_disjoint, n_max, weight_difference, n_match):
+    return (SPECIES_CONFIG.EXCESS_COEFFICIENT*n_excess + SPECIES_CONFIG.DISJOINT_COEFFICIENT*n_disjoint)/np.maximum(n_max, 1) + SPECIES_CONFIG.WEIGHT_COEFFICIENT*weight_difference/(n_match + 1)
+
+# Compatibility distances of one set of genes to many others (e.g. all species representatives) at once
+def batch_compatibility(genes: Gene_Arrays, others: list[Gene_Arrays]):
+
+    # Nothing to compare to
+    if len(others) == 0:
+        return np.zeros(0)
+
+    # Concatenate the genes of all others, remembering which one they belong to
+    counts = np.array([len(o) for o in others], dtype=np.int64)
+    owners = np.repeat(np.arange(len(others)), counts)
+    innovation_numbers = np.concatenate([o.innovation_numbers for o in others])
+    weights = np.concatenate([o.weights for o in others])
+
+    # Look up every gene of the others in our (sorted) genes
+    n = len(genes)
+    positions = np.minimum(np.searchsorted(genes.innovation_numbers, innovation_numbers), max(n - 1, 0))
+    matches = (genes.innovation_numbers[positions] == innovation_numbers) if n else np.zeros(len(innovation_numbers), dtype=bool)
+
+    # Matching genes and their summed weight difference per other
+    n_match = np.bincount(owners, weights=matches, minlength=len(others))
+    weight_difference = np.bincount(owners, weights=np.where(matches, np.abs(weights - (genes.weights[positions] if n else 0)), 0), minlength=len(others))
+
+    # Excess genes lie beyond the last innovation of the other genome, on either side
+    last_innovations = np.array([o.last_innovation() for o in others], dtype=np.int64)
+    cuts = np.minimum(genes.last_innovation(), last_innovations)
+    n_excess = np.bincount(owners, weights=innovation_numbers > cuts[owners], minlength=len(others)) + n - np.searchsorted(genes.innovation_numbers, cuts, side='right')
+    n_disjoint = n + counts - 2 * n_match - n_excess
+
+    return compatibility_score(n_excess, n_disjoint, np.maximum(n, counts), weight_difference, n_match)
@@ -1,15 +1,23 @@
 from itertools import count
 from .Node import Node
+from .Network import Network
+from .Gene_Arrays import Gene_Arrays
+from bisect import insort
 import random
 from .Connection import Connection
 from .Innovation_History import Innovation_History
 from .config import GENOME_CONFIG, CONNECTION_CONFIG
 import numpy as np
 import math as m
-import time
 
 class Genome:
 
+    __slots__ = ('ID', 'species_ID', 'innovation_history', 'input_space', 'output_space', 'connections', 'nodes', 'layers', 'bias_node_id',
+                 'network', 'fitness', 'age', 'FSNEAT', 'FDNEAT', 'node_lookup', 'nodes_by_type', 'connection_pairs', 'genes')
+
+    # Fields that are rebuilt after unpickling instead of being stored
+    DERIVED_FIELDS = ('network', 'node_lookup', 'nodes_by_type', 'connection_pairs', 'genes')
+
     def __init__(self, genome_id: int, innovation_history: Innovation_History, nodes:list[Node] = None, connections:list[Connection] = None, input_space: int = 2, output_space: int = 1):
     
         self.ID                     = genome_id             # ID of genome
@@ -20,52 +28,59 @@ class Genome:
         self.connections            = connections           # Connections of genome/network
         self.nodes                  = nodes                 # Nodes of genome/network
         self.layers                 = None                  # Number of layers in network
-        self.next_node_id           = count(0)              # Counter for next node id
-        self.network                = []                    # (UNUSED) phenotype
+        self.bias_node_id           = None                  # ID of bias node
+        self.network                = None                  # Compiled phenotype (built in build_network)
         self.fitness                = 0                     # Fitness of genome
-        self.adjusted_fitness       = 0                     # (UNUSED) adjusted fitness of genome (for fitness sharing)
         self.age                    = 0                     # Age of genome
         self.FSNEAT                 = False                 # FSNEAT enabled?
         self.FDNEAT                 = False                 # FDNEAT enabled? NOTE: do not simultaneously enable FSNEAT and FDNEAT!
+        self.node_lookup            = {}                    # Index: node ID -> node
+        self.nodes_by_type          = {}                    # Index: node type -> list of nodes of that type
+        self.connection_pairs       = set()                 # Index: (origin node ID, target node ID) of all connections
+        self.genes                  = None                  # Cached array view of the connection genes (None when out of date)
 
         # If a set of nodes is supplied
         if nodes != None:
 
-            # Check if they are all enabled. Otherwise, it's a useless network: then pass and create a new network
-            if np.all([not c.enabled for c in connections]):
-                pass
-
-            # Sort by ID (useful for order in feed forward later)
+            # Sort by ID (useful for order in feed forward later), and connections by innovation number
             self.nodes.sort(key=lambda x: x.ID)
+            self.connections.sort(key=lambda x: x.innovation_number)
+
+            # Build lookup indexes for the supplied genes
+            self.index_genes()
 
             # No need to do the rest of the initialisation. Return to stop it!
             return
         
         # Empty nodes
         self.nodes = []
+        self.index_genes()
+
+        # Counter for next node id
+        next_node_id = count(0)
 
         # NOTE: layers are between 0 and 1! Input = 0, output = 1, hidden is between.
         # For example: network with 2 hidden layers will have layers 0, 0.333, 0.666, 1.
         
         # Get next node id, which will also be the ID of the bias. Create bias node in layer 0 and add
-        self.bias_node_id = next(self.next_node_id)
+        self.bias_node_id = next(next_node_id)
         bias_node = Node(self.bias_node_id, node_type = "bias", layer = 0.0)
-        self.nodes.append(bias_node)
+        self.add_node_gene(bias_node)
         
         # For each input node, create a node in layer 0 and add it
         for _ in range(input_space):
-            node_ID = next(self.next_node_id)
+            node_ID = next(next_node_id)
             new_input_node = Node(node_ID, node_type = "input", layer = 0.0)
-            self.nodes.append(new_input_node)
+            self.add_node_gene(new_input_node)
 
         # For each output node, create a node in layer 1 and add it
         for _ in range(output_space):
-            node_ID = next(self.next_node_id)
+            node_ID = next(next_node_id)
             new_output_node = Node(node_ID, node_type = "output", layer = 1.0)
-            self.nodes.append(new_output_node)
+            self.add_node_gene(new_output_node)
 
         # Set innovation history's node id to what comes next
-        innovation_history.next_node_id = max(innovation_history.next_node_id, next(self.next_node_id))
+        innovation_history.next_node_id = max(innovation_history.next_node_id, next(next_node_id))
 
         # If normal NEAT, fully connect
         if not self.FSNEAT:
@@ -74,117 +89,104 @@ class Genome:
         else:
             self.partially_connect()
 
+    # Pickle only the genes and statistics. Indexes and phenotype are derived from them
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name not in self.DERIVED_FIELDS}
+
+    # Unpickle. Also migrates older pickles: unknown fields are dropped and missing ones get defaults
+    def __setstate__(self, state):
+        for name in self.__slots__:
+            setattr(self, name, state.get(name))
+        self.age = self.age or 0
+        self.fitness = self.fitness or 0
+        self.FSNEAT = bool(self.FSNEAT)
+        self.FDNEAT = bool(self.FDNEAT)
+        self.index_genes()
+
+    # (Re)build the node and connection lookup indexes from the node and connection lists
+    def index_genes(self):
+
+        self.node_lookup = {node.ID: node for node in self.nodes}
+        self.nodes_by_type = {"bias": [], "input": [], "output": [], "hidden": []}
+        for node in self.nodes:
+            self.nodes_by_type.setdefault(node.type, []).append(node)
+        self.connection_pairs = set((c.origin_node_ID, c.target_node_ID) for c in self.connections or [])
+        self.genes = None
+
+    # Add a node gene, and keep the indexes up to date
+    def add_node_gene(self, node: Node):
+
+        self.nodes.append(node)
+        self.node_lookup[node.ID] = node
+        self.nodes_by_type.setdefault(node.type, []).append(node)
+
+    # Add a connection gene, and keep the indexes up to date. Connections stay sorted by innovation number,
+    # also when an old innovation is reused (crossover and compatibility rely on that)
+    def add_connection_gene(self, connection: Connection):
+
+        insort(self.connections, connection, key=lambda x: x.innovation_number)
+        self.connection_pairs.add((connection.origin_node_ID, connection.target_node_ID))
+        self.genes = None
+
+    # Remove a connection gene, and keep the indexes up to date
+    def remove_connection_gene(self, connection: Connection):
+
+        self.connections.remove(connection)
+        self.connection_pairs.discard((connection.origin_node_ID, connection.target_node_ID))
+        self.genes = None
+
+    # Get the connection genes as arrays (built once, until the connections change)
+    def gene_arrays(self):
+
+        if self.genes == None:
+            self.genes = Gene_Arrays(self.connections)
+        return self.genes
+
     def get_zero_layer_nodes(self):
-        return [node for node in self.nodes if node.type in ["input", "bias"]]
+        return self.nodes_by_type["bias"] + self.nodes_by_type["input"]
     
     def get_input_nodes(self):
-        return [node for node in self.nodes if node.type in ["input"]]
+        return self.nodes_by_type["input"]
     
     def get_hidden_nodes(self):
-        return [node for node in self.nodes if node.type in ["hidden"]]
+        return self.nodes_by_type["hidden"]
     
     def get_output_nodes(self):
-        return [node for node in self.nodes if node.type in ["output"]]
+        return self.nodes_by_type["output"]
     
     def get_bias_nodes(self):
-        return [node for node in self.nodes if node.type in ["bias"]]
+        return self.nodes_by_type["bias"]
     
     def get_edge_nodes(self):
-        return [node for node in self.nodes if node.type in ["input", "bias", "output"]]
+        return self.nodes_by_type["bias"] + self.nodes_by_type["input"] + self.nodes_by_type["output"]
     
     def get_nodes_by_layer(self, layer):
         return [node for node in self.nodes if node.layer == layer]
 
     # Figure out of two nodes are not previously connected
     def is_good_pick(self, o: Node, t: Node):
-
-        for connection in self.connections:
-            if connection.origin_node_ID == o.ID and connection.target_node_ID == t.ID:
-                return False
-            
-        return True
+        return (o.ID, t.ID) not in self.connection_pairs
 
     # Get node from network by node id
     def get_node_by_id(self, find_id):
-
-        for node in self.nodes:
-            if node.ID == find_id:
-                return node
-        return None
-    
-    # Setup all nodes and connections correctly so feed forward works good
-    def connect_nodes(self):
-
-        # All layers that are present in the genome. Set because we do not want duplicates
-        layers = set()
-
-        # Loop through nodes
-        for node in self.nodes:
-
-            # Reset incoming and outgoing connections, input value and output value. Add layer to the set
-            node.outgoing_connections[:] = []
-            node.incoming_connections[:] = []
-            node.aggregated_inputs = 0
-            node.activated_response = 0
-            layers.add(node.layer)
-
-        # Logically, number of layers is number of unique layers in the set
-        self.layers = len(layers)
-
-        # Loop through connections
-        for connection in self.connections:
-            if connection.enabled:
-
-                # Add connection to the right nodes
-                target_node = self.get_node_by_id(connection.target_node_ID)
-                origin_node = self.get_node_by_id(connection.origin_node_ID)
-                target_node.incoming_connections.append(connection)
-                origin_node.outgoing_connections.append(connection)
+        return self.node_lookup.get(find_id)
     
     # Feed forward function (i.e. to make the network 'think')
     def feed_forward(self, inputs):
 
-        # Ignore those annoying overflow errors. Grr!
-        np.seterr(over='ignore')
-
-        # Loop through number of layers ('Flushing' of the network - prevents us from having to do everything in order)
-        for _ in range(self.layers):
-
-            # Accumulator for outputs
-            outputs = []
-
-            # idx for inputs
-            input_number = count(0)
-
-            # Loop through nodes
-            for node in self.nodes:
-
-                if node.type == "input":
-
-                    # If it's an input node, we can set its output value to the input value
-                    node.activated_response = inputs[next(input_number)]
-
-                elif node.type == "bias":
-
-                    # If it's a bias node, it's output value is just one
-                    node.activated_response = 1
-                else:
+        # Older (pickled) genomes may not have a compiled network yet
+        if not isinstance(self.network, Network):
+            self.build_network()
 
-                    # Fire the node! (use activation function on accumulated inputs)
-                    node.fire(self)
-
-                    # If it's an output node, add the output to the list
-                    if node.type == "output":
-                        outputs.append(node.activated_response)
-
-        # Return the list as a Numpy array
-        return np.array(outputs)
+        # Evaluate the compiled phenotype
+        return self.network.feed_forward(inputs)
     
     # Standard NEAT: fully connect!
     def fully_connect(self):
 
         # Reset connections
         self.connections = []
+        self.connection_pairs = set()
 
         # Get all layer 0 nodes
         input_nodes = self.get_zero_layer_nodes()
@@ -206,13 +208,14 @@ class Genome:
                 new_connection = Connection(weight, input_node.ID, output_node.ID, innovation.innovation_ID)
 
                 # Add to network
-                self.connections.append(new_connection)
+                self.add_connection_gene(new_connection)
 
     # FSNEAT: partially connect!
     def partially_connect(self):
 
         # Reset connections
         self.connections = []
+        self.connection_pairs = set()
 
         # Choose random input node
         input_node = random.choice(self.get_zero_layer_nodes())
@@ -230,11 +233,13 @@ class Genome:
         new_connection = Connection(weight, input_node.ID, output_node.ID, innovation.innovation_ID)
 
         # Add to network
-        self.connections.append(new_connection)
+        self.add_connection_gene(new_connection)
     
+    # Compile the phenotype: flat arrays in topological order, so each node is evaluated once per feed forward
     def build_network(self):
 
-        self.connect_nodes()
+        self.network = Network(self)
+        self.layers = self.network.n_layers
 
     # Mutation: add node
     def add_node(self):
@@ -279,17 +284,17 @@ class Genome:
 
             # Create it!
             new_node = Node(innovation.node_id, node_type="hidden", layer = new_layer)
-            self.nodes.append(new_node)
+            self.add_node_gene(new_node)
 
             # Add new connection between old origin and new node
             innovation_connection_1 = self.innovation_history.get_innovation('connection', origin_node.ID, new_node.ID)
             new_connection_1 = Connection(1.0, origin_node.ID, new_node.ID, innovation_connection_1.innovation_ID, recurrent=recurrent)
-            self.connections.append(new_connection_1)
+            self.add_connection_gene(new_connection_1)
 
             # add connection between new node and old target
             innovation_connection_2 = self.innovation_history.get_innovation('connection', new_node.ID, target_node.ID)
             new_connection_2 = Connection(random_connection.weight, new_node.ID, target_node.ID, innovation_connection_2.innovation_ID, recurrent=recurrent)
-            self.connections.append(new_connection_2)
+            self.add_connection_gene(new_connection_2)
 
             # Disable old connection
             random_connection.enabled = False
@@ -305,7 +310,7 @@ class Genome:
 
             # If the connection qualifies, remove it
             if self.get_node_by_id(random_connection.origin_node_ID).type in ["input", "bias"] and self.get_node_by_id(random_connection.target_node_ID).type == "output":
-                self.connections.remove(random_connection)
+                self.remove_connection_gene(random_connection)
                 break
 
     # Mutation: add connection
@@ -346,10 +351,10 @@ class Genome:
         innovation = self.innovation_history.get_innovation('connection', random_node_1.ID, random_node_2.ID)
         weight = np.random.normal(0, CONNECTION_CONFIG.STD_DEV_WEIGHT)
         new_connection = Connection(weight, random_node_1.ID, random_node_2.ID, innovation.innovation_ID, recurrent=recurrent)
-        self.connections.append(new_connection)
+        self.add_connection_gene(new_connection)
 
-    # Full mutation step
-    def mutate(self):
+    # Full mutation step. Parameter (weight and activation) mutation can be left out when it is done for a whole batch of genomes at once
+    def mutate(self, mutate_parameters: bool = True):
 
         probability_value = random.random()
         if probability_value < GENOME_CONFIG.MUTATION_ADD_NODE:
@@ -359,6 +364,20 @@ class Genome:
         if probability_value < GENOME_CONFIG.MUTATION_ADD_CONNECTION:
             self.add_connection()
 
+        if mutate_parameters:
+            self.mutate_parameters()
+
+        if self.FDNEAT and len(self.connections) > 1:
+            probability_value = random.random()
+            if probability_value < GENOME_CONFIG.MUTATION_DESELECTION:
+                self.remove_connection()
+
+        # Weights and enabled flags have changed, so cached gene arrays are out of date
+        self.genes = None
+
+    # Mutate connection weights and activation responses
+    def mutate_parameters(self):
+
         for connection in self.connections:
             probability_value = random.random()
             if probability_value < GENOME_CONFIG.MUTATION_WEIGHT:
@@ -369,7 +388,5 @@ class Genome:
             if probability_value < GENOME_CONFIG.MUTATION_ACTIVATION:
                 node.activation_response += (random.random()*2-1) * GENOME_CONFIG.MUTATION_ACTIVATION_PERTURBATION
 
-        if self.FDNEAT and len(self.connections) > 1:
-            probability_value = random.random()
-            if probability_value < GENOME_CONFIG.MUTATION_DESELECTION:
-                self.remove_connection()
\ No newline at end of file
+        # Weights have changed, so cached gene arrays are out of date
+        self.genes = None
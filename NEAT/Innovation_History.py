@@ -1,5 +1,6 @@
 from itertools import count
 from .Node import Node
+import numpy as np
 
 class Innovation():
 
@@ -14,32 +15,28 @@ class Innovation():
 
 class Innovation_History():
 
+    # Innovation types as stored in arrays when saving
+    TYPE_CODES = {'node': 0, 'connection': 1}
+
     def __init__(self):
         self.next_innovation_id = 0                 # Next innovation ID
         self.next_node_id       = 0                 # Next node ID
         self.next_connection_id = 0                 # Next connection ID
-        self.innovations        = []                # List of innovations in history
+        self.innovations        = {}                # Innovations in history, by (type, origin node ID, target node ID)
 
     # Check to see if this innovation has already happened
     def exist_innovation(self, innovation_type, origin_node_ID: int, target_node_ID: int):
 
-        # Loop through innovations in history
-        for innovation in self.innovations:
-
-            # If it all matches, return the corresponding innovation
-            if innovation.type == innovation_type and innovation.origin_node_ID == origin_node_ID and innovation.target_node_ID == target_node_ID:
-                return innovation
-            
-        # If not, return None
-        return None
+        # Look it up. If not found, return None
+        return self.innovations.get((innovation_type, origin_node_ID, target_node_ID))
 
     # Create innovation because it did not exist yet
     def create_innovation(self, innovation_type: str, origin_node_ID: int = None, target_node_ID: int = None):
-        
+
         # If not everything is supplied we error
         if origin_node_ID == None or target_node_ID == None:
             return None
-        
+
         # If we need to create an innovation for a new node
         if innovation_type == 'node':
             new_innovation = Innovation(self.next_innovation_id, innovation_type, origin_node_ID, target_node_ID, node_ID = self.next_node_id)
@@ -51,16 +48,82 @@ class Innovation_History():
             self.next_connection_id += 1
         else:
             return None
-        
+
         # Add to history, increase innovation_id count and return innovation
-        self.innovations.append(new_innovation)
+        self.innovations[(innovation_type, origin_node_ID, target_node_ID)] = new_innovation
         self.next_innovation_id += 1
         return new_innovation
-    
+
     # Check to see if innovation exists, otherwise make new one
     def get_innovation(self, innovation_type: str, origin_node_ID: int = None, target_node_ID: int = None):
         innovation = self.exist_innovation(innovation_type, origin_node_ID, target_node_ID)
         if innovation == None:
             innovation = self.create_innovation(innovation_type, origin_node_ID, target_node_ID)
         return innovation
-        
\ No newline at end of file
+
+    # Reverse lookup of node innovations: node ID -> (origin node ID, target node ID) of the connection it split
+    def node_splits(self):
+        return {i.node_id: (i.origin_node_ID, i.target_node_ID) for i in self.innovations.values() if i.type == 'node'}
+
+    # Drop all innovations that no genome carries anymore. Counters keep running, so IDs are never reused
+    def compact(self, genomes: list):
+
+        # Innovation numbers of connections and IDs of nodes that are still alive
+        live_connections = set(connection.innovation_number for genome in genomes for connection in genome.connections)
+        live_nodes = set(node.ID for genome in genomes for node in genome.nodes)
+
+        # Only keep those
+        self.innovations = {key: innovation for key, innovation in self.innovations.items()
+                            if (innovation.type == 'connection' and innovation.innovation_ID in live_connections)
+                            or (innovation.type == 'node' and innovation.node_id in live_nodes)}
+
+    # Forget the connection innovations (classic NEAT: only match new connections within one generation). Node innovations
+    # are kept, so splitting the same connection again gives the same node ID and genomes stay aligned on their hidden nodes.
+    # Live genomes keep their numbers, so afterwards the same node pair can carry two innovation numbers in different genomes.
+    # That is tolerated: a genome never holds a node pair twice, compatibility counts the two numbers as disjoint genes, and
+    # crossover (and migration) keep one connection per node pair
+    def reset(self):
+        self.innovations = {key: innovation for key, innovation in self.innovations.items() if innovation.type == 'node'}
+
+    # Pack the history into a single integer array: one row of (type, innovation ID, origin, target, node ID, connection ID) per innovation
+    def to_array(self):
+
+        rows = [(self.TYPE_CODES[i.type], i.innovation_ID, i.origin_node_ID, i.target_node_ID,
+                 -1 if i.node_id == None else i.node_id, -1 if i.connection_id == None else i.connection_id)
+                for i in self.innovations.values()]
+        return np.array(rows, dtype=np.int32).reshape(-1, 6)
+
+    # Rebuild the history from an array made by to_array
+    def from_array(self, rows):
+
+        type_names = {code: name for name, code in self.TYPE_CODES.items()}
+        self.innovations = {}
+        for type_code, innovation_id, origin, target, node_id, connection_id in rows.tolist():
+            innovation = Innovation(innovation_id, type_names[type_code], origin, target,
+                                    node_ID = None if node_id < 0 else node_id, connection_ID = None if connection_id < 0 else connection_id)
+            self.innovations[(innovation.type, origin, target)] = innovation
+
+    # Save the history to a compact .npz file
+    def save(self, path: str):
+        np.savez_compressed(path, innovations = self.to_array(), counters = np.array([self.next_innovation_id, self.next_node_id, self.next_connection_id]))
+
+    # Load the history from a file made by save
+    def load(self, path: str):
+        with np.load(path) as data:
+            self.from_array(data['innovations'])
+            self.next_innovation_id, self.next_node_id, self.next_connection_id = data['counters'].tolist()
+
+    # Pickle compactly (every pickled genome carries the history along)
+    def __getstate__(self):
+        return {'next_innovation_id': self.next_innovation_id, 'next_node_id': self.next_node_id, 'next_connection_id': self.next_connection_id, 'innovations': self.to_array()}
+
+    # Unpickle, also from older pickles that stored a plain list of innovations
+    def __setstate__(self, state):
+        innovations = state.pop('innovations')
+        self.__dict__.update(state)
+        if isinstance(innovations, np.ndarray):
+            self.from_array(innovations)
+        elif isinstance(innovations, list):
+            self.innovations = {(i.type, i.origin_node_ID, i.target_node_ID): i for i in innovations}
+        else:
+            self.innovations = innovations
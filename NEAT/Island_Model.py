@@ -0,0 +1,201 @@
+from .Genome import Genome
+from .Innovation_History import Innovation_History
+from multiprocessing import Process, Pipe
+import random
+import numpy as np
+
+# Package a genome for migration: copies of its genes, and for every hidden node the (origin, target)
+# split it came from in the island's innovation history (recursively, so splits of split nodes are included too)
+def pack_migrant(genome: Genome, history: Innovation_History):
+
+    all_splits = history.node_splits()
+    splits = {}
+    stack = [node.ID for node in genome.get_hidden_nodes()]
+    while stack:
+        node_id = stack.pop()
+        if node_id in splits or node_id not in all_splits:
+            continue
+        splits[node_id] = all_splits[node_id]
+        stack.extend(splits[node_id])
+
+    return [node.clone() for node in genome.nodes], [connection.clone() for connection in genome.connections], splits
+
+# Rebuild a migrant in another island's innovation history. Bias, input and output node IDs are the same on all islands.
+# Hidden nodes are translated through the node innovation of their (translated) split, connections get the innovation
+# number of their (translated) node pair. So the same structure gets the same numbers as on the receiving island. The genome
+# is unevaluated (fitness None): the receiving population evaluates it on arrival
+def unpack_migrant(migrant, history: Innovation_History, genome_id: int, input_space: int, output_space: int):
+
+    nodes, connections, splits = migrant
+    mapping = {}
+
+    # New hidden node IDs come after the edge nodes (as in a history that made genomes already)
+    history.next_node_id = max(history.next_node_id, input_space + output_space + 1)
+
+    # Translate a node ID into the receiving history
+    def translate(node_id):
+
+        # Edge nodes (bias, inputs, outputs) are shared
+        if node_id <= input_space + output_space:
+            return node_id
+
+        if node_id not in mapping:
+
+            # Same split, same node. The split may have been forgotten by its history (see INNOVATION_POLICY) or collide: then it is new
+            split = splits.get(node_id)
+            new_id = history.get_innovation('node', translate(split[0]), translate(split[1])).node_id if split else None
+            if new_id == None or new_id in mapping.values():
+                new_id = history.next_node_id
+                history.next_node_id += 1
+            mapping[node_id] = new_id
+
+        return mapping[node_id]
+
+    # Translate the genes
+    for node in nodes:
+        node.ID = translate(node.ID)
+    for connection in connections:
+        connection.origin_node_ID = translate(connection.origin_node_ID)
+        connection.target_node_ID = translate(connection.target_node_ID)
+
+    # One connection per node pair: a genome can carry the same pair twice (after an innovation history reset, or when split
+    # nodes collide), and here both would get the same innovation number. Keep the enabled one (the first one if both are)
+    by_pair = {}
+    for connection in connections:
+        pair = (connection.origin_node_ID, connection.target_node_ID)
+        if pair not in by_pair or (connection.enabled and not by_pair[pair].enabled):
+            by_pair[pair] = connection
+    connections = list(by_pair.values())
+    for connection in connections:
+        connection.innovation_number = history.get_innovation('connection', connection.origin_node_ID, connection.target_node_ID).innovation_ID
+
+    genome = Genome(genome_id, history, nodes, connections, input_space, output_space)
+    genome.fitness = None
+    return genome
+
+# Islands every island sends its migrants to: "ring" (to the next island), "full" (to all others), or a list with a list of destinations per island
+def migration_targets(topology, n_islands: int):
+
+    if topology == "ring":
+        return [[(i + 1) % n_islands] for i in range(n_islands)] if n_islands > 1 else [[]]
+    if topology == "full":
+        return [[j for j in range(n_islands) if j != i] for i in range(n_islands)]
+    return [list(destinations) for destinations in topology]
+
+# Island process: build a population and evolve it on command of the island model
+def run_island(index: int, population_factory: callable, seed: int, connection):
+
+    # Every island has its own seed
+    random.seed(seed)
+    np.random.seed(seed)
+
+    # Build the population (own identifier, so saved stats of islands do not overwrite each other)
+    population = population_factory(index)
+    population.identifier += "-island-" + str(index)
+
+    while True:
+        message = connection.recv()
+
+        # Evolve a number of generations, then send the best genomes as emigrants
+        if message[0] == "evolve":
+            _, n_generations, n_migrants = message
+            population.run_generations(n_generations)
+            emigrants = [pack_migrant(genome, population.innovation_history) for genome in population.genomes[:n_migrants]]
+            done = population.finished or population.generation_number >= population.max_generations
+            connection.send((emigrants, population.generation_number, population.best_genome.fitness, population.finished, done))
+
+        # Take in migrants from other islands
+        elif message[0] == "immigrate":
+            immigrants = [unpack_migrant(migrant, population.innovation_history, next(population.next_genome_id), population.input_space, population.output_space) for migrant in message[1]]
+            population.immigrate(immigrants)
+
+        # Finish the run (stop workers, save stats) and send back the best genome
+        elif message[0] == "stop":
+            population.end_run()
+            connection.send(population.best_genome)
+            return
+
+# Send a command to an island process. Raises RuntimeError if the process died
+def send(connection, process, index: int, message):
+    try:
+        connection.send(message)
+    except OSError:
+        raise RuntimeError("Island %d died (exit code %s)" % (index, process.exitcode))
+
+# Receive the answer of an island process. Raises RuntimeError if the process died instead of answering
+def receive(connection, process, index: int, poll_interval: float = 1.0):
+
+    # A dead process shows up as a closed (EOFError) or reset (OSError) connection, or as no answer at all
+    try:
+        while not connection.poll(poll_interval):
+            if not process.is_alive():
+                raise RuntimeError("Island %d died (exit code %s)" % (index, process.exitcode))
+        return connection.recv()
+    except (EOFError, OSError):
+        process.join(timeout=poll_interval)
+        raise RuntimeError("Island %d died (exit code %s)" % (index, process.exitcode))
+
+class Island_Model:
+
+    def __init__(self, n_islands: int, population_factory: callable, migration_interval: int = 5, n_migrants: int = 2, topology = "ring", seed: int = 0):
+
+        self.n_islands              = n_islands                     # Number of islands (populations, each in its own process)
+        self.population_factory     = population_factory            # Creates the population of an island (CALLABLE with input of island index, PICKLABLE)
+        self.migration_interval     = migration_interval            # Number of generations between migrations
+        self.n_migrants             = n_migrants                    # Number of best genomes every island sends out per migration
+        self.topology               = topology                      # Migration topology: "ring", "full", or a list of destination islands per island
+        self.seed                   = seed                          # Seed of island i is seed + i
+        self.best_genome            = None                          # Best genome of all islands (with the innovation history of its island)
+        self.island_best_fitness    = [None] * n_islands            # Best fitness of every island
+        self.generation_number      = 0                             # Generations done (by the slowest island)
+        self.finished               = False                         # Is finished? (some island has reached goal)
+
+    # Run all islands until done, migrating every migration_interval generations. Returns the best genome
+    def run(self):
+
+        # Start island processes
+        connections = []
+        processes = []
+        for i in range(self.n_islands):
+            parent_connection, child_connection = Pipe()
+            process = Process(target = run_island, args = (i, self.population_factory, self.seed + i, child_connection), daemon = True)
+            process.start()
+            child_connection.close()
+            connections.append(parent_connection)
+            processes.append(process)
+
+        targets = migration_targets(self.topology, self.n_islands)
+
+        try:
+            while True:
+
+                # Evolve all islands at the same time
+                for i, (connection, process) in enumerate(zip(connections, processes)):
+                    send(connection, process, i, ("evolve", self.migration_interval, self.n_migrants))
+                results = [receive(connection, process, i) for i, (connection, process) in enumerate(zip(connections, processes))]
+
+                # Keep track of progress
+                self.generation_number = min(result[1] for result in results)
+                self.island_best_fitness = [result[2] for result in results]
+                self.finished = any(result[3] for result in results)
+                if self.finished or all(result[4] for result in results):
+                    break
+
+                # Migrate: every island receives the emigrants of the islands that send to it
+                for j, (connection, process) in enumerate(zip(connections, processes)):
+                    immigrants = [migrant for i in range(self.n_islands) if j in targets[i] for migrant in results[i][0]]
+                    send(connection, process, j, ("immigrate", immigrants))
+
+            # Stop islands and collect their best genomes
+            for i, (connection, process) in enumerate(zip(connections, processes)):
+                send(connection, process, i, ("stop",))
+            best_genomes = [receive(connection, process, i) for i, (connection, process) in enumerate(zip(connections, processes))]
+            self.best_genome = max(best_genomes, key=lambda x: x.fitness)
+
+        finally:
+            for process in processes:
+                process.join(timeout = 10)
+                if process.is_alive():
+                    process.terminate()
+
+        return self.best_genome
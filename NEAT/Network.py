@@ -0,0 +1,134 @@
+import numpy as np
+
+# Activation function names mapped to integer codes (so they can be stored in an array)
+ACTIVATION_CODES = {"Sigmoid": 0, "ScaledSigmoid": 1, "ReLu": 2, "LeakyReLu": 3, "Step": 4}
+
+# Code for anything that is not listed above (identity activation)
+LINEAR_CODE = len(ACTIVATION_CODES)
+
+# Activate an array of aggregated inputs, node by node according to their activation codes
+def activate(x, activation_codes, activation_responses, scaled_sigmoid_only: bool = False):
+
+    # Ignore those annoying overflow errors. Grr!
+    with np.errstate(over='ignore'):
+
+        # Most common case: all nodes use the scaled sigmoid
+        if scaled_sigmoid_only:
+            return (1.0 / (1.0 + np.exp(-x / activation_responses))) * 2.0 - 1.0
+
+        # Otherwise select the right function per node
+        return np.select(
+            [activation_codes == 0, activation_codes == 1, activation_codes == 2, activation_codes == 3, activation_codes == 4],
+            [1 / (1 + np.exp(-x)), (1.0 / (1.0 + np.exp(-x / activation_responses))) * 2.0 - 1.0, np.maximum(0, x), np.maximum(0.1 * x, x), (x >= 0).astype(float)],
+            x)
+
+# Precompute everything a feed forward sweep needs per depth (depth 0 only holds inputs and bias).
+# Nodes must be sorted by depth, and edges by target node.
+def compile_depth_slices(depths, n_layers: int, sources, targets, weights, recurrent, activation_codes, activation_responses):
+
+    # Nodes of each depth are contiguous, as are their incoming edges. Find the ranges per depth
+    depth_pointers = np.searchsorted(depths, np.arange(n_layers + 1))
+    incoming_pointers = np.searchsorted(targets, depth_pointers)
+
+    depth_slices = []
+    for depth in range(1, n_layers):
+        node_start, node_end = int(depth_pointers[depth]), int(depth_pointers[depth + 1])
+        edge_start, edge_end = int(incoming_pointers[depth]), int(incoming_pointers[depth + 1])
+        depth_recurrent = recurrent[edge_start:edge_end]
+        codes = activation_codes[node_start:node_end]
+        depth_slices.append((
+            node_start, node_end,
+            sources[edge_start:edge_end],
+            targets[edge_start:edge_end] - node_start,
+            weights[edge_start:edge_end],
+            depth_recurrent if np.any(depth_recurrent) else None,
+            codes,
+            activation_responses[node_start:node_end],
+            bool(np.all(codes == ACTIVATION_CODES["ScaledSigmoid"]))))
+
+    return depth_slices
+
+# Sweep through the depths in order, evaluating all nodes of one depth at once
+def propagate(values, previous_values, depth_slices: list):
+
+    for node_start, node_end, sources, targets, weights, recurrent, codes, responses, scaled_sigmoid_only in depth_slices:
+
+        # Gather inputs for all nodes at this depth at once
+        source_values = values[sources]
+        if recurrent is not None:
+            source_values = np.where(recurrent, previous_values[sources], source_values)
+        aggregated_inputs = np.bincount(targets, weights=weights * source_values, minlength=node_end - node_start)
+
+        # Then activate!
+        values[node_start:node_end] = activate(aggregated_inputs, codes, responses, scaled_sigmoid_only)
+
+class Network:
+
+    def __init__(self, genome):
+
+        # Sort nodes topologically: by layer first, then by ID. Feed forward connections always go to a higher layer
+        ordered_nodes = sorted(genome.nodes, key=lambda node: (node.layer, node.ID))
+
+        # Lookup table from node ID to index in the ordered arrays
+        node_index = {node.ID: i for i, node in enumerate(ordered_nodes)}
+
+        # Unique layers, and the depth (index of the layer) of every node
+        layers = sorted(set(node.layer for node in ordered_nodes))
+        depth_lookup = {layer: i for i, layer in enumerate(layers)}
+
+        self.n_nodes                = len(ordered_nodes)                                                                # Number of nodes
+        self.n_layers               = len(layers)                                                                       # Number of layers
+        self.node_ids               = np.array([node.ID for node in ordered_nodes], dtype=np.int64)                     # Node ID of each index
+        self.depths                 = np.array([depth_lookup[node.layer] for node in ordered_nodes], dtype=np.int64)    # Depth of each node
+        self.input_indices          = np.array([node_index[n.ID] for n in ordered_nodes if n.type == "input"], dtype=np.int64)  # Input node indices (ID order)
+        self.bias_indices           = np.array([node_index[n.ID] for n in ordered_nodes if n.type == "bias"], dtype=np.int64)   # Bias node indices
+        self.output_indices         = np.array([node_index[n.ID] for n in sorted(ordered_nodes, key=lambda n: n.ID) if n.type == "output"], dtype=np.int64)  # Output node indices (ID order)
+        self.activation_codes       = np.array([ACTIVATION_CODES.get(node.activation_type, LINEAR_CODE) for node in ordered_nodes], dtype=np.int8)  # Activation function per node
+        self.activation_responses   = np.array([node.activation_response for node in ordered_nodes], dtype=float)      # Sigmoid slope per node
+        self.values                 = np.zeros(self.n_nodes)                                                            # Activated response of each node (network state)
+
+        # Gather enabled connections as (target index, origin index, weight)
+        edges = sorted((node_index[c.target_node_ID], node_index[c.origin_node_ID], c.weight) for c in genome.connections if c.enabled)
+
+        self.targets                = np.array([e[0] for e in edges], dtype=np.int64)                                   # Target index of each incoming edge
+        self.sources                = np.array([e[1] for e in edges], dtype=np.int64)                                   # Origin index of each incoming edge
+        self.weights                = np.array([e[2] for e in edges], dtype=float)                                      # Weight of each incoming edge
+
+        # Recurrent edges do not go to a deeper layer: these read the value of the previous step
+        self.recurrent              = self.depths[self.sources] >= self.depths[self.targets]
+
+        self.has_recurrent          = bool(np.any(self.recurrent))
+        self.depth_slices           = compile_depth_slices(self.depths, self.n_layers, self.sources, self.targets, self.weights, self.recurrent, self.activation_codes, self.activation_responses)
+
+    # Pickle compactly (e.g. to ship to worker processes): the per-depth slices are views that can be rebuilt
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['depth_slices']
+        return state
+
+    # Unpickle and rebuild the per-depth slices
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.depth_slices = compile_depth_slices(self.depths, self.n_layers, self.sources, self.targets, self.weights, self.recurrent, self.activation_codes, self.activation_responses)
+
+    # Reset the network state (e.g. at the start of a new episode)
+    def reset(self):
+        self.values[:] = 0
+
+    # Feed forward function: evaluates every node exactly once, in topological order
+    def feed_forward(self, inputs):
+
+        values = self.values
+
+        # Recurrent edges read a snapshot of the previous step
+        previous_values = values.copy() if self.has_recurrent else values
+
+        # Set inputs and bias
+        values[self.input_indices] = inputs
+        values[self.bias_indices] = 1
+
+        # Evaluate all nodes, depth by depth
+        propagate(values, previous_values, self.depth_slices)
+
+        # Return outputs as Numpy array
+        return values[self.output_indices]
@@ -0,0 +1,86 @@
+from .Network import Network, compile_depth_slices, propagate
+import numpy as np
+
+class Network_Batch:
+
+    def __init__(self, networks: list[Network]):
+
+        self.networks               = list(networks)        # Compiled networks in this batch (one per agent)
+        self.n_agents               = len(self.networks)    # Number of agents (rows of observation and action matrices)
+
+        # Pack them together
+        self.pack()
+
+    # Pack all networks into one block diagonal network. Every depth of every network is evaluated in a single sweep
+    def pack(self):
+
+        # Nothing to pack
+        if self.n_agents == 0:
+            self.offsets = []
+            self.depth_slices = []
+            return
+
+        # Offset of each network's nodes in the concatenated arrays
+        sizes = np.array([network.n_nodes for network in self.networks], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        self.n_layers = max(network.n_layers for network in self.networks)
+
+        # Concatenate node data. Then order globally by depth (and by agent within a depth)
+        depths = np.concatenate([network.depths for network in self.networks])
+        agents = np.repeat(np.arange(self.n_agents), sizes)
+        order = np.lexsort((np.arange(len(depths)), agents, depths))
+
+        # Inverse mapping: concatenated index -> packed index
+        self.packed_index = np.empty(len(order), dtype=np.int64)
+        self.packed_index[order] = np.arange(len(order))
+        self.offsets = offsets
+
+        self.depths                 = depths[order]                                                                             # Depth of each packed node
+        self.activation_codes       = np.concatenate([network.activation_codes for network in self.networks])[order]           # Activation function per node
+        self.activation_responses   = np.concatenate([network.activation_responses for network in self.networks])[order]       # Sigmoid slope per node
+        self.values                 = np.concatenate([network.values for network in self.networks])[order]                     # Network state of every node
+
+        # Index matrices for inputs (n_agents, n_inputs) and outputs (n_agents, n_outputs), and flat bias indices
+        self.input_indices          = self.packed_index[np.stack([network.input_indices + offset for network, offset in zip(self.networks, offsets)])]
+        self.output_indices         = self.packed_index[np.stack([network.output_indices + offset for network, offset in zip(self.networks, offsets)])]
+        self.bias_indices           = self.packed_index[np.concatenate([network.bias_indices + offset for network, offset in zip(self.networks, offsets)])]
+
+        # Concatenate edges, move them to packed indices and sort them by target
+        targets = self.packed_index[np.concatenate([network.targets + offset for network, offset in zip(self.networks, offsets)])]
+        sources = self.packed_index[np.concatenate([network.sources + offset for network, offset in zip(self.networks, offsets)])]
+        weights = np.concatenate([network.weights for network in self.networks])
+        recurrent = np.concatenate([network.recurrent for network in self.networks])
+        edge_order = np.argsort(targets, kind='stable')
+
+        self.has_recurrent          = bool(np.any(recurrent))
+        self.depth_slices           = compile_depth_slices(self.depths, self.n_layers, sources[edge_order], targets[edge_order], weights[edge_order], recurrent[edge_order], self.activation_codes, self.activation_responses)
+
+    # Feed forward all agents at once: (n_agents, n_inputs) observations to (n_agents, n_outputs) actions
+    def feed_forward(self, observations):
+
+        values = self.values
+
+        # Recurrent edges read a snapshot of the previous step
+        previous_values = values.copy() if self.has_recurrent else values
+
+        # Set inputs and bias
+        values[self.input_indices] = observations
+        values[self.bias_indices] = 1
+
+        # Evaluate all nodes of all networks, depth by depth
+        propagate(values, previous_values, self.depth_slices)
+
+        # Return the action matrix
+        return values[self.output_indices]
+
+    # Only keep the agents for which keep_mask is True (e.g. drop the rows of deactivated cars)
+    def keep(self, keep_mask):
+
+        # Write network states back, so recurrent memory survives repacking
+        for network, offset in zip(self.networks, self.offsets):
+            network.values[:] = self.values[self.packed_index[offset:offset + network.n_nodes]]
+
+        # Repack with the remaining networks
+        self.networks = [network for network, keep in zip(self.networks, keep_mask) if keep]
+        self.n_agents = len(self.networks)
+        self.pack()
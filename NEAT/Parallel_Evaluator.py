@@ -0,0 +1,46 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import os
+
+# Episode function of this worker process (set once per worker by the pool initializer)
+worker_episode_function = None
+
+# Pool initializer: receive the episode function once, instead of with every task
+def initialize_worker(episode_function: callable):
+    global worker_episode_function
+    worker_episode_function = episode_function
+
+# Run one episode in a worker: network in, (fitness, episode stats) out
+def run_episode(network, generation_number: int):
+    return worker_episode_function(network, generation_number)
+
+class Parallel_Evaluator:
+
+    def __init__(self, episode_function: callable, workers: int = None, chunks_per_worker: int = 4):
+
+        self.episode_function       = episode_function              # Episode function (CALLABLE with input of a compiled network and the generation number, PICKLABLE)
+        self.workers                = workers or os.cpu_count()     # Number of worker processes
+        self.chunks_per_worker      = chunks_per_worker             # Number of shards handed to every worker per generation
+        self.executor               = None                          # Process pool (started on first use)
+
+    # Start the process pool if it is not running yet
+    def start(self):
+        if self.executor == None:
+            self.executor = ProcessPoolExecutor(max_workers = self.workers, initializer = initialize_worker, initargs = (self.episode_function,))
+
+    # Submit a single episode. Returns a future of (fitness, episode stats)
+    def submit(self, network, generation_number: int):
+        self.start()
+        return self.executor.submit(run_episode, network, generation_number)
+
+    # Evaluate all networks, sharded over the workers. Returns a list of (fitness, episode stats), in order
+    def evaluate(self, networks: list, generation_number: int):
+        self.start()
+        chunksize = max(1, len(networks) // (self.workers * self.chunks_per_worker))
+        return list(self.executor.map(run_episode, networks, repeat(generation_number), chunksize = chunksize))
+
+    # Stop the worker processes
+    def shutdown(self):
+        if self.executor != None:
+            self.executor.shutdown()
+            self.executor = None
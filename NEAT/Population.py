@@ -2,10 +2,13 @@ from .Genome import Genome
 from .Species import Species
 from .Connection import Connection
 from .Innovation_History import Innovation_History
+from .Speciation_Engine import Speciation_Engine
 import random
+import heapq
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
 from itertools import count
-from .config import POPULATION_CONFIG
-from copy import deepcopy
+from .config import POPULATION_CONFIG, SPECIES_CONFIG, GENOME_CONFIG, CONNECTION_CONFIG
 import json
 import os
 import pickle
@@ -16,7 +19,7 @@ import matplotlib.pyplot as plt
 
 class Population:
 
-    def __init__(self, population_size: int, max_generations: int, fitness_function: callable, input_space: int, output_space: int, inject_genomes: list[Genome]= None ,do_species_target: bool = False, verbose: bool = True, do_graph: bool = True, save_stats: bool = True):
+    def __init__(self, population_size: int, max_generations: int, fitness_function: callable, input_space: int, output_space: int, inject_genomes: list[Genome]= None ,do_species_target: bool = False, verbose: bool = True, do_graph: bool = True, save_stats: bool = True, evaluator = None):
 
         # NEAT data
         self.genomes                    = []                                # Genomes in population
@@ -27,6 +30,7 @@ class Population:
         self.next_genome_id             = count(0)                          # Counter for next genome id
         self.next_species_id            = count(0)                          # Counter for next species id
         self.innovation_history         = Innovation_History()              # Innovation history instance
+        self.speciation_engine          = Speciation_Engine()               # Speciation engine (caches genome to representative distances)
         self.compatability_multiplier   = 1                                 # Multiplier for compatability threshold (to control nr of species)
         self.finished                   = False                             # Is finished? (has reached goal?)
         self.inject_genomes             = inject_genomes                    # Genomes to inject into population
@@ -35,6 +39,9 @@ class Population:
         self.population_size            = population_size                   # Size of population
         self.max_generations            = max_generations                   # Max number of generations
         self.fitness_function           = fitness_function                  # Fitness function (CALLABLE with input of list of genomes)
+        self.evaluator                  = evaluator                         # Optional evaluator running one episode per genome in parallel (replaces fitness function)
+        self.episode_stats              = {}                                # Episode stats per genome ID of the last generation (when using an evaluator)
+        self.fitness_order              = {}                                # Steady-state mode: heap of (fitness, genome ID, genome) of the evaluated genomes per species ID
         self.input_space                = input_space                       # Number of inputs
         self.output_space               = output_space                      # Number of outputs
         self.verbose                    = verbose                           # Spam to console the statistics?
@@ -51,8 +58,19 @@ class Population:
     # Run the algorithm
     def run(self):
 
+        # Evolve for all generations
+        self.run_generations(self.max_generations)
+
+        # Stop workers, graph and save
+        self.end_run()
+
+    # Evolve for (at most) a number of generations. Stops early at the max number of generations or when finished
+    def run_generations(self, n_generations: int):
+
         # While we still have generations to go
-        while self.generation_number < self.max_generations and not self.finished:
+        for _ in range(n_generations):
+            if self.generation_number >= self.max_generations or self.finished:
+                break
 
             # Do a full epoch
             self.epoch()
@@ -61,26 +79,245 @@ class Population:
             if self.verbose:
                 self.printer()
 
-            # If we want to either graph or save the statistics
-            if self.do_graph or self.save_stats:
+            # Keep statistics of this generation
+            self.record_statistics()
+
+    # Run the algorithm in steady-state (rtNEAT) mode: there is no generational barrier, every finished evaluation
+    # replaces the worst genome by a new offspring right away, so the workers never wait for the slowest episode.
+    # A 'generation' is population_size evaluations: the budget is max_generations * population_size evaluations
+    def run_steady_state(self, in_flight: int = None):
+
+        # Episodes are submitted one at a time, so this needs an evaluator
+        if not self.evaluator:
+            raise ValueError("Steady-state mode needs an evaluator")
+
+        # Number of episodes that are running (or queued) at any time. Enough to keep all workers busy
+        in_flight = in_flight or os.cpu_count()
+
+        # Initial population: these are evaluated first
+        self.fill_population()
+        waiting = deque(self.genomes)
+
+        # Running evaluations (future -> genome), and number of finished evaluations
+        pending = {}
+        evaluations = 0
+
+        # Until finished, or until nothing is running anymore
+        while not self.finished:
+
+            # Refill workers: initial genomes first, then offspring replacing the worst genome
+            while len(pending) < in_flight and evaluations + len(pending) < self.max_generations * self.population_size:
+                genome = waiting.popleft() if waiting else self.replace_worst_genome()
+                if genome == None:
+                    break
+                genome.build_network()
+                pending[self.evaluator.submit(genome.network, self.generation_number)] = genome
+
+            # Nothing is running anymore: budget is used up (or too few evaluated genomes to breed from)
+            if not pending:
+                break
+
+            # Wait for any evaluation to finish
+            done, _ = wait(pending, return_when = FIRST_COMPLETED)
+            for future in done:
+
+                # Write fitness and episode stats back
+                genome = pending.pop(future)
+                genome.fitness, stats = future.result()
+                genome.age += 1
+                self.episode_stats[genome.ID] = stats
+                self.finished = self.finished or stats.get("finished", False)
+
+                # If we have a better genome, update best genome
+                if self.best_genome == None or genome.fitness > self.best_genome.fitness:
+                    self.old_best_genome = self.best_genome
+                    self.best_genome = genome
+
+                # Put it into a species (only evaluated genomes are in species), and into the fitness order of that species
+                self.add_to_species(genome)
+                heapq.heappush(self.fitness_order.setdefault(genome.species_ID, []), (genome.fitness, genome.ID, genome))
+
+                # Every population_size evaluations, do the per generation bookkeeping
+                evaluations += 1
+                if evaluations % self.population_size == 0:
+                    self.end_steady_state_generation()
 
-                # Loop through species
-                for species in self.species:
-                    
-                    # If we do not have a container for this species yet, create one (empty list)
-                    while len(self.statistics['species']) <= species.id:
-                        self.statistics['species'].append([])
+        # Do not run what is still queued
+        for future in pending:
+            future.cancel()
+
+        # Stop workers, graph and save
+        self.end_run()
+
+    # Put an evaluated genome into the first compatible species (or a new one), and update that species
+    def add_to_species(self, genome: Genome):
+
+        # Find first compatible species
+        for species in self.species:
+            if species.compatible(genome, self.compatability_multiplier):
+                species.add_genome(genome)
+                break
+
+        # If no species has been found, create a new one for it
+        else:
+            species = Species(genome, next(self.next_species_id))
+            self.species.append(species)
+
+        # Update its best genome and average fitness (a new species starts with an average of 0 and one genome)
+        if genome.fitness > species.best_genome.fitness:
+            species.best_genome = genome
+        species.average_fitness += (genome.fitness - species.average_fitness) / len(species.genomes)
+
+    # Remove the worst evaluated genome and return an offspring to take its place (None if there are too few evaluated genomes).
+    # Every species keeps its genomes in a heap by fitness, so this only looks at the worst genomes of the species
+    def replace_worst_genome(self):
+
+        # Only evaluated genomes (those in species) take part
+        if sum(len(species.genomes) for species in self.species) < 2:
+            return None
+
+        # Worst genome of every species (never the best genome: if it is on top of the heap, take the next one)
+        def worst_of(species):
+            heap = self.fitness_order[species.id]
+            if heap[0][2] != self.best_genome:
+                return heap[0]
+            return min(heap[1:3]) if len(heap) > 1 else None
+
+        # Worst genome by fitness shared with its species (so large species give up members first)
+        worst_entries = [(worst_of(species), len(species.genomes)) for species in self.species]
+        worst = min((entry for entry in worst_entries if entry[0] != None), key=lambda x: x[0][0] / x[1])[0][2]
+
+        # Take it out of the fitness order of its species (it is on top, or right below the best genome)
+        heap = self.fitness_order[worst.species_ID]
+        top = heapq.heappop(heap)
+        if top[2] != worst:
+            heapq.heappop(heap)
+            heapq.heappush(heap, top)
+        self.remove_genome(worst)
+        if not heap:
+            del self.fitness_order[worst.species_ID]
+
+        # Pick a parent species with chance proportional to its average fitness (stale species only if they hold the best genome)
+        candidates = [species for species in self.species if species.staleness < POPULATION_CONFIG.STALENESS_THRESHOLD or species.id == self.best_genome.species_ID]
+        weights = [max(species.average_fitness, 0) for species in candidates]
+        species = random.choices(candidates, weights)[0] if sum(weights) > 0 else random.choice(candidates)
+
+        # Select two parents through tournament selection inside that species
+        tournament_size = min(len(species.genomes), POPULATION_CONFIG.TOURNAMENT_SIZE)
+        parent_1 = self.tournament_selection(species.genomes, tournament_size)
+        parent_2 = self.tournament_selection(species.genomes, tournament_size)
+
+        # Crossover between the two, and mutate offspring
+        offspring = self.crossover(parent_1, parent_2, next(self.next_genome_id))
+        offspring.mutate(mutate_parameters = False)
+        self.mutate_parameters([offspring])
+
+        # It takes the place of the worst genome
+        self.genomes.append(offspring)
+        return offspring
 
-                    # Create list of desired data
-                    species_data = [self.generation_number, len(species.genomes), species.best_genome.fitness]
+    # Remove a genome from the population and its species (the species goes too, if it is empty)
+    def remove_genome(self, genome: Genome):
+
+        # Remove from population
+        self.genomes.remove(genome)
+        self.episode_stats.pop(genome.ID, None)
+
+        # Remove from species
+        species = next(species for species in self.species if species.id == genome.species_ID)
+        species.genomes.remove(genome)
+
+        # Update species, or remove it if empty
+        if species.genomes:
+            if species.best_genome == genome:
+                species.best_genome = max(species.genomes, key=lambda x: x.fitness)
+            species.average_fitness += (species.average_fitness - genome.fitness) / len(species.genomes)
+        else:
+            self.species.remove(species)
+
+    # Take in genomes from another population (island model). Immigrants arrive unevaluated: their fitness on their own island
+    # says nothing about this one. So they are evaluated here first, and only then can they replace the best genome or shape
+    # the species. Every immigrant replaces the worst genome (never the best one)
+    def immigrate(self, genomes: list[Genome]):
+
+        # Evaluate the immigrants
+        self.finished = self.evaluate_genomes(genomes) or self.finished
+
+        for genome in genomes:
+
+            # Make room
+            worst = min((g for g in self.genomes if g != self.best_genome), key=lambda x: x.fitness)
+            self.remove_genome(worst)
+
+            # Add the immigrant and put it into a species
+            self.genomes.append(genome)
+            self.add_to_species(genome)
+
+            # If we have a better genome, update best genome
+            if genome.fitness > self.best_genome.fitness:
+                self.best_genome = genome
+
+        # Keep genomes sorted by fitness, as they are after an epoch
+        self.genomes.sort(reverse=True, key=lambda x: x.fitness)
+        for species in self.species:
+            species.genomes.sort(reverse=True, key=lambda x: x.fitness)
+
+    # Per generation bookkeeping in steady-state mode
+    def end_steady_state_generation(self):
+
+        # Next generation!
+        self.generation_number += 1
+
+        # Update staleness (no improvement of the best fitness since last generation) and age of species
+        for species in self.species:
+            if species.best_genome.fitness > species.best_fitness:
+                species.staleness = 0
+            else:
+                species.staleness += 1
+            species.best_fitness = species.best_genome.fitness
+            species.age += 1
 
-                    # Add to the 'container' for this species
-                    self.statistics['species'][species.id].append(species_data)
+        # Same as in an epoch: adjust threshold and apply the innovation history policy
+        self.adjust_compatibility_threshold()
+        self.update_innovation_history()
 
-                # Add general data
-                self.statistics['generations'].append(self.generation_number)
-                self.statistics['best_fitness'].append(self.best_genome.fitness)
-                self.statistics['total_gens'] = self.generation_number
+        # If verbose, print that sh*t to console!
+        if self.verbose:
+            self.printer()
+
+        # Keep statistics of this generation
+        self.record_statistics()
+
+    # Keep statistics of the current generation (for graphs and saving)
+    def record_statistics(self):
+
+        # If we want to either graph or save the statistics
+        if self.do_graph or self.save_stats:
+
+            # Loop through species
+            for species in self.species:
+                
+                # If we do not have a container for this species yet, create one (empty list)
+                while len(self.statistics['species']) <= species.id:
+                    self.statistics['species'].append([])
+
+                # Create list of desired data
+                species_data = [self.generation_number, len(species.genomes), species.best_genome.fitness]
+
+                # Add to the 'container' for this species
+                self.statistics['species'][species.id].append(species_data)
+
+            # Add general data
+            self.statistics['generations'].append(self.generation_number)
+            self.statistics['best_fitness'].append(self.best_genome.fitness)
+            self.statistics['total_gens'] = self.generation_number
+
+    # After evolution: stop workers, graph and save statistics
+    def end_run(self):
+
+        # Stop evaluator workers
+        if self.evaluator:
+            self.evaluator.shutdown()
 
         # After evolution, if we want graphs, make them
         if self.do_graph:
@@ -101,6 +338,7 @@ class Population:
         self.speciate()                         # Speciate (put genomes into species)
         self.adjust_compatibility_threshold()   # Adjust threshold to make sure we get to the desired nr of species
         self.update_species()                   # Update the species
+        self.update_innovation_history()        # Keep innovation history from growing without bound (if enabled)
         self.generation_number += 1             # Next generation!
 
     # Allocate children based on species performance
@@ -139,6 +377,9 @@ class Population:
     # Truncation and reproduction
     def truncate_and_reproduce(self):
 
+        # All offspring of this generation (their weights and activations are mutated together afterwards)
+        offspring_genomes = []
+
         # Loop through species
         for species in self.species:
 
@@ -168,11 +409,15 @@ class Population:
                 # Crossover between the two
                 offspring = self.crossover(parent_1, parent_2, next(self.next_genome_id))
 
-                # Mutate offspring
-                offspring.mutate()
+                # Mutate offspring structure
+                offspring.mutate(mutate_parameters = False)
 
                 # Add offspring to species
-                species.add_genome(offspring) 
+                species.add_genome(offspring)
+                offspring_genomes.append(offspring)
+
+        # Mutate weights and activations of all offspring in one go
+        self.mutate_parameters(offspring_genomes)
                 
         # Reset population genomes
         self.genomes[:] = []
@@ -183,6 +428,38 @@ class Population:
             species.genomes[:] = []
             species.age += 1
 
+    # Mutate connection weights and activation responses of many genomes at once (same operator as Genome.mutate_parameters)
+    def mutate_parameters(self, genomes: list[Genome]):
+
+        # Gather all connections and nodes
+        connections = [connection for genome in genomes for connection in genome.connections]
+        nodes = [node for genome in genomes for node in genome.nodes]
+        weights = np.fromiter((connection.weight for connection in connections), dtype=float, count=len(connections))
+        responses = np.fromiter((node.activation_response for node in nodes), dtype=float, count=len(nodes))
+
+        # Draw all random numbers for the connections: which ones mutate, which ones reset, and the perturbations
+        mutate_connection = np.random.random(len(connections)) < GENOME_CONFIG.MUTATION_WEIGHT
+        reset_weight = np.random.random(len(connections)) < CONNECTION_CONFIG.MUTATE_RESET
+        reset_weights = np.random.normal(0, CONNECTION_CONFIG.STD_DEV_WEIGHT, len(connections))
+        adjusted_weights = np.clip(weights + np.random.normal(0, CONNECTION_CONFIG.STD_DEV_WEIGHT_VAR, len(connections)), CONNECTION_CONFIG.MIN_WEIGHT, CONNECTION_CONFIG.MAX_WEIGHT)
+        new_weights = np.where(reset_weight, reset_weights, adjusted_weights)
+
+        # And for the nodes
+        mutate_node = np.random.random(len(nodes)) < GENOME_CONFIG.MUTATION_ACTIVATION
+        new_responses = responses + (np.random.random(len(nodes))*2-1) * GENOME_CONFIG.MUTATION_ACTIVATION_PERTURBATION
+
+        # Write the mutated values back
+        new_weights = new_weights.tolist()
+        for i in np.flatnonzero(mutate_connection).tolist():
+            connections[i].weight = new_weights[i]
+        new_responses = new_responses.tolist()
+        for i in np.flatnonzero(mutate_node).tolist():
+            nodes[i].activation_response = new_responses[i]
+
+        # Weights have changed, so cached gene arrays are out of date
+        for genome in genomes:
+            genome.genes = None
+
     # Fill the population if it does not have enough genomes
     def fill_population(self):
 
@@ -196,16 +473,33 @@ class Population:
             new_genome = Genome(next(self.next_genome_id), self.innovation_history, None, None, self.input_space, self.output_space)
             self.genomes.append(new_genome)
 
-    # Update fitnesses of genomes
-    def update_fitnesses(self):
+    # Evaluate genomes: build their networks and write fitness (and episode stats) to them. Returns whether any of them is finished
+    def evaluate_genomes(self, genomes: list[Genome]):
 
         # First, build their networks
-        for genome in self.genomes:
+        for genome in genomes:
             genome.build_network()
             genome.age += 1
 
+        # Evaluate genomes in parallel: only the compiled networks are sent to the workers
+        if self.evaluator:
+            results = self.evaluator.evaluate([genome.network for genome in genomes], self.generation_number)
+
+            # Write fitnesses and episode stats back. Finished if any episode says so
+            for genome, (fitness, stats) in zip(genomes, results):
+                genome.fitness = fitness
+                self.episode_stats[genome.ID] = stats
+            return any(stats.get("finished", False) for _, stats in results)
+
         # Fitness function determines whether it is finished or not
-        self.finished = self.fitness_function(self.genomes)
+        return self.fitness_function(genomes)
+
+    # Update fitnesses of genomes
+    def update_fitnesses(self):
+
+        # Evaluate the whole population (episode stats are only kept for this generation)
+        self.episode_stats = {}
+        self.finished = self.evaluate_genomes(self.genomes)
 
         # Sort genomes by fitness
         self.genomes.sort(reverse=True, key=lambda x: x.fitness)
@@ -220,24 +514,11 @@ class Population:
     # Speciation (moving genomes into species)
     def speciate(self):
 
-        # Loop through genomes
-        for genome in self.genomes:
-
-            # Boolean to indicate if a species has been found for it
-            has_species = False
+        # Compatibility threshold for this generation
+        threshold = SPECIES_CONFIG.COMPATABILITY_THRESHOLD * self.compatability_multiplier
 
-            # Loop through species
-            for species in self.species:
-
-                # If it is compatible, add it to the species genomes list
-                if species.compatible(genome, self.compatability_multiplier):
-                    species.add_genome(genome)
-                    has_species = True
-                    break
-            # If no species has been found, create a new one for it
-            if not has_species:
-                species_id = next(self.next_species_id)
-                self.species.append(Species(genome, species_id))
+        # Let the speciation engine assign genomes to species (and create new species where needed)
+        self.speciation_engine.speciate(self.genomes, self.species, threshold, self.next_species_id)
 
         # Update species but leave species out with no genomes
         self.species[:] = filter(lambda s: len(s.genomes) > 0, self.species)
@@ -288,6 +569,17 @@ class Population:
             # Compute average fitness of species
             species.average_fitness = aggregated_fitness / len(species.genomes)
 
+    # Apply the innovation history policy
+    def update_innovation_history(self):
+
+        # Drop innovations that no genome in the population carries anymore
+        if POPULATION_CONFIG.INNOVATION_POLICY == "compact":
+            self.innovation_history.compact(self.genomes)
+
+        # Or forget them all
+        elif POPULATION_CONFIG.INNOVATION_POLICY == "reset":
+            self.innovation_history.reset()
+
     # Tournament selection
     def tournament_selection(self, pool, tournament_size):
 
@@ -314,103 +606,57 @@ class Population:
     # Crossover between two parents
     def crossover(self, parent_1: Genome, parent_2: Genome, offspring_ID: int):
 
-        # Number of connections of each parent
-        n_1 = len(parent_1.connections)
-        n_2 = len(parent_2.connections)
-
         # Select better parrent according to fitness and fewest connections
         better = sorted([parent_1, parent_2], reverse=True, key=lambda x: (x.fitness, 1 / len(x.connections)))[0]
 
-        # Lists for nodes and connections of offspring
-        offspring_nodes = []
-        offspring_connections = []
+        # Connection genes of both parents as arrays, sorted by innovation number
+        genes_1 = parent_1.gene_arrays()
+        genes_2 = parent_2.gene_arrays()
 
-        # Idx's and set for node ids
-        i_1 = i_2 = 0
-        node_ids = set()
+        # Matching genes (same innovation number in both parents), with their indices in each parent
+        _, match_1, match_2 = np.intersect1d(genes_1.innovation_numbers, genes_2.innovation_numbers, assume_unique=True, return_indices=True)
 
-        while i_1 < n_1 or i_2 < n_2:
-            
-            # Select connections
-            parent_1_connection = parent_1.connections[i_1] if i_1 < n_1 else None
-            parent_2_connection = parent_2.connections[i_2] if i_2 < n_2 else None
-            selected_connection = None
-
-            # If both connections exist
-            if parent_1_connection and parent_2_connection:
-
-                # And innovation numbers are equal
-                if parent_1_connection.innovation_number == parent_2_connection.innovation_number:
-
-                    # Select connection at random
-                    idx = random.randint(0,1)
-                    selected_connection = (parent_1_connection,parent_2_connection)[idx]
-                    selected_genome = (parent_1,parent_2)[idx]
-                    i_1 += 1
-                    i_2 += 1
-
-                # If parent 2's connection has an earlier innovation
-                elif parent_2_connection.innovation_number < parent_1_connection.innovation_number:
-                    if better == parent_2:
-                        selected_connection = parent_2.connections[i_2]
-                        selected_genome = parent_2
-                    i_2 += 1
-
-                # If parent 1's connection has an earlier innovation
-                elif parent_1_connection.innovation_number < parent_2_connection.innovation_number:
-                    if better == parent_1:
-                        selected_connection = parent_1_connection
-                        selected_genome = parent_1
-                    i_1 += 1
-
-            # If only parent 2 has a valid connection
-            elif parent_1_connection == None and parent_2_connection:
-                if better == parent_2:
-                    selected_connection = parent_2.connections[i_2]
-                    selected_genome = parent_2
-                i_2 += 1
-
-            # If only parent 1 has a valid connection
-            elif parent_1_connection and parent_2_connection == None:
-                if better == parent_1:
-                    selected_connection = parent_1_connection
-                    selected_genome = parent_1
-                i_1 += 1
-
-            if selected_connection and len(offspring_connections) and offspring_connections[len(offspring_connections)-1].innovation_number == selected_connection.innovation_number:
-                selected_connection = None
-
-            # If a connection was selected
-            if selected_connection != None:
-
-                # Copy the connection from the parent
-                offspring_connections.append(deepcopy(selected_connection))
-
-                # If the origin node does not exist in the offspring nodes
-                if not selected_connection.origin_node_ID in node_ids:
-
-                    # Check if parent has it
-                    node = selected_genome.get_node_by_id(selected_connection.origin_node_ID)
-
-                    # If so
-                    if node != None:
-
-                        # Add it to the offspring's nodes
-                        offspring_nodes.append(deepcopy(node))
-                        node_ids.add(selected_connection.origin_node_ID)
-
-                # If the target node does not exist in the offspring nodes
-                if not selected_connection.target_node_ID in node_ids:
-
-                    # Check if parent has it
-                    node = selected_genome.get_node_by_id(selected_connection.target_node_ID)
-
-                    # If so
-                    if node != None:
-
-                        # Add it to the offspring's nodes
-                        offspring_nodes.append(deepcopy(node))
-                        node_ids.add(selected_connection.target_node_ID)
+        # For every matching gene, select a parent at random
+        from_parent_2 = np.random.randint(0, 2, len(match_1)).astype(bool)
+
+        # Disjoint and excess genes are only inherited from the better parent
+        better_genes, better_match = (genes_1, match_1) if better == parent_1 else (genes_2, match_2)
+        unmatched = np.ones(len(better_genes), dtype=bool)
+        unmatched[better_match] = False
+        unmatched = np.flatnonzero(unmatched)
+
+        # Stack the genes of both parents, so every gene has one index (parent 2's genes come after parent 1's)
+        n_1 = len(genes_1)
+        innovation_numbers = np.concatenate((genes_1.innovation_numbers, genes_2.innovation_numbers))
+        origins = np.concatenate((genes_1.origins, genes_2.origins))
+        targets = np.concatenate((genes_1.targets, genes_2.targets))
+        connections = parent_1.connections + parent_2.connections
+
+        # Select the genes and sort them by innovation number
+        selected = np.concatenate((np.where(from_parent_2, match_2 + n_1, match_1), unmatched + (0 if better == parent_1 else n_1)))
+        selected = selected[np.argsort(innovation_numbers[selected], kind='stable')]
+
+        # After an innovation history reset, the same node pair can carry two innovation numbers. Only take the first of them
+        pair_keys = origins[selected] * (max(origins.max(initial=0), targets.max(initial=0)) + 1) + targets[selected]
+        _, first_pairs = np.unique(pair_keys, return_index=True)
+        if len(first_pairs) < len(selected):
+            selected = selected[np.sort(first_pairs)]
+
+        # Copy the connection genes from the parents
+        offspring_connections = [connections[i].clone() for i in selected.tolist()]
+
+        # Nodes come from the parent that gave the first connection (in innovation order) using them
+        node_ids = np.stack((origins[selected], targets[selected]), axis=1).ravel()
+        node_from_parent_2 = np.repeat(selected >= n_1, 2)
+        unique_node_ids, first_use = np.unique(node_ids, return_index=True)
+
+        # Add a copy of their genes to the offspring's nodes
+        offspring_nodes = []
+        for node_id, use_parent_2 in zip(unique_node_ids.tolist(), node_from_parent_2[first_use].tolist()):
+            node = (parent_2 if use_parent_2 else parent_1).get_node_by_id(node_id)
+            if node != None:
+                offspring_nodes.append(node.clone())
+        node_ids = set(unique_node_ids.tolist())
 
         # For all input and output nodes
         for node in parent_1.get_edge_nodes():
@@ -419,7 +665,7 @@ class Population:
             if not node.ID in node_ids:
 
                 # Add it to the offspring's nodes
-                offspring_nodes.append(deepcopy(node))
+                offspring_nodes.append(node.clone())
                 node_ids.add(node.ID)
 
         # If literally all connections are disabled
@@ -0,0 +1,75 @@
+from .Species import Species
+from .Gene_Arrays import Gene_Arrays, batch_compatibility
+import numpy as np
+
+class Speciation_Engine:
+
+    def __init__(self):
+
+        self.cache                  = {}                # Memoized distances by (id of gene arrays, id of gene arrays)
+        self.cached_genes           = {}                # Gene arrays in the cache by id (keeps them alive, so their ids stay unique)
+        self.distance_matrix        = np.zeros((0, 0))  # Genome x representative distances of the last speciation
+        self.genome_ids             = []                # Genome ID of each row of the distance matrix
+        self.representative_ids     = []                # Species ID of each column of the distance matrix
+
+    # Distances of all genes to one representative. Only pairs that are not memoized yet are computed, in one batch
+    def distances_to(self, representative: Gene_Arrays, genes: list[Gene_Arrays]):
+
+        # Find the pairs that are missing from the cache
+        keys = [(min(id(representative), id(g)), max(id(representative), id(g))) for g in genes]
+        missing = [i for i, key in enumerate(keys) if key not in self.cache]
+
+        # Compute them all at once (compatibility is symmetric), and store them
+        if missing:
+            for i, distance in zip(missing, batch_compatibility(representative, [genes[i] for i in missing]).tolist()):
+                self.cache[keys[i]] = distance
+                self.cached_genes[id(genes[i])] = genes[i]
+            self.cached_genes[id(representative)] = representative
+
+        return np.array([self.cache[key] for key in keys])
+
+    # Put genomes into species: every genome goes to the first species whose representative is within the threshold
+    def speciate(self, genomes: list, species: list[Species], threshold: float, next_species_id):
+
+        # Gene arrays of all genomes. Genomes do not change after evaluation, so neither do these
+        genes = [genome.gene_arrays() for genome in genomes]
+
+        # Build the distance matrix against the current representatives (best genomes of the species), column by column
+        columns = [self.distances_to(s.best_genome.gene_arrays(), genes) for s in species]
+        self.representative_ids = [s.id for s in species]
+        self.genome_ids = [genome.ID for genome in genomes]
+
+        # Loop through genomes
+        for i, genome in enumerate(genomes):
+
+            # First compatible species, if any
+            compatible = [j for j, column in enumerate(columns) if column[i] <= threshold]
+
+            # If it is compatible with a species, add it to its genomes list
+            if compatible:
+                species[compatible[0]].add_genome(genome)
+
+            # If no species has been found, create a new one for it, with its own column in the matrix
+            else:
+                species.append(Species(genome, next(next_species_id)))
+                columns.append(self.distances_to(genes[i], genes))
+                self.representative_ids.append(species[-1].id)
+
+        # Expose the matrix for analysis
+        self.distance_matrix = np.stack(columns, axis=1) if columns else np.zeros((len(genomes), 0))
+
+        # Forget distances of genes that are no longer around
+        self.prune(genes + [s.best_genome.gene_arrays() for s in species])
+
+    # Species index of every genome in the last distance matrix for another threshold (first compatible column, -1 for none)
+    def assign(self, threshold: float):
+
+        compatible = self.distance_matrix <= threshold
+        return np.where(compatible.any(axis=1), compatible.argmax(axis=1), -1)
+
+    # Only keep the memoized distances between genes that are still alive
+    def prune(self, live_genes: list[Gene_Arrays]):
+
+        live = set(id(g) for g in live_genes)
+        self.cache = {key: distance for key, distance in self.cache.items() if key[0] in live and key[1] in live}
+        self.cached_genes = {key: g for key, g in self.cached_genes.items() if key in live}
@@ -19,6 +19,7 @@ class POPULATION_CONFIG:
     TOURNAMENT_SIZE = 3             # Tournament size
     ELITISM = True                  # Elimitism enabled or not
     MIN_ELITISM_SIZE = 0            # Minimum size of species needed for elitism
+    INNOVATION_POLICY = None        # Innovation history policy after each generation: None (keep all), "compact" (drop unused) or "reset" (forget connections, see Innovation_History.reset)
 
 # Parameters related to the species
 class SPECIES_CONFIG:
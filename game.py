@@ -1,35 +1,20 @@
 import pyglet
 from pyglet.gl import *
-from racegame.car import Car
-from vector_math import unit_vector_from_angle, do_collide
 from racegame.config import windowHeight, windowWidth
-from NEAT.Population import *
-import time
 
 class Game:
 
-    def __init__(self, number_agents: int, max_generations: int, track_limits: list, reward_sectors: list, initial_x: int, initial_y: int, initial_heading: float, window):
+    def __init__(self, window):
 
-        self.number_agents      = number_agents                             # Number of agents (genomes) to consider = population size
-        self.agents             = []                                        # List of agents
-        self.track_limits       = track_limits                              # List of track limit lines
-        self.reward_sectors     = reward_sectors                            # List of reward sector lines
-        self.max_generations    = max_generations                           # Max number of generations
-        self.initial_x          = initial_x                                 # Start x position
-        self.initial_y          = initial_y                                 # Start y position
         self.window             = window                                    # Window to draw stuff to
-        self.initial_heading    = unit_vector_from_angle(initial_heading)   # Initial heading unit vector
+        self.simulation         = None                                      # Simulation being observed
         self.best_genome        = None                                      # Best genome found so far
-        self.stop_on_lap        = False                                     # Stop when a lap is finished by at least one agent
-        self.champion_id        = None                                      # ID of champion (best genome)
+        self.generation_shown   = None                                      # Generation the texts and sprites belong to
+        self.sprites            = {}                                        # Sprite of every car of this generation (by car number)
 
-        # Open genome file of genome to inject. Load it using Pickle
-        initial_genome_file = open('./Results/silverstone-transfer-redbullring-transfer-spa', 'rb')
-        initial_genome = pickle.load(initial_genome_file)
-        initial_genome_file.close()
-
-        # Create population (or well, NEAT instance)
-        self.population     = Population(self.number_agents, self.max_generations, self.determine_fitness, 11, 2, inject_genomes = None)
+        # Car liveries: normal and champion (best genome of the previous generation)
+        self.car_image          = pyglet.image.load("./racegame/assets/racecar-pixel-art.png")
+        self.champion_image     = pyglet.image.load("./racegame/assets/racecar-pixel-art-v2.png")
 
         # Create text objects to display on screen
         self.gen_text       = pyglet.text.Label('Generation: 1',font_name='Century Gothic',font_size=15,bold=True,x=5, y=windowHeight - 5,anchor_x='left', anchor_y='top')
@@ -37,13 +22,24 @@ class Game:
         self.species_text   = pyglet.text.Label('Species: 0',font_name='Century Gothic',font_size=15,bold=True,x=5, y=windowHeight - 45,anchor_x='left', anchor_y='top')
         self.laps_text      = pyglet.text.Label('Max Laps: 0',font_name='Century Gothic',font_size=15,bold=True,x=5, y=windowHeight - 65,anchor_x='left', anchor_y='top')
 
-        # Run NEAT
-        self.population.run()
+    # Observer of the simulation: draw every timestep to the window
+    def observe(self, simulation):
+
+        self.simulation = simulation
 
-        # Below is what will happen AFTER NEAT is finished. So, save best genome to a file using Pickle
-        genome_dump_file = open("./Results/racecar-run-" + time.strftime("%Y%m%d-%H%M%S"), 'wb')
-        pickle.dump(self.population.best_genome, genome_dump_file)
-        genome_dump_file.close()
+        # New generation: update texts with the results of the last one, and forget the sprites of the old cars
+        generation_number = simulation.generation_number()
+        if generation_number != self.generation_shown:
+            self.generation_shown = generation_number
+            self.sprites = {}
+            self.best_genome = simulation.best_genome
+            self.gen_text.text      = "Generation: " + str(generation_number + 1)
+            self.score_text.text    = "Best score: " + str(simulation.best_fitness)
+            self.species_text.text  = "Species: " + str(len(simulation.population.species) if simulation.population else 0)
+            self.laps_text.text     = 'Max Laps: ' + str(simulation.laps_finished)
+
+        # Use window's my draw function
+        self.window.my_draw(self)
 
     # Render function: render everything for the current timestep to the window
     def render(self):
@@ -58,123 +54,39 @@ class Game:
         if self.best_genome:
             self.draw_genome()
 
-        # Loop through each agent and draw them all
-        for agent in self.agents:
-            if agent.active:
-                agent.draw()
-
-                # Optional: draw radar measurement points (is slower though)
-                # agent.show_radar()
-
-    # Determine fitness of the genomes
-    def determine_fitness(self, genomes: list[Genome]):
-
-        # Reset list of agents
-        self.agents[:] = []
-
-        # For each supplied genome
-        for i in range(len(genomes)):
-
-            # Set its initial fitness to 100
-            genomes[i].fitness = 100
-
-            # Is this genome the champion of the previous round? (used for setting the champion car from elitism to blue)
-            is_champion = genomes[i].ID == self.champion_id
-
-            # Create agent (car) with that genome as brain
-            self.agents.append(Car(genomes[i], self.initial_x, self.initial_y, self.initial_heading, is_champion))
-
-        # For 500 + n * 25 timesteps
-        for k in range(500 + self.population.generation_number * 25):
-
-            # If generation is finished, simply stop looping
-            if self.generation_finished():
-                break
-            
-            # Loop through agents
-            for agent in self.agents:
-
-                # Only do stuff if the agent is active
-                if agent.active:
-
-                    # Get next reward sector line from list
-                    next_reward_sector = self.reward_sectors[agent.next_sector]
-
-                    # Update movement of the agent
-                    agent.update(self.track_limits, next_reward_sector)
+        # Loop through each car that is still driving and draw them all
+        fleet = self.simulation.fleet if self.simulation else None
+        if fleet:
+            heading_angles = fleet.heading_angles()
+            for i in range(len(fleet)):
+                self.draw_car(fleet, i, heading_angles[i])
 
-                    # If it's been idling for more than 10 timesteps, deactivate it
-                    if agent.is_idling > 10:
-                        agent.active = False
+    # Draw a car of the fleet to the window
+    def draw_car(self, fleet, i: int, heading_angle: float):
 
-                    # Every time-step, remove 1 from its fitness
-                    agent.brain.fitness -= 1
+        # Create sprite on first draw, with the correct car livery
+        car_number = fleet.ids[i]
+        if car_number not in self.sprites:
+            self.sprites[car_number] = pyglet.sprite.Sprite(self.champion_image if self.simulation.champions[car_number] else self.car_image, x = 2 * windowWidth, y = 2 * windowHeight)
+        vehicle_sprite = self.sprites[car_number]
 
-                    # Loop through track limits
-                    for track_limit in self.track_limits:
+        # Forward and sideways pointing vectors
+        heading_x, heading_y = fleet.heading_x[i], fleet.heading_y[i]
+        side_x, side_y = -heading_y, heading_x
 
-                        # Check for collisions
-                        if do_collide(track_limit, agent):
+        # Calculate X and Y anchor points for sprite (x and y are mid point of vehicle)
+        anchor_x2 = fleet.x[i] - (heading_x * 0.5 * fleet.l - side_x * 0.5 * fleet.w)
+        anchor_y2 = fleet.y[i] - (heading_y * 0.5 * fleet.l - side_y * 0.5 * fleet.w)
 
-                            # If collided, penalise with -100 fitness and deactivate agent
-                            agent.brain.fitness -= 100
-                            agent.active = False
-                            break
+        # Calculate right angle to angle the sprite correctly
+        rotation_angle2 = heading_angle + 270
 
-                    # Check for collision with next reward sector (good thing!)
-                    if do_collide(next_reward_sector, agent):
+        # Update sprite position and rotation
+        vehicle_sprite.position = (anchor_x2, anchor_y2)
+        vehicle_sprite.rotation = -rotation_angle2
 
-                        # If so, update its next sector number
-                        agent.next_sector += 1
-
-                        # Loop around if we reached the end of the track
-                        if agent.next_sector == len(self.reward_sectors):
-                            agent.next_sector = 0
-                            agent.laps += 1
-
-                        # And of course, reward it with 100 fitness
-                        agent.brain.fitness += 100
-
-                    # If agent dips below 0 fitness, limit it to 1 but deactivate the agent
-                    if agent.brain.fitness <= 0:
-                        agent.active = False
-                        agent.brain.fitness = 1
-
-            # Use window's my draw function
-            self.window.my_draw(self)
-
-        # Temporary variables
-        best_fitness = 0
-        best_brain = None
-
-        # Loop through agents
-        for agent in self.agents:
-
-            # If it's better than the previous best, update best fitness and best genome
-            if agent.brain.fitness > best_fitness:
-                best_fitness = agent.brain.fitness
-                best_brain = agent.brain
-
-        # Update best genome
-        self.best_genome = best_brain
-
-        # Max nr of laps finished
-        laps_finished = max([agent.laps for agent in self.agents])
-
-        # Has any agent finished a lap yet?
-        is_finished = any([agent.laps > 0 for agent in self.agents]) and self.stop_on_lap
-
-        # Update texts on screen
-        self.gen_text.text      = "Generation: " + str(self.population.generation_number + 2)
-        self.score_text.text    = "Best score: " + str(best_fitness)
-        self.species_text.text  = "Species: " + str(len(self.population.species))
-        self.laps_text.text     = 'Max Laps: ' + str(laps_finished)
-
-        # Store ID of best genome to determine next generations champion agent
-        self.champion_id = self.best_genome.ID
-
-        # Return is_finished to NEAT
-        return is_finished
+        # Draw sprite to screen
+        vehicle_sprite.draw()
 
     # Draw best performing network so far to screen
     def draw_genome(self):
@@ -276,12 +188,3 @@ class Game:
         # Do reverse loop through objects to be drawn to draw nodes on top of connections (looks better)
         for i in range(len(draw_objects)):
             draw_objects[len(draw_objects) - i - 1].draw()
-
-    # Is generation finished?
-    def generation_finished(self):
-
-        # Only if there is at least one agent still active!
-        for agent in self.agents:
-            if agent.active:
-                return False
-        return True
\ No newline at end of file
@@ -2,26 +2,22 @@ import pyglet
 from pyglet.gl import *
 from pyglet.window import key
 from game import Game
-import json
+from racegame.track import Track, load_track
+from train import train
 from racegame.config import windowHeight, windowWidth, frame_rate
-import os
 
 class GameWindow(pyglet.window.Window):
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, track: Track, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.fps_display            = pyglet.window.FPSDisplay(self)    # FPS display object
 
-        with open("./racegame/tracks/Obstaclerun/obstacle_run.json", 'r') as f:
-            track_data              = json.load(f)                      # Data for track
-            self.asset_directory    = os.path.dirname(f.name)           # Directory of track data file
-
         # Obtain track image as listed in track data file
-        self.track_image = pyglet.image.load(self.asset_directory + "/" + track_data['bg_name'])
+        self.track_image = pyglet.image.load(track.background_path())
 
-        # Create a Game instance for this window
-        self.game = Game(40, 50, track_data['track_limits'], track_data['reward_gates'], track_data['start_pos']['x'], track_data['start_pos']['y'], track_data['start_pos']['heading'], self)
+        # Create a Game instance for this window: it draws the simulation it observes
+        self.game = Game(self)
 
     # When closing the window, stop the program
     def on_close(self):
@@ -64,5 +60,7 @@ class GameWindow(pyglet.window.Window):
             self.close()
 
 if __name__ == "__main__":
-    window = GameWindow(windowWidth, windowHeight, "Driving a race-car around a track with NEAT!", resizable=False)
+    track = load_track("./racegame/tracks/Obstaclerun/obstacle_run.json")
+    window = GameWindow(track, windowWidth, windowHeight, "Driving a race-car around a track with NEAT!", resizable=False)
+    train(track, 40, 50, observer = window.game.observe)
     pyglet.app.run()
\ No newline at end of file
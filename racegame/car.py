@@ -1,7 +1,6 @@
 import numpy as np
-import pyglet
-from racegame.config import windowWidth, windowHeight
 from vector_math import *
+from racegame.sensors import radar_angles, radar_rays, radar_distances
 
 class Car:
 
@@ -24,123 +23,41 @@ class Car:
         self.active                     = True              # Is this agent active?
         self.drift_momentum             = 0                 # Accumulated drift momentum
         self.drift_friction             = 0.87              # Friction during drift (drift decay)
-        self.line_collision_points      = []                # List of points where distance measurements cross track limits
+        self.line_collision_points      = []                # List of points where the distance measurements end (at a track limit or max distance)
         self.collision_line_distances   = []                # Distances of those points to the car
         self.is_idling                  = 0                 # Number of timesteps the agent has been idling for (standing still)
         self.next_sector                = 0                 # Index of next sector
         self.laps                       = 0                 # Number of laps completed by the agent
+        self.fitness                    = 100               # Fitness of the agent (starts at 100)
         self.n_look_directions          = 8                 # Number of directions for the measurement 'beams'
         self.max_radar_distance         = 300               # Max measurable distance (further away gets capped by this number)
+        self.clearance                  = 0                 # Lower bound on the distance from the center to the closest track limit (for collision culling)
         
         self.steer_input                = 0                 # Action vector: steer input
         self.throttle_input             = 0                 # Action vector: throttle input
+        self.is_champion                = is_champion       # Is this the champion of the previous generation? (drawn in a different livery)
 
-        # Pick the correct car livery
-        if not is_champion:
-            self.vehicle_pixel_art = pyglet.image.load("./racegame/assets/racecar-pixel-art.png")
-        else:
-            self.vehicle_pixel_art = pyglet.image.load("./racegame/assets/racecar-pixel-art-v2.png")
-
-        # Create sprite from pixel art
-        self.vehicle_sprite = pyglet.sprite.Sprite(self.vehicle_pixel_art, x = 2 * windowWidth, y = 2 * windowHeight)
-
-
-    # Draw the car to the window
-    def draw(self):
-
-        # Sideways pointing vector
-        side_vector = self.heading.rotate(90)
-
-        # Calculate X and Y anchor points for sprite (self.x and self.y are mid point of vehicle)
-        anchor_x2 = self.x - (self.heading.x * 0.5 * self.l - side_vector.x * 0.5 * self.w)
-        anchor_y2 = self.y - (self.heading.y * 0.5 * self.l - side_vector.y * 0.5 * self.w)
-
-        # Calculate right angle to angle the sprite correctly
-        rotation_angle2 = calc_angle(self.heading) + 270
-
-        # Update sprite position and rotation
-        self.vehicle_sprite.position = (anchor_x2, anchor_y2)
-        self.vehicle_sprite.rotation = -rotation_angle2
-
-        # Draw sprite to screen
-        self.vehicle_sprite.draw()
-
-
-    # Update radar measurements
-    def update_radar(self, track_limits: list):
-
-        # Empty the lists from the previous time-step
-        self.line_collision_points[:] = []
-        self.collision_line_distances[:] = []
-
-        # Loop through the number of directions
-        for i in range(self.n_look_directions):
-
-            # Calculate corresponding relative angle
-            relative_angle = -90 + i * (180 / (self.n_look_directions - 1))
-
-            # Perform measurement
-            self.radar_measurement(relative_angle, track_limits)
-
-    # Raycast to find next collision with a line (track limit)
-    def find_closest_object(self, x1: int, y1: int, x2: int, y2: int, track_limits: list):
-
-        # Placeholder for closest collision point distance. Initiate as very far distance.
-        minimal_distance = 2 * windowWidth
+    # Update radar measurements: all beams against all track limits at once (lines as an (n, 4) array of x, y, x2, y2, optionally with their TrackGrid),
+    # or from an approximate radar field (sphere traced over a DistanceField, or looked up in a RadarTable)
+    def update_radar(self, limit_lines, limit_grid = None, radar_field = None):
 
-        # Create vec2 to hold collision point
-        closest_collision_point = vec2(0, 0)
+        # Beams: heading rotated by the relative beam angles, with max allowable length
+        ray_x, ray_y = radar_rays([self.heading.x], [self.heading.y], radar_angles(self.n_look_directions), self.max_radar_distance)
 
-        # Loop through track limits
-        for track_limit in track_limits:
-
-            # Determine collision point with track limit
-            collision_point = get_collision_point(x1, y1, x2, y2, track_limit['x'], track_limit['y'], track_limit['x2'], track_limit['y2'])
-
-            # If no such collision point exists, go to next track limit in loop
-            if collision_point == None:
-                continue
-
-            # If the distance is below the minimal distance, we have a new closest point
-            if dist(x1, y1, collision_point.x, collision_point.y) < minimal_distance:
-
-                # Update minimal distance and collision point vec2
-                minimal_distance = dist(x1, y1, collision_point.x, collision_point.y)
-                closest_collision_point = vec2(collision_point)
-
-        # Return closest point
-        return closest_collision_point
-
-    # Perform a single radar measurement
-    def radar_measurement(self, relative_angle: float, track_limits: list):
-
-        # Transform relative radar heading to absolute window frame heading
-        absolute_radar_heading = self.heading.rotate(relative_angle)
-
-        # Create vector pointing in the right direction, with max allowable length
-        absolute_radar_heading = absolute_radar_heading.normalize() * self.max_radar_distance
-
-        # Find collision point
-        collision_point = self.find_closest_object(self.x, self.y, self.x + absolute_radar_heading.x, self.y + absolute_radar_heading.y, track_limits)
-
-        # If no collision point exists (too far away or nothing in its way), set to max distance
-        if collision_point.x == 0 and collision_point.y == 0:
-            self.collision_line_distances.append(self.max_radar_distance)
-
-        # Else we do have a collision between the raycast line and track limit.
-        # Add collision distance to list
-        else:
-            self.collision_line_distances.append(dist(self.x, self.y, collision_point.x, collision_point.y))
-
-        # Add collision point to list too, for visualisation purposes
-        self.line_collision_points.append(collision_point)
+        # Distance to the closest track limit along every beam (max distance if nothing is in the way)
+        self.collision_line_distances[:] = radar_distances(np.array([self.x]), np.array([self.y]), ray_x, ray_y, limit_lines, self.max_radar_distance, limit_grid, radar_field)[0].tolist()
 
+        # Points where the beams end, for visualisation purposes
+        self.line_collision_points[:] = [vec2(self.x + dx * d / self.max_radar_distance, self.y + dy * d / self.max_radar_distance) for dx, dy, d in zip(ray_x[0], ray_y[0], self.collision_line_distances)]
 
     # Compute next action from observations using network (brain)
     def compute(self, measured_state: list):
 
-        # Feed state to network and obtain output
-        outputs = self.brain.feed_forward(measured_state)
+        # Feed state to network and obtain output, then take it as action
+        self.set_action(self.brain.feed_forward(measured_state))
+
+    # Set action from network output (also used when a batch of networks computes all actions at once)
+    def set_action(self, outputs):
 
         # Throttle and steering input come directly from network output
         self.throttle_input = outputs[0]
@@ -150,14 +67,13 @@ class Car:
         # steer output node between -1 and 1, -1 full left and 1 full right
 
     # Measure current state
-    def measure_state(self, track_limits, next_reward_sector):
+    def measure_state(self, limit_lines, next_gate_center, limit_grid = None, radar_field = None):
 
         # First, simply update radar measurements
-        self.update_radar(track_limits)
+        self.update_radar(limit_lines, limit_grid, radar_field)
 
-        # Get center of next reward gate, and get vector from self towards it. Then determine target heading
-        gate_center = vec2((next_reward_sector['x'] + next_reward_sector['x2']) / 2, (next_reward_sector['y'] + next_reward_sector['y2']) / 2)
-        relative_position = gate_center - vec2(self.x, self.y)
+        # Get vector from self towards the center of the next reward gate. Then determine target heading
+        relative_position = vec2(float(next_gate_center[0]), float(next_gate_center[1])) - vec2(self.x, self.y)
         normalized_target_heading = (calc_angle(self.heading) - calc_angle(relative_position)) % 360
         if normalized_target_heading > 180:
             normalized_target_heading = -1 * (360 - normalized_target_heading)
@@ -241,20 +157,17 @@ class Car:
         self.x += position_change.x
         self.y += position_change.y
 
+        # The closest track limit can be at most as much closer as the agent moved
+        self.clearance -= position_change.length()
+
     # Update full state of vehicle
-    def update(self, track_limits: list, next_reward_sector: list):
+    def update(self, limit_lines, next_gate_center, limit_grid = None, radar_field = None):
 
         # Measure state and obtain it
-        measured_state = self.measure_state(track_limits, next_reward_sector)
+        measured_state = self.measure_state(limit_lines, next_gate_center, limit_grid, radar_field)
 
         # Compute and take action
         self.compute(measured_state)
 
         # Update state
         self.update_movement()
-
-    # (UNUSED) visualisation: show collision points between radar and track limits
-    def show_radar(self):
-        for point in self.line_collision_points:
-            point = pyglet.shapes.Circle(point.x, point.y, 3, color = (255, 0, 0))
-            point.draw()
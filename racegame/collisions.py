@@ -0,0 +1,92 @@
+import numpy as np
+
+# Corners of the (oriented) boxes of cars, going around each box: returns x and y, both (n_cars, 4)
+def box_corners(x, y, heading_x, heading_y, w: float, l: float):
+
+    # Multipliers of the sideways (heading turned by 90 degrees) and forward half sizes per corner
+    sideways = np.array([1, 1, -1, -1]) * w / 2
+    forward = np.array([1, -1, -1, 1]) * l / 2
+    heading_x, heading_y = np.asarray(heading_x, dtype=float)[:, None], np.asarray(heading_y, dtype=float)[:, None]
+
+    return (np.asarray(x, dtype=float)[:, None] - sideways * heading_y + forward * heading_x,
+            np.asarray(y, dtype=float)[:, None] + sideways * heading_x + forward * heading_y)
+
+# Do segments a-b and c-d touch? All inputs broadcast against each other. Exact orientation tests, so parallel,
+# collinear and zero length segments need no special treatment (and no nudging of their end points)
+def segments_intersect(ax, ay, bx, by, cx, cy, dx, dy):
+
+    # Side of the other segment's line every end point is on
+    o1 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    o2 = (bx - ax) * (dy - ay) - (by - ay) * (dx - ax)
+    o3 = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx)
+    o4 = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx)
+
+    # Is point (px, py), on the line of segment s-t, also within the segment?
+    def within(sx, sy, tx, ty, px, py):
+        return (np.minimum(sx, tx) <= px) & (px <= np.maximum(sx, tx)) & (np.minimum(sy, ty) <= py) & (py <= np.maximum(sy, ty))
+
+    # Proper crossing, or an end point lying on the other segment
+    return (((o1 > 0) & (o2 < 0) | (o1 < 0) & (o2 > 0)) & ((o3 > 0) & (o4 < 0) | (o3 < 0) & (o4 > 0))
+            | (o1 == 0) & within(ax, ay, bx, by, cx, cy) | (o2 == 0) & within(ax, ay, bx, by, dx, dy)
+            | (o3 == 0) & within(cx, cy, dx, dy, ax, ay) | (o4 == 0) & within(cx, cy, dx, dy, bx, by))
+
+# Do car boxes (corners as made by box_corners, (n, 4)) touch segments (n x 4 array of x, y, x2, y2, one per box)?
+# Touching is crossing an edge of the box, or lying inside it
+def box_segment_hits(corners_x, corners_y, segments):
+
+    # Any of the four edges crossing the segment
+    next_x, next_y = corners_x[:, [1, 2, 3, 0]], corners_y[:, [1, 2, 3, 0]]
+    crossing = segments_intersect(segments[:, 0, None], segments[:, 1, None], segments[:, 2, None], segments[:, 3, None], corners_x, corners_y, next_x, next_y).any(axis=1)
+
+    # Or the segment's start inside the box (then the whole segment is, if it crosses no edge): within both pairs of opposite edges
+    side_x, side_y = corners_x[:, 0] - corners_x[:, 3], corners_y[:, 0] - corners_y[:, 3]
+    forward_x, forward_y = corners_x[:, 0] - corners_x[:, 1], corners_y[:, 0] - corners_y[:, 1]
+    relative_x, relative_y = segments[:, 0] - corners_x[:, 2], segments[:, 1] - corners_y[:, 2]
+    along_side = relative_x * side_x + relative_y * side_y
+    along_forward = relative_x * forward_x + relative_y * forward_y
+    inside = (0 <= along_side) & (along_side <= side_x * side_x + side_y * side_y) & (0 <= along_forward) & (along_forward <= forward_x * forward_x + forward_y * forward_y)
+
+    return crossing | inside
+
+# Crash vector of cars against segments (m x 4 array). Candidate (car, segment) pairs can be given (e.g. from a TrackGrid),
+# otherwise every car is tested against every segment
+def box_collisions(corners_x, corners_y, segments, pairs = None):
+
+    if pairs == None:
+        pairs = np.repeat(np.arange(len(corners_x)), len(segments)), np.tile(np.arange(len(segments)), len(corners_x))
+    cars, candidates = pairs
+
+    hits = box_segment_hits(corners_x[cars], corners_y[cars], segments[candidates])
+    return np.bincount(cars[hits], minlength=len(corners_x)) > 0
+
+# Safety margin of collision culling (px, against rounding): cars are tested when their clearance is within reach of their box plus this
+CULLING_MARGIN = 1.0
+
+# Distances of points to the closest of the segments (m x 4 array), their clearance. Candidate (point, segment) pairs can be
+# given (e.g. from a TrackGrid), otherwise every point is measured against every segment. Inf where a point has no segments
+def segment_clearances(x, y, segments, pairs = None):
+
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if pairs == None:
+        pairs = np.repeat(np.arange(len(x)), len(segments)), np.tile(np.arange(len(segments)), len(x))
+    points, candidates = pairs
+
+    clearances = np.full(len(x), np.inf)
+    np.minimum.at(clearances, points, point_segment_distances(x[points], y[points], segments[candidates]))
+    return clearances
+
+# Distances of points to segments (rows of x, y, x2, y2), through the closest point on the segment (zero length segments are
+# their start point). Points and segments broadcast against each other
+def point_segment_distances(x, y, segments):
+
+    x1, y1 = segments[..., 0], segments[..., 1]
+    dx, dy = segments[..., 2] - x1, segments[..., 3] - y1
+    length_squared = dx * dx + dy * dy
+    u = np.clip(((x - x1) * dx + (y - y1) * dy) / np.where(length_squared > 0, length_squared, 1), 0, 1)
+
+    return np.hypot(x - (x1 + u * dx), y - (y1 + u * dy))
+
+# Can cars with these clearances touch a segment? Their box lies within half its diagonal of the center (however it is turned),
+# so segments that are farther away cannot touch it
+def may_collide(clearance, w: float, l: float):
+    return clearance <= np.hypot(w, l) / 2 + CULLING_MARGIN
@@ -0,0 +1,189 @@
+import numpy as np
+from collections import deque
+from racegame.track import Track, load_track
+from racegame.track_grid import TrackGrid
+from racegame.sensors import radar_angles, radar_rays, radar_distances
+import argparse
+import glob
+import os
+
+class DistanceField:
+
+    def __init__(self, field, origin_x: float, origin_y: float, resolution: float, trace_tolerance: float = None, trace_steps: int = 128):
+
+        self.field              = field                         # Signed distance to the closest track limit at the raster points (float32, n_x x n_y). Positive on the track, negative off it
+        self.origin_x           = origin_x                      # X of raster point [0, 0]
+        self.origin_y           = origin_y                      # Y of raster point [0, 0]
+        self.resolution         = resolution                    # Distance between raster points
+        self.trace_tolerance    = trace_tolerance or resolution # Sphere tracing: smallest step along a beam (larger = faster, but thin corners of track limits can be skipped)
+        self.trace_steps        = trace_steps                   # Sphere tracing: max steps per beam (beams still going after that read as max distance)
+
+    # Bilinear lookup of the field at points (clamped to the raster)
+    def sample(self, x, y):
+
+        fx = np.clip((np.asarray(x, dtype=float) - self.origin_x) / self.resolution, 0, self.field.shape[0] - 1.000001)
+        fy = np.clip((np.asarray(y, dtype=float) - self.origin_y) / self.resolution, 0, self.field.shape[1] - 1.000001)
+        ix, iy = fx.astype(int), fy.astype(int)
+        wx, wy = fx - ix, fy - iy
+
+        return ((1 - wx) * (1 - wy) * self.field[ix, iy] + wx * (1 - wy) * self.field[ix + 1, iy]
+                + (1 - wx) * wy * self.field[ix, iy + 1] + wx * wy * self.field[ix + 1, iy + 1])
+
+    # Crash vector of cars: is any corner or edge midpoint of the car's box off the track?
+    def collides(self, x, y, heading_x, heading_y, w: float, l: float):
+
+        # Box points relative to the center: along the heading (l) and sideways (w)
+        forward = np.array([1, 1, -1, -1, 1, 0, -1, 0]) * l / 2
+        sideways = np.array([1, -1, -1, 1, 0, -1, 0, 1]) * w / 2
+        heading_x, heading_y = np.asarray(heading_x)[..., None], np.asarray(heading_y)[..., None]
+        points_x = np.asarray(x)[..., None] + forward * heading_x - sideways * heading_y
+        points_y = np.asarray(y)[..., None] + forward * heading_y + sideways * heading_x
+
+        return (self.sample(points_x, points_y) < 0).any(axis=-1)
+
+    # Radar backend (see radar_distances): sphere traced
+    def radar_distances(self, x, y, ray_x, ray_y, max_distance: float):
+        return self.sphere_trace(x, y, ray_x, ray_y, max_distance)
+
+    # Radar distances by sphere tracing: every beam (n_cars, n_rays, as made by radar_rays) jumps forward by the distance
+    # to the closest track limit (shortened by the interpolation error of the raster, but at least the trace tolerance)
+    # until it crosses into negative distance, i.e. over a track limit. The crossing is then found by bisection
+    def sphere_trace(self, x, y, ray_x, ray_y, max_distance: float, refinements: int = 8):
+
+        shape = np.shape(ray_x)
+        length = np.sqrt(ray_x * ray_x + ray_y * ray_y)
+        direction_x, direction_y = (ray_x / length).ravel(), (ray_y / length).ravel()
+        x, y = np.broadcast_to(np.asarray(x, dtype=float)[:, None], shape).ravel(), np.broadcast_to(np.asarray(y, dtype=float)[:, None], shape).ravel()
+        safety = self.resolution * np.sqrt(0.5)
+
+        # March the beams that are still going: last (still on track) and current distance along every beam
+        last = np.zeros(len(x))
+        travelled = np.zeros(len(x))
+        hit = np.zeros(len(x), dtype=bool)
+        going = np.arange(len(x))
+        for _ in range(self.trace_steps):
+            distance = self.sample(x[going] + direction_x[going] * travelled[going], y[going] + direction_y[going] * travelled[going])
+            hit[going[distance < 0]] = True
+            still_going = (distance >= 0) & (travelled[going] < max_distance)
+            going, distance = going[still_going], distance[still_going]
+            last[going] = travelled[going]
+            travelled[going] = np.minimum(travelled[going] + np.maximum(distance - safety, self.trace_tolerance), max_distance)
+            if len(going) == 0:
+                break
+
+        # Bisection between the last point on the track and the first one off it
+        hits = np.nonzero(hit)[0]
+        for _ in range(refinements):
+            middle = (last[hits] + travelled[hits]) / 2
+            off_track = self.sample(x[hits] + direction_x[hits] * middle, y[hits] + direction_y[hits] * middle) < 0
+            travelled[hits[off_track]] = middle[off_track]
+            last[hits[~off_track]] = middle[~off_track]
+
+        return np.where(hit, travelled, max_distance).reshape(shape)
+
+# Build the signed distance field of a set of segments (m x 4 array of x, y, x2, y2). The track is the area reachable from
+# the inside point without crossing a segment (a flood fill), so it has a positive sign. The raster covers the segments plus a margin
+def build_distance_field(segments, inside_x: float, inside_y: float, resolution: float = 2.0, margin: float = 20.0, chunk_size: int = 4096):
+
+    segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+    origin_x = segments[:, [0, 2]].min() - margin
+    origin_y = segments[:, [1, 3]].min() - margin
+    n_x = int(np.ceil((segments[:, [0, 2]].max() + margin - origin_x) / resolution)) + 1
+    n_y = int(np.ceil((segments[:, [1, 3]].max() + margin - origin_y) / resolution)) + 1
+    points_x, points_y = np.meshgrid(origin_x + np.arange(n_x) * resolution, origin_y + np.arange(n_y) * resolution, indexing='ij')
+    points_x, points_y = points_x.ravel(), points_y.ravel()
+
+    # Unsigned distance of every raster point to the closest segment (in chunks of points, to limit memory)
+    x1, y1 = segments[:, 0], segments[:, 1]
+    dx, dy = segments[:, 2] - x1, segments[:, 3] - y1
+    length_squared = np.where(dx * dx + dy * dy > 0, dx * dx + dy * dy, 1)
+    distances = np.empty(len(points_x))
+    for start in range(0, len(points_x), chunk_size):
+        px, py = points_x[start:start + chunk_size, None], points_y[start:start + chunk_size, None]
+        u = np.clip(((px - x1) * dx + (py - y1) * dy) / length_squared, 0, 1)
+        distances[start:start + chunk_size] = np.hypot(px - (x1 + u * dx), py - (y1 + u * dy)).min(axis=1)
+
+    # Flood fill from the inside point. A segment between two neighbouring points is always within half the resolution
+    # of one of them, so those points (walls) are not crossed
+    wall = distances <= resolution / 2
+    inside = np.zeros(len(points_x), dtype=bool)
+    start = int(round((inside_x - origin_x) / resolution)) * n_y + int(round((inside_y - origin_y) / resolution))
+    inside[start] = True
+    queue = deque([start])
+    while queue:
+        point = queue.popleft()
+        i, j = divmod(point, n_y)
+        for neighbour, valid in ((point - n_y, i > 0), (point + n_y, i < n_x - 1), (point - 1, j > 0), (point + 1, j < n_y - 1)):
+            if valid and not inside[neighbour] and not wall[neighbour]:
+                inside[neighbour] = True
+                queue.append(neighbour)
+
+    # Wall points are on the track too if they can be reached from a neighbouring track point without crossing a segment
+    grid = TrackGrid(segments)
+    for offset, valid in ((-n_y, points_x > origin_x), (n_y, points_x < origin_x + (n_x - 1) * resolution), (-1, points_y > origin_y), (1, points_y < origin_y + (n_y - 1) * resolution)):
+        candidates = np.nonzero(wall & ~inside & valid)[0]
+        candidates = candidates[inside[candidates + offset] & ~wall[candidates + offset]]
+        from_x, from_y = points_x[candidates + offset], points_y[candidates + offset]
+        crossing = grid.raycast(from_x, from_y, points_x[candidates] - from_x, points_y[candidates] - from_y)
+        inside[candidates[np.isinf(crossing)]] = True
+
+    field = np.where(inside, distances, -distances).astype(np.float32).reshape(n_x, n_y)
+    return DistanceField(field, origin_x, origin_y, resolution)
+
+# Distance field of a track, stored in its compiled bundle (so it belongs to this version of the track, like the radar table).
+# Built on first use; tracks that are not loaded from a bundle get a field in memory
+def load_distance_field(track: Track, resolution: float = 2.0, **settings):
+
+    if track.bundle == None:
+        distance_field = build_distance_field(track.limit_lines, track.start_x, track.start_y, resolution)
+        return DistanceField(distance_field.field, distance_field.origin_x, distance_field.origin_y, resolution, **settings)
+
+    path = os.path.join(track.bundle, "sdf-%gpx.npz" % resolution)
+    if not os.path.exists(path):
+        distance_field = build_distance_field(track.limit_lines, track.start_x, track.start_y, resolution)
+
+        # Write under a temporary name first, so other processes never see half a field
+        temporary = path + ".tmp-" + str(os.getpid()) + ".npz"
+        np.savez(temporary, field = distance_field.field, origin = [distance_field.origin_x, distance_field.origin_y])
+        os.replace(temporary, path)
+
+    with np.load(path) as cached:
+        return DistanceField(cached['field'], float(cached['origin'][0]), float(cached['origin'][1]), resolution, **settings)
+
+# Compare a distance field with the exact radar and collision tests at random poses on the track (points on the reward gates).
+# Returns max and mean radar error, and the fraction of poses where the crash test disagrees
+def error_report(track: Track, distance_field: DistanceField, n_poses: int = 2000, seed: int = 0):
+
+    from racegame.fleet import CarFleet
+
+    x, y, heading = track.random_poses(n_poses, seed)
+
+    # Radar
+    fleet = CarFleet(n_poses, 0, 0, 0)
+    fleet.x, fleet.y, fleet.heading_x, fleet.heading_y = x, y, np.cos(heading), np.sin(heading)
+    ray_x, ray_y = radar_rays(fleet.heading_x, fleet.heading_y, radar_angles(fleet.n_look_directions), fleet.max_radar_distance)
+    exact = radar_distances(x, y, ray_x, ray_y, track.limit_lines, fleet.max_radar_distance, track.limit_grid)
+    traced = distance_field.sphere_trace(x, y, ray_x, ray_y, fleet.max_radar_distance)
+    radar_error = np.abs(traced - exact)
+
+    # Collisions
+    exact_crashes, _ = fleet.collisions(track.limit_lines, track.gate_lines, track.limit_grid)
+    field_crashes = distance_field.collides(x, y, fleet.heading_x, fleet.heading_y, fleet.w, fleet.l)
+
+    return radar_error.max(), radar_error.mean(), (exact_crashes != field_crashes).mean()
+
+# Build (or load) the distance fields of tracks and report their errors: python -m racegame.distance_field [--resolution R] [tracks...]
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = "Build signed distance fields of tracks and compare them with the exact sensors")
+    parser.add_argument("tracks", nargs = "*", default = sorted(glob.glob("./racegame/tracks/*/*.json")), help = "track json files")
+    parser.add_argument("--resolution", type = float, default = 2.0, help = "distance between raster points (px)")
+    parser.add_argument("--tolerance", type = float, default = None, help = "smallest sphere tracing step (px, default: the resolution)")
+    parser.add_argument("--steps", type = int, default = 128, help = "max sphere tracing steps per beam")
+    args = parser.parse_args()
+
+    for path in args.tracks:
+        track = load_track(path)
+        distance_field = load_distance_field(track, args.resolution, trace_tolerance = args.tolerance, trace_steps = args.steps)
+        max_error, mean_error, crash_disagreement = error_report(track, distance_field)
+        print("%-20s raster %4d x %-4d  radar error max %6.2f mean %5.2f px  crash test disagrees %.2f%%" % (os.path.basename(path), *distance_field.field.shape, max_error, mean_error, 100 * crash_disagreement))
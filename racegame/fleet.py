@@ -0,0 +1,228 @@
+import numpy as np
+from vector_math import unit_vector_from_angle, rotate_vectors, calc_angles, rad_to_deg
+from racegame.sensors import radar_angles, radar_rays, radar_distances, coherent_radar_distances
+from racegame.collisions import box_corners, box_segment_hits, box_collisions, segment_clearances, may_collide, point_segment_distances
+
+class CarFleet:
+
+    # Per car state arrays. Only the cars that are still driving are kept in them (see compact)
+    STATE_FIELDS = ('ids', 'x', 'y', 'heading_x', 'heading_y', 'v', 'drift_momentum', 'is_idling', 'next_sector', 'laps', 'fitness', 'active', 'throttle_input', 'steer_input', 'clearance', 'radar_anchor_x', 'radar_anchor_y', 'radar_neighbourhood')
+
+    def __init__(self, n_cars: int, initial_x: float, initial_y: float, initial_heading: float):
+
+        # Vehicle model (same for all cars, see Car)
+        self.w                          = 10                                # Width of the vehicles
+        self.l                          = 20                                # Length of the vehicles
+        self.turning_rate               = 5.0 / self.l                      # Turning rate of the vehicles while steering fully to one side
+        self.friction                   = 0.98                              # Friction (for slowing down while in neutral)
+        self.max_speed                  = self.l / 2                        # Max allowable speed
+        self.max_reverse_speed          = -1 * self.l / 2                   # Max allowable reverse speed
+        self.a_speed                    = self.l / 160                      # Change in acceleration
+        self.drift_friction             = 0.87                              # Friction during drift (drift decay)
+        self.n_look_directions          = 8                                 # Number of directions for the measurement 'beams'
+        self.max_radar_distance         = 300                               # Max measurable distance (further away gets capped by this number)
+        self.radar_angles               = radar_angles(self.n_look_directions)  # Relative angles of the beams
+        self.clearance_radius           = 60.0                              # Collision culling with a TrackGrid: clearances are measured up to this distance
+        self.neighbourhood_radius       = 120.0                             # Coherent radar: track limits within this distance of a car are tested first
+        self.neighbourhood_refresh      = 40.0                              # Coherent radar: the track limits near a car are looked up again once it moved this far
+        self.coherent_radar_cars        = 100                               # Coherent radar: only used while at most this many cars drive (larger fleets are faster through a TrackGrid)
+
+        # Initial heading as unit vector (the heading is kept as a vector, like Car, so rounding is the same)
+        initial_heading_vector = unit_vector_from_angle(initial_heading)
+
+        # State of the cars that are still driving
+        self.ids                        = np.arange(n_cars)                 # Car number (index in the full fleet)
+        self.x                          = np.full(n_cars, initial_x, dtype=float)       # X positions
+        self.y                          = np.full(n_cars, initial_y, dtype=float)       # Y positions
+        self.heading_x                  = np.full(n_cars, initial_heading_vector.x)     # Heading vectors, x
+        self.heading_y                  = np.full(n_cars, initial_heading_vector.y)     # Heading vectors, y
+        self.v                          = np.zeros(n_cars)                  # Velocities
+        self.drift_momentum             = np.zeros(n_cars)                  # Accumulated drift momentum
+        self.is_idling                  = np.zeros(n_cars, dtype=int)       # Number of timesteps the cars have been idling for
+        self.next_sector                = np.zeros(n_cars, dtype=int)       # Index of next sector
+        self.laps                       = np.zeros(n_cars, dtype=int)       # Number of laps completed
+        self.fitness                    = np.full(n_cars, 100)              # Fitness (starts at 100)
+        self.active                     = np.ones(n_cars, dtype=bool)       # Still active? (inactive cars are dropped by compact)
+        self.throttle_input             = np.zeros(n_cars)                  # Action vector: throttle input
+        self.steer_input                = np.zeros(n_cars)                  # Action vector: steer input
+        self.clearance                  = np.zeros(n_cars)                  # Lower bounds on the distance from the centers to the closest track limit (collision culling)
+        self.radar_anchor_x             = np.full(n_cars, np.inf)           # Coherent radar: x positions where the track limits nearby were last looked up
+        self.radar_anchor_y             = np.full(n_cars, np.inf)           # Coherent radar: y positions of that
+        self.radar_neighbourhood        = np.zeros((n_cars, 0), dtype=bool) # Coherent radar: track limits near those positions (n_cars x n_track_limits mask)
+
+        # Final results of all cars (by car number), filled in when cars are dropped
+        self.final_fitness              = np.full(n_cars, 100)              # Fitness
+        self.final_laps                 = np.zeros(n_cars, dtype=int)       # Laps completed
+        self.final_next_sector          = np.zeros(n_cars, dtype=int)       # Next sector
+
+    # Number of cars still driving
+    def __len__(self):
+        return len(self.ids)
+
+    # Absolute headings of all cars (degrees)
+    def heading_angles(self):
+        return calc_angles(self.heading_x, self.heading_y)
+
+    # Set actions from network outputs (n_cars x 2: throttle, steer)
+    def set_actions(self, outputs):
+        self.throttle_input = outputs[:, 0]
+        self.steer_input = outputs[:, 1]
+
+    # Update movement of all cars during a time-step (same model as Car.update_movement)
+    def update_movement(self):
+
+        # Drift factor according to speed
+        speed = np.abs(self.v)
+        drift_factor = np.where(speed < 5, speed / 5.0, 1.0)
+        drift_factor = np.where(self.v < 0, -drift_factor, drift_factor)
+
+        # Drift momentum change (only at speed)
+        drift_momentum_change = np.where(self.v < 5, 0.0, self.v * self.turning_rate * self.w / (9.0 * 4.0))
+
+        # When steering, update heading and drift momentum
+        self.heading_x, self.heading_y = rotate_vectors(self.heading_x, self.heading_y, rad_to_deg(self.turning_rate) * drift_factor * self.steer_input)
+        self.drift_momentum = self.drift_momentum - drift_momentum_change * np.sign(self.steer_input)
+
+        # Set acceleration according to throttle (braking is three times as strong)
+        a = self.a_speed * self.throttle_input
+        a = np.where(((self.v < 0) & (self.throttle_input > 0)) | ((self.v > 0) & (self.throttle_input < 0)), a * 3, a)
+
+        # Update speed according to friction and acceleration. Also limit it by max speeds
+        self.v = np.clip((self.v + a) * self.friction, self.max_reverse_speed, self.max_speed)
+
+        # Count idling timesteps
+        self.is_idling = np.where(np.abs(self.v) < 0.01, self.is_idling + 1, 0)
+
+        # Move along the heading, and sideways (heading turned by 90 degrees) by the drift momentum. NOTE: like Car, the position change is not normalized
+        dx = self.drift_momentum * -self.heading_y + self.v * self.heading_x
+        dy = self.drift_momentum * self.heading_x + self.v * self.heading_y
+        self.x = self.x + dx
+        self.y = self.y + dy
+
+        # The closest track limit can be at most as much closer as the cars moved
+        self.clearance = self.clearance - np.hypot(dx, dy)
+
+        # Drift momentum decay
+        self.drift_momentum = self.drift_momentum * self.drift_friction
+
+    # Measure current state of all cars (n_cars x 11, same as Car.measure_state). Track limits are an (n, 4) array of x, y, x2, y2, gate centers (n, 2)
+    def measure_state(self, limit_lines, gate_centers, limit_grid = None, radar_field = None, coherent_radar = False):
+
+        # Radar distances
+        radar_distances = self.radar(limit_lines, limit_grid, radar_field, coherent_radar)
+
+        # Direction towards the center of the next reward gate, relative to the heading, in [-1, 1]
+        centers = gate_centers[self.next_sector]
+        target_angle = calc_angles(centers[:, 0] - self.x, centers[:, 1] - self.y)
+        target_heading = (self.heading_angles() - target_angle) % 360
+        target_heading = np.where(target_heading > 180, target_heading - 360, target_heading) / 180
+
+        # Normalised radar distances, speed and drift speed
+        return np.column_stack((np.maximum(1, radar_distances) / self.max_radar_distance, self.v / self.max_speed, self.drift_momentum / 5, target_heading))
+
+    # Radar distances of all cars (n_cars x n_look_directions): all beams against all track limits at once (or through a
+    # TrackGrid of them), or from an approximate radar field (DistanceField or RadarTable). The coherent radar tests the track limits near every car
+    # first, which change little from one timestep to the next (same results as all track limits). Its cost grows with the
+    # number of cars faster than walking the grid, so large fleets only use it once enough cars dropped out
+    def radar(self, limit_lines, limit_grid = None, radar_field = None, coherent = False):
+
+        ray_x, ray_y = radar_rays(self.heading_x, self.heading_y, self.radar_angles, self.max_radar_distance)
+        if coherent and radar_field == None and (limit_grid == None or len(self) <= self.coherent_radar_cars):
+            self.update_neighbourhoods(limit_lines)
+            drift = np.hypot(self.x - self.radar_anchor_x, self.y - self.radar_anchor_y)
+            return coherent_radar_distances(self.x, self.y, ray_x, ray_y, limit_lines, self.max_radar_distance, self.radar_neighbourhood, drift, self.neighbourhood_radius)
+
+        return radar_distances(self.x, self.y, ray_x, ray_y, limit_lines, self.max_radar_distance, limit_grid, radar_field)
+
+    # Coherent radar: look up the track limits near the cars that moved too far from where they last did (all cars the first time)
+    def update_neighbourhoods(self, limit_lines):
+
+        if self.radar_neighbourhood.shape[1] != len(limit_lines):
+            self.radar_neighbourhood = np.zeros((len(self), len(limit_lines)), dtype=bool)
+            self.radar_anchor_x[:], self.radar_anchor_y[:] = np.inf, np.inf
+
+        stale = np.nonzero(np.hypot(self.x - self.radar_anchor_x, self.y - self.radar_anchor_y) > self.neighbourhood_refresh)[0]
+        if len(stale):
+            self.radar_anchor_x[stale], self.radar_anchor_y[stale] = self.x[stale], self.y[stale]
+            self.radar_neighbourhood[stale] = point_segment_distances(self.x[stale, None], self.y[stale, None], limit_lines) <= self.neighbourhood_radius
+
+    # Crash and reward gate crossing vectors of all cars: their boxes against the track limits and their next reward gates
+    # (lines as (n, 4) arrays). Only cars whose clearance is within reach of their box are tested (culling, same results);
+    # their clearance is measured again at the same time. With a TrackGrid of the track limits, only the track limits near
+    # a car are looked at. With a DistanceField, crashes are looked up in it instead (approximate)
+    def collisions(self, limit_lines, gate_lines, limit_grid = None, distance_field = None):
+
+        corners_x, corners_y = box_corners(self.x, self.y, self.heading_x, self.heading_y, self.w, self.l)
+
+        # Crashes
+        if distance_field != None:
+            crashed = distance_field.collides(self.x, self.y, self.heading_x, self.heading_y, self.w, self.l)
+        else:
+            crashed = np.zeros(len(self), dtype=bool)
+            near = np.nonzero(may_collide(self.clearance, self.w, self.l))[0]
+            x, y = self.x[near], self.y[near]
+            if limit_grid != None:
+
+                # Track limits within the clearance radius (farther ones only bound the clearance by the radius)
+                r = self.clearance_radius
+                pairs = limit_grid.box_pairs(x - r, y - r, x + r, y + r)
+                crashed[near] = box_collisions(corners_x[near], corners_y[near], limit_lines, pairs)
+                self.clearance[near] = np.minimum(segment_clearances(x, y, limit_lines, pairs), r)
+            else:
+                crashed[near] = box_collisions(corners_x[near], corners_y[near], limit_lines)
+                self.clearance[near] = segment_clearances(x, y, limit_lines)
+
+        # Crossing the next reward gate
+        crossed = box_segment_hits(corners_x, corners_y, gate_lines[self.next_sector])
+
+        return crashed, crossed
+
+    # Rules applied to all cars after they moved: idling, time penalty, crashes and reward gates (same as Episode.apply_rules)
+    def apply_rules(self, crashed, crossed, n_sectors: int):
+
+        # Idling for more than 10 timesteps deactivates
+        self.active &= self.is_idling <= 10
+
+        # Every time-step, remove 1 from the fitness
+        self.fitness -= 1
+
+        # Crashes: -100 fitness and deactivate
+        self.fitness -= 100 * crashed
+        self.active &= ~crashed
+
+        # Crossing the next reward gate: next sector (looping around at the end of the track) and +100 fitness
+        self.next_sector += crossed
+        lap = self.next_sector == n_sectors
+        self.next_sector[lap] = 0
+        self.laps += lap
+        self.fitness += 100 * crossed
+
+        # Below 0 fitness: limit it to 1 but deactivate
+        broke = self.fitness <= 0
+        self.active &= ~broke
+        self.fitness[broke] = 1
+
+    # Drop cars that are no longer active, so they cost nothing anymore. Returns the keep mask (None if all are kept)
+    def compact(self):
+
+        if self.active.all():
+            return None
+
+        # Store final results of the dropped cars
+        keep = self.active.copy()
+        dropped = self.ids[~keep]
+        self.final_fitness[dropped] = self.fitness[~keep]
+        self.final_laps[dropped] = self.laps[~keep]
+        self.final_next_sector[dropped] = self.next_sector[~keep]
+
+        # Only keep the active cars
+        for name in self.STATE_FIELDS:
+            setattr(self, name, getattr(self, name)[keep])
+
+        return keep
+
+    # Store the final results of the cars that are still driving (at the end of the episode)
+    def finish(self):
+        self.final_fitness[self.ids] = self.fitness
+        self.final_laps[self.ids] = self.laps
+        self.final_next_sector[self.ids] = self.next_sector
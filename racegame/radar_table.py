@@ -0,0 +1,129 @@
+import numpy as np
+from racegame.track import Track, load_track
+from racegame.track_grid import TrackGrid
+from racegame.sensors import radar_angles, radar_rays, radar_distances
+import argparse
+import glob
+import json
+import os
+
+class RadarTable:
+
+    # Largest stored value (distances are stored as uint16 fractions of the max distance)
+    LEVELS = 65535
+
+    def __init__(self, table, origin_x: float, origin_y: float, resolution: float, angle_resolution: float, max_distance: float, path: str = None):
+
+        self.table              = table                 # Radar distance from every raster point along every beam direction (uint16, n_x x n_y x n_angles, in units of max_distance / LEVELS)
+        self.origin_x           = origin_x              # X of raster point [0, 0]
+        self.origin_y           = origin_y              # Y of raster point [0, 0]
+        self.resolution         = resolution            # Distance between raster points
+        self.angle_resolution   = angle_resolution      # Angle between beam directions (degrees, direction k is k * angle_resolution)
+        self.max_distance       = max_distance          # Max radar distance the table was built for
+        self.path               = path                  # File the table is memory mapped from (None = in memory)
+
+    # Tables loaded from a file are pickled as its path (e.g. for worker processes), which maps it again
+    def __reduce__(self):
+        if self.path != None:
+            return (open_radar_table, (self.path,))
+        return super().__reduce__()
+
+    # Radar distances of many cars (rays as made by radar_rays, (n_cars, n_rays)), by trilinear interpolation in position
+    # and beam direction (approximate). Positions are clamped to the raster, directions wrap around
+    def radar_distances(self, x, y, ray_x, ray_y, max_distance: float):
+
+        n_x, n_y, n_angles = self.table.shape
+        fx = np.clip((np.asarray(x, dtype=float)[:, None] - self.origin_x) / self.resolution, 0, n_x - 1.000001)
+        fy = np.clip((np.asarray(y, dtype=float)[:, None] - self.origin_y) / self.resolution, 0, n_y - 1.000001)
+        fa = (np.degrees(np.arctan2(ray_y, ray_x)) / self.angle_resolution) % n_angles
+        ix, iy, ia = fx.astype(int), fy.astype(int), fa.astype(int)
+        wx, wy, wa = fx - ix, fy - iy, fa - ia
+        ia, ia2 = ia % n_angles, (ia + 1) % n_angles
+
+        # Interpolate in direction at the four raster points around the car, then in position
+        def along(i, j):
+            return (1 - wa) * self.table[i, j, ia] + wa * self.table[i, j, ia2]
+        levels = ((1 - wx) * (1 - wy) * along(ix, iy) + wx * (1 - wy) * along(ix + 1, iy)
+                  + (1 - wx) * wy * along(ix, iy + 1) + wx * wy * along(ix + 1, iy + 1))
+
+        return np.minimum(levels * (self.max_distance / self.LEVELS), max_distance)
+
+# Build the radar table of a set of segments (m x 4 array of x, y, x2, y2): exact radar distances (through a TrackGrid) from every
+# raster point along every beam direction. The raster covers the segments plus a margin
+def build_radar_table(segments, resolution: float = 2.0, angle_resolution: float = 2.0, max_distance: float = 300, margin: float = 20.0, grid: TrackGrid = None):
+
+    segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+    grid = grid or TrackGrid(segments)
+    origin_x = segments[:, [0, 2]].min() - margin
+    origin_y = segments[:, [1, 3]].min() - margin
+    n_x = int(np.ceil((segments[:, [0, 2]].max() + margin - origin_x) / resolution)) + 1
+    n_y = int(np.ceil((segments[:, [1, 3]].max() + margin - origin_y) / resolution)) + 1
+    n_angles = int(round(360 / angle_resolution))
+
+    # Beams of all directions, at full radar length
+    directions = np.radians(np.arange(n_angles) * angle_resolution)
+    ray_x, ray_y = np.broadcast_to(np.cos(directions) * max_distance, (n_y, n_angles)), np.broadcast_to(np.sin(directions) * max_distance, (n_y, n_angles))
+
+    # One column of raster points (all beams of all its points) at a time
+    table = np.empty((n_x, n_y, n_angles), dtype=np.uint16)
+    y = origin_y + np.arange(n_y) * resolution
+    for i in range(n_x):
+        distances = radar_distances(np.full(n_y, origin_x + i * resolution), y, ray_x, ray_y, segments, max_distance, grid)
+        table[i] = np.round(distances / max_distance * RadarTable.LEVELS)
+
+    return RadarTable(table, origin_x, origin_y, resolution, angle_resolution, max_distance)
+
+# Map a radar table file (as saved by load_radar_table: the .npy table and a .json file with its raster)
+def open_radar_table(path: str):
+
+    with open(os.path.splitext(path)[0] + ".json", 'r') as f:
+        meta = json.load(f)
+    table = np.asarray(np.load(path, mmap_mode = 'r'))
+
+    return RadarTable(table, meta['origin_x'], meta['origin_y'], meta['resolution'], meta['angle_resolution'], meta['max_distance'], path)
+
+# Radar table of a track, stored in its compiled bundle (so it belongs to this version of the track) and memory mapped.
+# Built on first use; tracks that are not loaded from a bundle get a table in memory
+def load_radar_table(track: Track, resolution: float = 2.0, angle_resolution: float = 2.0, max_distance: float = 300):
+
+    if track.bundle == None:
+        return build_radar_table(track.limit_lines, resolution, angle_resolution, max_distance, grid = track.limit_grid)
+
+    path = os.path.join(track.bundle, "radar-%gpx-%gdeg-%g.npy" % (resolution, angle_resolution, max_distance))
+    if not os.path.exists(path):
+        radar_table = build_radar_table(track.limit_lines, resolution, angle_resolution, max_distance, grid = track.limit_grid)
+        meta = {"origin_x": radar_table.origin_x, "origin_y": radar_table.origin_y, "resolution": resolution, "angle_resolution": angle_resolution, "max_distance": max_distance}
+
+        # Write the raster first and the table last (under a temporary name), so other processes never see half a table
+        with open(os.path.splitext(path)[0] + ".json", 'w') as f:
+            json.dump(meta, f)
+        temporary = path + ".tmp-" + str(os.getpid()) + ".npy"
+        np.save(temporary, radar_table.table)
+        os.replace(temporary, path)
+
+    return open_radar_table(path)
+
+# Compare a radar table with the exact radar at random poses on the track. Returns max, mean and 99th percentile of the error
+def error_report(track: Track, radar_table: RadarTable, n_look_directions: int = 8, n_poses: int = 2000, seed: int = 0):
+
+    x, y, heading = track.random_poses(n_poses, seed)
+    ray_x, ray_y = radar_rays(np.cos(heading), np.sin(heading), radar_angles(n_look_directions), radar_table.max_distance)
+    exact = radar_distances(x, y, ray_x, ray_y, track.limit_lines, radar_table.max_distance, track.limit_grid)
+    error = np.abs(radar_table.radar_distances(x, y, ray_x, ray_y, radar_table.max_distance) - exact)
+
+    return error.max(), error.mean(), np.percentile(error, 99)
+
+# Build (or load) the radar tables of tracks and report their errors: python -m racegame.radar_table [--resolution R] [--angle-resolution A] [tracks...]
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = "Build radar lookup tables of tracks and compare them with the exact radar")
+    parser.add_argument("tracks", nargs = "*", default = sorted(glob.glob("./racegame/tracks/*/*.json")), help = "track json files")
+    parser.add_argument("--resolution", type = float, default = 2.0, help = "distance between raster points (px)")
+    parser.add_argument("--angle-resolution", type = float, default = 2.0, help = "angle between beam directions (degrees)")
+    args = parser.parse_args()
+
+    for path in args.tracks:
+        track = load_track(path)
+        radar_table = load_radar_table(track, args.resolution, args.angle_resolution)
+        max_error, mean_error, p99_error = error_report(track, radar_table)
+        print("%-20s table %4d x %-4d x %-3d (%4.0f MB)  radar error max %6.2f mean %5.2f 99%% %6.2f px" % (os.path.basename(path), *radar_table.table.shape, radar_table.table.nbytes / 2 ** 20, max_error, mean_error, p99_error))
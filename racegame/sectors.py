@@ -0,0 +1,94 @@
+import numpy as np
+import math as m
+from racegame.collisions import point_segment_distances, segments_intersect
+
+class SectorSets:
+
+    def __init__(self, limit_lines, gate_lines, margin: float = 30.0, reach: float = 300.0, sets: tuple = None):
+
+        self.limit_lines        = np.asarray(limit_lines, dtype=float).reshape(-1, 4)   # Track limits (m x 4 array of x, y, x2, y2)
+        self.gate_lines         = np.asarray(gate_lines, dtype=float).reshape(-1, 4)    # Reward gates, in order (n x 4 array)
+        self.margin             = margin                # Cars within this distance of their sector's region are in it
+        self.reach              = reach                 # Range of the sensors: track limits farther than this from any car in the region are left out
+
+        # Region of every sector (sector i lies between reward gate i - 1 and i: a car in it has next_sector i), and the track limits
+        # that can be seen or touched from it (potentially visible set). Built here, unless given (hulls, masks) of a compiled track
+        self.hulls              = None                  # Convex hull of the two gates of every sector (n x 4 x 2 corners, counter clockwise, last corner repeated for fewer)
+        self.masks              = None                  # Track limits of every sector (n x m mask)
+        if sets != None:
+            self.hulls, self.masks = sets
+        else:
+            self.build()
+
+        # Edges of the regions (n x 4 x 4: x, y, x2, y2), and for single cars the same as lists, and the track limits of every sector as arrays
+        self.edges              = np.concatenate((self.hulls, np.roll(self.hulls, -1, axis=1)), axis=2)
+        self.sector_edges       = self.edges.tolist()
+        self.sector_limits      = [self.limit_lines[mask] for mask in self.masks]
+
+    # Regions of the sectors, and the track limits within margin + reach of them (plus 1 px against rounding)
+    def build(self):
+
+        n_sectors = len(self.gate_lines)
+        self.hulls = np.array([convex_hull([self.gate_lines[i - 1, :2], self.gate_lines[i - 1, 2:], self.gate_lines[i, :2], self.gate_lines[i, 2:]]) for i in range(n_sectors)]).reshape(-1, 4, 2)
+        self.masks = np.zeros((n_sectors, len(self.limit_lines)), dtype=bool)
+        for i, hull in enumerate(self.hulls):
+            corners_x, corners_y = hull[:, 0], hull[:, 1]
+            next_x, next_y = np.roll(corners_x, -1), np.roll(corners_y, -1)
+            edges = np.column_stack((corners_x, corners_y, next_x, next_y))
+            lines = self.limit_lines
+
+            # Distance between every track limit and the hull: zero if it crosses an edge or starts inside, otherwise the
+            # closest of its end points to the edges and the corners to it
+            crossing = segments_intersect(lines[:, 0, None], lines[:, 1, None], lines[:, 2, None], lines[:, 3, None], corners_x, corners_y, next_x, next_y).any(axis=1)
+            inside = in_hulls(lines[:, 0], lines[:, 1], edges)
+            distance = np.minimum(np.minimum(point_segment_distances(lines[:, 0, None], lines[:, 1, None], edges), point_segment_distances(lines[:, 2, None], lines[:, 3, None], edges)).min(axis=1),
+                                  point_segment_distances(corners_x, corners_y, lines[:, None, :]).min(axis=1))
+            self.masks[i] = crossing | inside | (distance <= self.margin + self.reach + 1.0)
+
+    # Is a car (position and next_sector number) within the margin of its sector's region? Only then can the potentially
+    # visible set of its sector be used. Plain Python (cheaper than numpy for one point)
+    def in_sector(self, x: float, y: float, sector: int):
+
+        edges = self.sector_edges[sector]
+        sides = [(x2 - x1) * (y - y1) - (y2 - y1) * (x - x1) for x1, y1, x2, y2 in edges]
+        if min(sides) >= 0 and max(sides) > 0:
+            return True
+
+        return min(point_segment_distance(x, y, *edge) for edge in edges) <= self.margin
+
+    # Track limits a single car may see or touch (as an array), and the range beyond which none are left out (None: all track limits)
+    def limits(self, x: float, y: float, sector: int):
+        if self.in_sector(x, y, sector):
+            return self.sector_limits[sector], self.reach
+        return self.limit_lines, None
+
+# Are points inside convex hulls (given by their edges, n x 4 x 4 or 4 x 4 for all points, counter clockwise)? Left of (or on)
+# all edges, and not only on them, so degenerate hulls without area contain nothing
+def in_hulls(x, y, edges):
+    x1, y1, x2, y2 = edges[..., 0], edges[..., 1], edges[..., 2], edges[..., 3]
+    sides = (x2 - x1) * (np.asarray(y)[..., None] - y1) - (y2 - y1) * (np.asarray(x)[..., None] - x1)
+    return (sides >= 0).all(axis=-1) & (sides > 0).any(axis=-1)
+
+# Distance of a point to a segment (same as point_segment_distances, for a single one in plain Python)
+def point_segment_distance(x: float, y: float, x1: float, y1: float, x2: float, y2: float):
+    dx, dy = x2 - x1, y2 - y1
+    length_squared = dx * dx + dy * dy
+    u = min(max(((x - x1) * dx + (y - y1) * dy) / length_squared, 0), 1) if length_squared > 0 else 0
+    return m.hypot(x - (x1 + u * dx), y - (y1 + u * dy))
+
+# Convex hull of points (counter clockwise, monotone chain), padded to as many corners as points by repeating the last corner
+def convex_hull(points: list):
+
+    points = sorted(map(tuple, np.asarray(points, dtype=float)))
+
+    # Lower and upper chains: drop corners that do not turn left
+    def chain(points):
+        corners = []
+        for p in points:
+            while len(corners) >= 2 and (corners[-1][0] - corners[-2][0]) * (p[1] - corners[-2][1]) - (corners[-1][1] - corners[-2][1]) * (p[0] - corners[-2][0]) <= 0:
+                corners.pop()
+            corners.append(p)
+        return corners[:-1]
+    hull = (chain(points) + chain(points[::-1])) or points[:1]
+
+    return np.array(hull + [hull[-1]] * (len(points) - len(hull)))
@@ -0,0 +1,91 @@
+import numpy as np
+from vector_math import rotate_vectors
+
+# Relative angles of the radar beams (degrees): evenly spread from -90 (right) to 90 (left)
+def radar_angles(n_look_directions: int):
+    return -90 + np.arange(n_look_directions) * (180 / (n_look_directions - 1))
+
+# Radar beams of many cars: the heading rotated by every beam angle, scaled to the max radar distance. Returns the
+# x and y components, both (n_cars, n_rays). Same rotation and normalization as Vector2, so beams are identical to Car's
+def radar_rays(heading_x, heading_y, angles, max_distance: float):
+
+    ray_x, ray_y = rotate_vectors(np.asarray(heading_x, dtype=float)[:, None], np.asarray(heading_y, dtype=float)[:, None], np.asarray(angles)[None, :])
+    length = np.sqrt(ray_x * ray_x + ray_y * ray_y)
+
+    return ray_x / length * max_distance, ray_y / length * max_distance
+
+# Where rays p + t * r (t in [0, 1]) first touch segments q + u * s (u in [0, 1]). All inputs broadcast against each other,
+# so it works for any set of (ray, segment) pairs. Returns t of the hit, inf where there is none.
+# Parallel pairs are handled exactly instead of nudging the endpoints: they only touch when collinear and overlapping,
+# and then the hit is the nearest overlapping point
+def ray_segment_hits(px, py, rx, ry, qx, qy, sx, sy):
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        # Cross products (2D): denominator is zero for parallel pairs
+        qpx = qx - px
+        qpy = qy - py
+        denominator = rx * sy - ry * sx
+        t_numerator = qpx * sy - qpy * sx
+        u_numerator = qpx * ry - qpy * rx
+
+        # Proper crossings
+        t = t_numerator / denominator
+        u = u_numerator / denominator
+        crossing = (denominator != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+
+        # Collinear pairs (also zero length segments lying on the ray): project the segment ends onto the ray
+        ray_length_squared = rx * rx + ry * ry
+        t_start = (qpx * rx + qpy * ry) / ray_length_squared
+        t_end = ((qpx + sx) * rx + (qpy + sy) * ry) / ray_length_squared
+        t_near = np.minimum(t_start, t_end)
+        t_far = np.maximum(t_start, t_end)
+        overlapping = (denominator == 0) & (u_numerator == 0) & (t_near <= 1) & (t_far >= 0)
+
+        return np.where(crossing, t, np.where(overlapping, np.maximum(t_near, 0), np.inf))
+
+# Radar distances of many cars against all segments (m x 4 array of x, y, x2, y2) in one go. Rays are (n_cars, n_rays)
+# as made by radar_rays. Returns an (n_cars, n_rays) distance matrix, max distance where nothing is in the way.
+# With a grid (TrackGrid of the same segments), rays only look at the segments in the cells they pass. With an approximate
+# radar field, distances come from it instead: sphere traced over a DistanceField, or looked up in a RadarTable
+def radar_distances(x, y, ray_x, ray_y, segments, max_distance: float, grid = None, radar_field = None):
+
+    if radar_field != None:
+        return radar_field.radar_distances(x, y, ray_x, ray_y, max_distance)
+    if len(segments) == 0:
+        return np.full(np.shape(ray_x), float(max_distance))
+
+    # Closest hit of every ray: through the grid, or all rays of all cars against all segments (n_cars, n_rays, n_segments)
+    if grid != None:
+        t = grid.raycast(np.asarray(x, dtype=float)[:, None], np.asarray(y, dtype=float)[:, None], ray_x, ray_y)
+    else:
+        t = ray_segment_hits(np.asarray(x, dtype=float)[:, None, None], np.asarray(y, dtype=float)[:, None, None], ray_x[:, :, None], ray_y[:, :, None],
+                         segments[:, 0], segments[:, 1], segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1]).min(axis=2)
+
+    return np.where(np.isinf(t), max_distance, t * np.sqrt(ray_x * ray_x + ray_y * ray_y))
+
+# Radar distances (same as radar_distances) of cars that know which segments lie within a radius of an anchor point near
+# them: neighbourhood is an (n_cars, m) mask of those segments, drift the distance of every car from its anchor. Rays are
+# tested against the neighbourhood first. A segment touching a ray before the point at radius - drift from the car lies
+# within the radius of the anchor, so the ray's closest hit there (or its end, without one) is exact if it is within that
+# range. Only the other rays are tested against all segments
+def coherent_radar_distances(x, y, ray_x, ray_y, segments, max_distance: float, neighbourhood, drift, radius: float):
+
+    if len(segments) == 0:
+        return np.full(np.shape(ray_x), float(max_distance))
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    length = np.sqrt(ray_x * ray_x + ray_y * ray_y)
+
+    # Closest hits of all rays of every car in its neighbourhood
+    t = np.full(np.shape(ray_x), np.inf)
+    cars, candidates = np.nonzero(neighbourhood)
+    s = segments[candidates]
+    np.minimum.at(t, cars, ray_segment_hits(x[cars, None], y[cars, None], ray_x[cars], ray_y[cars], s[:, 0, None], s[:, 1, None], (s[:, 2] - s[:, 0])[:, None], (s[:, 3] - s[:, 1])[:, None]))
+
+    # Rays whose hit (or end) is out of the safe range: all segments
+    cars, rays = np.nonzero(np.minimum(t, 1) * length > (radius - np.asarray(drift))[:, None])
+    if len(cars):
+        t[cars, rays] = ray_segment_hits(x[cars, None], y[cars, None], ray_x[cars, rays, None], ray_y[cars, rays, None],
+                                         segments[:, 0], segments[:, 1], segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1]).min(axis=1)
+
+    return np.where(np.isinf(t), max_distance, t * length)
@@ -0,0 +1,188 @@
+from racegame.car import Car
+from racegame.fleet import CarFleet
+from racegame.track import Track
+from NEAT.Network_Batch import Network_Batch
+from racegame.collisions import box_corners, box_segment_hits, box_collisions, segment_clearances, may_collide
+from vector_math import unit_vector_from_angle
+import numpy as np
+
+class Episode:
+
+    def __init__(self, track: Track, stop_on_lap: bool = False, distance_field = None, sphere_traced_radar: bool = False, coherent_radar: bool = True, radar_table = None, sector_sets: bool = True):
+
+        self.track              = track                 # Track (compiled)
+        self.initial_x          = track.start_x         # Start x position
+        self.initial_y          = track.start_y         # Start y position
+        self.initial_heading    = track.start_heading   # Initial heading (degrees)
+        self.stop_on_lap        = stop_on_lap           # Finished when a lap is completed
+        self.sphere_traced_radar= sphere_traced_radar   # Sphere trace the radar over the distance field?
+        self.coherent_radar     = coherent_radar        # Fleets test the track limits near every car first (same results, faster)
+
+        # Track arrays (lines as (n, 4) arrays of x, y, x2, y2), and the spatial index of the track limits
+        self.limit_lines        = track.limit_lines     # Track limit lines
+        self.gate_lines         = track.gate_lines      # Reward gate lines, in order
+        self.gate_centers       = track.gate_centers    # Centers of the reward gates
+        self.limit_grid         = track.limit_grid      # TrackGrid of the track limits, so raycasts and collision tests only look at nearby ones
+        self.sector_sets        = track.sector_sets if sector_sets else None    # SectorSets of the track: single cars only look at the track limits of their sector (None = all)
+
+        # Optional signed distance field of the track: crash tests become lookups in it, and the radar can be sphere traced over it (both approximate)
+        self.distance_field     = distance_field                                            # DistanceField of the track (None = exact crash tests)
+        self.radar_table        = radar_table                                               # Optional RadarTable of the track: the radar is looked up in it (approximate)
+        self.radar_field        = radar_table if radar_table != None else (distance_field if sphere_traced_radar else None)     # Approximate radar backend: the table, or the field the radar is sphere traced over (None = exact radar)
+
+    # Episodes are pickled (e.g. for worker processes) as their settings, so a compiled track is mapped again instead of copied
+    def __reduce__(self):
+        return (Episode, (self.track, self.stop_on_lap, self.distance_field, self.sphere_traced_radar, self.coherent_radar, self.radar_table, self.sector_sets != None))
+
+    # Number of timesteps in an episode: 500 + n * 25
+    def max_steps(self, generation_number: int):
+        return 500 + generation_number * 25
+
+    # Track limits a single agent can see or touch: those of its sector (unless it strayed out of it), and the range beyond which
+    # track limits were left out (None if none were)
+    def agent_limits(self, agent: Car):
+        if self.sector_sets != None:
+            return self.sector_sets.limits(agent.x, agent.y, agent.next_sector)
+        return self.limit_lines, None
+
+    # Create a car at the start position with the given brain
+    def create_car(self, brain, is_champion: bool = False):
+        return Car(brain, self.initial_x, self.initial_y, unit_vector_from_angle(self.initial_heading), is_champion)
+
+    # Rules applied to an active agent after it moved: idling, time penalty, collisions and reward gates
+    def apply_rules(self, agent: Car):
+
+        # If it's been idling for more than 10 timesteps, deactivate it
+        if agent.is_idling > 10:
+            agent.active = False
+
+        # Every time-step, remove 1 from its fitness
+        agent.fitness -= 1
+
+        # Box of the agent
+        corners_x, corners_y = box_corners([agent.x], [agent.y], [agent.heading.x], [agent.heading.y], agent.w, agent.l)
+
+        # Check for collisions: look it up in the distance field, or test all track limits (for a single car that is cheaper than a grid query).
+        # The exact test is skipped while the agent's clearance proves it cannot touch any track limit, otherwise the clearance is measured again
+        if self.distance_field != None:
+            crashed = bool(self.distance_field.collides(agent.x, agent.y, agent.heading.x, agent.heading.y, agent.w, agent.l))
+        elif may_collide(agent.clearance, agent.w, agent.l):
+            limit_lines, reach = self.agent_limits(agent)
+            crashed = bool(box_collisions(corners_x, corners_y, limit_lines)[0])
+            agent.clearance = float(segment_clearances([agent.x], [agent.y], limit_lines)[0])
+            if reach != None:
+                agent.clearance = min(agent.clearance, reach)
+        else:
+            crashed = False
+
+        # If collided, penalise with -100 fitness and deactivate agent
+        if crashed:
+            agent.fitness -= 100
+            agent.active = False
+
+        # Check for collision with next reward sector (good thing!)
+        if box_segment_hits(corners_x, corners_y, self.gate_lines[[agent.next_sector]])[0]:
+
+            # If so, update its next sector number
+            agent.next_sector += 1
+
+            # Loop around if we reached the end of the track
+            if agent.next_sector == len(self.gate_lines):
+                agent.next_sector = 0
+                agent.laps += 1
+
+            # And of course, reward it with 100 fitness
+            agent.fitness += 100
+
+        # If agent dips below 0 fitness, limit it to 1 but deactivate the agent
+        if agent.fitness <= 0:
+            agent.active = False
+            agent.fitness = 1
+
+    # Run a headless episode for a single (compiled) network. Returns its fitness and episode stats
+    def __call__(self, network, generation_number: int):
+
+        # Fresh network state and a car at the start
+        network.reset()
+        agent = self.create_car(network)
+
+        # Drive until the car is deactivated or time is up. The radar of a single car tests all track limits of its sector at once (cheaper than walking the grid, same results)
+        steps = 0
+        while agent.active and steps < self.max_steps(generation_number):
+            agent.update(self.agent_limits(agent)[0], self.gate_centers[agent.next_sector], None, self.radar_field)
+            self.apply_rules(agent)
+            steps += 1
+
+        return agent.fitness, {"laps": agent.laps, "next_sector": agent.next_sector, "steps": steps, "finished": agent.laps > 0 and self.stop_on_lap}
+
+class Simulation:
+
+    def __init__(self, episode: Episode, observer: callable = None):
+
+        self.episode            = episode               # Episode rules
+        self.observer           = observer              # Optional observer (CALLABLE with input of this simulation), called every timestep (e.g. to draw)
+        self.population         = None                  # Population being evaluated (for the generation number)
+        self.fleet              = None                  # Fleet of cars of the current generation (only the ones still driving)
+        self.champions          = None                  # Per car: is it the champion of the previous generation? (drawn in a different livery)
+        self.best_genome        = None                  # Best genome of the last generation
+        self.best_fitness       = 0                     # Fitness of that genome
+        self.laps_finished      = 0                     # Max nr of laps finished in the last generation
+        self.champion_id        = None                  # ID of champion (best genome of the last generation)
+
+    # Generation being evaluated
+    def generation_number(self):
+        return self.population.generation_number if self.population else 0
+
+    # Determine fitness of the genomes: all cars drive at the same time (fitness function of the population)
+    def determine_fitness(self, genomes: list):
+
+        # One fleet with a car for every genome, all at the start. The fleet deliberately does not use the sector sets of the track
+        # (only Episode does): per-car masks of the track limits measured several times slower than the spatial grid and the
+        # coherent radar, which already only look at the track limits near the cars
+        self.fleet = CarFleet(len(genomes), self.episode.initial_x, self.episode.initial_y, self.episode.initial_heading)
+        self.champions = np.array([genome.ID == self.champion_id for genome in genomes])
+
+        # Pack all brains into one batch, so all actions are computed in one go each timestep
+        brains = Network_Batch([genome.network for genome in genomes])
+
+        # For 500 + n * 25 timesteps, as long as any car is driving
+        for k in range(self.episode.max_steps(self.generation_number())):
+            if len(self.fleet) == 0:
+                break
+
+            # Measure state of all cars, and compute all their actions at once
+            actions = brains.feed_forward(self.fleet.measure_state(self.episode.limit_lines, self.episode.gate_centers, self.episode.limit_grid, self.episode.radar_field, self.episode.coherent_radar))
+
+            # Take actions and move
+            self.fleet.set_actions(actions)
+            self.fleet.update_movement()
+
+            # Apply the rules: time penalty, crashes, reward gates
+            crashed, crossed = self.fleet.collisions(self.episode.limit_lines, self.episode.gate_lines, self.episode.limit_grid, self.episode.distance_field)
+            self.fleet.apply_rules(crashed, crossed, len(self.episode.gate_lines))
+
+            # Drop the cars (and brains) that were deactivated
+            keep = self.fleet.compact()
+            if keep is not None:
+                brains.keep(keep)
+
+            # Let the observer know (e.g. to draw the timestep)
+            if self.observer:
+                self.observer(self)
+
+        # Write fitnesses back to the genomes
+        self.fleet.finish()
+        for genome, fitness in zip(genomes, self.fleet.final_fitness.tolist()):
+            genome.fitness = fitness
+
+        # Best genome (first one with the best fitness), and max nr of laps finished
+        best = int(np.argmax(self.fleet.final_fitness))
+        self.best_genome = genomes[best]
+        self.best_fitness = genomes[best].fitness
+        self.laps_finished = int(self.fleet.final_laps.max())
+
+        # Store ID of best genome to determine next generations champion agent
+        self.champion_id = self.best_genome.ID
+
+        # Has any agent finished a lap yet? Return that to NEAT
+        return bool((self.fleet.final_laps > 0).any()) and self.episode.stop_on_lap
@@ -0,0 +1,147 @@
+import numpy as np
+from racegame.track_grid import TrackGrid
+from racegame.sectors import SectorSets
+import hashlib
+import argparse
+import glob
+import json
+import os
+
+# Version of the compiled track format. Bundles of other versions are recompiled
+TRACK_FORMAT_VERSION = 2
+
+# Arrays of a compiled track (one .npy file each in the bundle)
+TRACK_ARRAYS = ('limit_lines', 'gate_lines', 'gate_centers', 'grid_cell_start', 'grid_cell_segments', 'sector_hulls', 'sector_masks')
+
+class Track:
+
+    def __init__(self, arrays: dict, start_x: float, start_y: float, start_heading: float, bg_name: str = None, directory: str = ".", path: str = None, grid_cell_size: float = 60.0, grid_padding: float = 0.5, sector_margin: float = 30.0, sector_reach: float = 300.0, bundle: str = None):
+
+        self.limit_lines        = arrays['limit_lines']         # Track limit lines (m x 4 array of x, y, x2, y2)
+        self.gate_lines         = arrays['gate_lines']          # Reward gate lines, in order (n x 4 array of x, y, x2, y2)
+        self.gate_centers       = arrays['gate_centers']        # Centers of the reward gates (n x 2)
+        self.start_x            = start_x                       # Start x position
+        self.start_y            = start_y                       # Start y position
+        self.start_heading      = start_heading                 # Start heading (degrees)
+        self.bg_name            = bg_name                       # File name of the background image (only needed for drawing)
+        self.directory          = directory                     # Directory of the track data file
+        self.path               = path                          # Path of the track data file
+        self.bundle             = bundle                        # Directory of the compiled bundle the arrays are mapped from (None = in memory)
+
+        # Spatial index of the track limits (cells compiled with the track)
+        self.limit_grid         = TrackGrid(self.limit_lines, grid_cell_size, grid_padding, (arrays['grid_cell_start'], arrays['grid_cell_segments']))
+
+        # Track limits that can be seen or touched from every sector (potentially visible sets, compiled with the track)
+        self.sector_sets        = SectorSets(self.limit_lines, self.gate_lines, sector_margin, sector_reach, (arrays['sector_hulls'], arrays['sector_masks']))
+
+    # Path of the background image
+    def background_path(self):
+        return os.path.join(self.directory, self.bg_name)
+
+    # Random poses on the track (for comparing approximate sensors with exact ones): points on the reward gates, random headings (radians)
+    def random_poses(self, n_poses: int, seed: int = 0):
+
+        rng = np.random.default_rng(seed)
+        gates = self.gate_lines[rng.integers(0, len(self.gate_lines), n_poses)]
+        along = rng.uniform(0.1, 0.9, n_poses)
+
+        return gates[:, 0] + along * (gates[:, 2] - gates[:, 0]), gates[:, 1] + along * (gates[:, 3] - gates[:, 1]), rng.uniform(0, 2 * np.pi, n_poses)
+
+    # Tracks loaded from a bundle are pickled as the bundle's path (e.g. for worker processes), which maps it again
+    def __reduce__(self):
+        if self.bundle != None:
+            return (load_bundle, (self.bundle, self.path))
+        return super().__reduce__()
+
+# Convert a list of line dicts into an (n, 4) array of x, y, x2, y2
+def lines_to_array(lines: list):
+    return np.array([[line['x'], line['y'], line['x2'], line['y2']] for line in lines], dtype=float).reshape(-1, 4)
+
+# All arrays of a track from its line dicts (see TRACK_ARRAYS)
+def track_arrays(track_limits: list, reward_gates: list, grid_cell_size: float = 60.0, grid_padding: float = 0.5, sector_margin: float = 30.0, sector_reach: float = 300.0):
+
+    limit_lines = lines_to_array(track_limits)
+    gate_lines = lines_to_array(reward_gates)
+
+    grid = TrackGrid(limit_lines, grid_cell_size, grid_padding)
+    sector_sets = SectorSets(limit_lines, gate_lines, sector_margin, sector_reach)
+
+    return {'limit_lines': limit_lines, 'gate_lines': gate_lines, 'gate_centers': (gate_lines[:, :2] + gate_lines[:, 2:]) / 2, 'grid_cell_start': grid.cell_start, 'grid_cell_segments': grid.cell_segments,
+            'sector_hulls': sector_sets.hulls, 'sector_masks': sector_sets.masks}
+
+# Hash of a track data file (compiled bundles are keyed by it)
+def track_hash(path: str):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+# Directory of the compiled bundle of a track data file: next to it, keyed by its contents
+def bundle_path(path: str):
+    return os.path.join(os.path.dirname(path), "compiled", os.path.splitext(os.path.basename(path))[0] + "-" + track_hash(path)[:16])
+
+# Compile a track data file (as made by the track generator) into a bundle: a .npy file per array and meta.json. Returns the bundle directory
+def compile_track(path: str, grid_cell_size: float = 60.0, grid_padding: float = 0.5, sector_margin: float = 30.0, sector_reach: float = 300.0):
+
+    with open(path, 'r') as f:
+        track_data = json.load(f)
+    bundle = bundle_path(path)
+    arrays = track_arrays(track_data['track_limits'], track_data['reward_gates'], grid_cell_size, grid_padding, sector_margin, sector_reach)
+    meta = {"version": TRACK_FORMAT_VERSION, "track_hash": track_hash(path), "start_x": track_data['start_pos']['x'], "start_y": track_data['start_pos']['y'],
+            "start_heading": track_data['start_pos']['heading'], "bg_name": track_data.get('bg_name'), "grid_cell_size": grid_cell_size, "grid_padding": grid_padding,
+            "sector_margin": sector_margin, "sector_reach": sector_reach}
+
+    # Write to a temporary directory first, so other processes never see half a bundle
+    temporary = bundle + ".tmp-" + str(os.getpid())
+    os.makedirs(temporary, exist_ok = True)
+    for name in TRACK_ARRAYS:
+        np.save(os.path.join(temporary, name + ".npy"), arrays[name])
+    with open(os.path.join(temporary, "meta.json"), 'w') as f:
+        json.dump(meta, f)
+    try:
+        os.replace(temporary, bundle)
+    except OSError:
+
+        # Another process compiled it first
+        for name in os.listdir(temporary):
+            os.remove(os.path.join(temporary, name))
+        os.rmdir(temporary)
+
+    return bundle
+
+# Load a compiled bundle. The arrays are memory mapped (read only), so loading is instant and processes share them. They are
+# handed out as plain ndarray views of the mapped memory: indexing a memmap wraps every result in a new memmap, which is slow
+def load_bundle(bundle: str, path: str = None):
+
+    with open(os.path.join(bundle, "meta.json"), 'r') as f:
+        meta = json.load(f)
+    arrays = {name: np.asarray(np.load(os.path.join(bundle, name + ".npy"), mmap_mode = 'r')) for name in TRACK_ARRAYS}
+    directory = os.path.dirname(os.path.dirname(bundle))
+
+    return Track(arrays, meta['start_x'], meta['start_y'], meta['start_heading'], meta['bg_name'], directory, path, meta['grid_cell_size'], meta['grid_padding'], meta['sector_margin'], meta['sector_reach'], bundle)
+
+# Load a track from its json file (as made by the track generator), through its compiled bundle (compiled first if missing or outdated)
+def load_track(path: str):
+
+    bundle = bundle_path(path)
+    meta_path = os.path.join(bundle, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            if json.load(f).get("version") == TRACK_FORMAT_VERSION:
+                return load_bundle(bundle, path)
+
+        # Other version: recompile
+        for name in os.listdir(bundle):
+            os.remove(os.path.join(bundle, name))
+        os.rmdir(bundle)
+
+    return load_bundle(compile_track(path), path)
+
+# Compile tracks ahead of time: python -m racegame.track [tracks...]
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = "Compile track json files into memory mappable bundles")
+    parser.add_argument("tracks", nargs = "*", default = sorted(glob.glob("./racegame/tracks/*/*.json")), help = "track json files")
+    args = parser.parse_args()
+
+    # Through load_track, so outdated bundles are compiled again
+    for path in args.tracks:
+        print(os.path.basename(path), "->", load_track(path).bundle)
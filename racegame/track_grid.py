@@ -0,0 +1,130 @@
+import numpy as np
+from racegame.sensors import ray_segment_hits
+
+class TrackGrid:
+
+    def __init__(self, segments, cell_size: float = 60.0, padding: float = 0.5, cells: tuple = None):
+
+        self.segments           = np.asarray(segments, dtype=float).reshape(-1, 4)  # Segments (m x 4 array of x, y, x2, y2)
+        self.cell_size          = cell_size                                         # Width and height of the cells
+        self.padding            = padding                                           # Segments are also listed in cells they pass within this distance of (against rounding)
+
+        # Grid covers the bounding box of all segments
+        self.origin_x           = self.segments[:, [0, 2]].min() if len(self.segments) else 0.0     # X of the lower left corner of the grid
+        self.origin_y           = self.segments[:, [1, 3]].min() if len(self.segments) else 0.0     # Y of the lower left corner of the grid
+        self.n_x                = int((self.segments[:, [0, 2]].max() - self.origin_x) // cell_size) + 1 if len(self.segments) else 1     # Number of cells in x direction
+        self.n_y                = int((self.segments[:, [1, 3]].max() - self.origin_y) // cell_size) + 1 if len(self.segments) else 1     # Number of cells in y direction
+
+        # Segment lists of the cells, packed: segments of cell c are cell_segments[cell_start[c]:cell_start[c + 1]] (cell c = ix * n_y + iy).
+        # Built here, unless given (cell_start, cell_segments) of a compiled track
+        self.cell_start         = None                                              # Start of the list of every cell (n_x * n_y + 1)
+        self.cell_segments      = None                                              # Segment indices of all lists
+        if cells != None:
+            self.cell_start, self.cell_segments = cells
+        else:
+            self.build()
+
+    # Assign every segment to the cells it passes through (closed, padded cell boxes)
+    def build(self):
+
+        cells = [[] for _ in range(self.n_x * self.n_y)]
+        for k, (x1, y1, x2, y2) in enumerate(self.segments):
+
+            # Cells overlapped by the bounding box of the segment
+            ix0, iy0 = self.cell_of(min(x1, x2) - self.padding, min(y1, y2) - self.padding)
+            ix1, iy1 = self.cell_of(max(x1, x2) + self.padding, max(y1, y2) + self.padding)
+            for ix in range(max(ix0, 0), min(ix1, self.n_x - 1) + 1):
+                for iy in range(max(iy0, 0), min(iy1, self.n_y - 1) + 1):
+
+                    # Keep the cell unless all its (padded) corners are strictly on one side of the segment's line
+                    cx0 = self.origin_x + ix * self.cell_size - self.padding
+                    cy0 = self.origin_y + iy * self.cell_size - self.padding
+                    cx1 = cx0 + self.cell_size + 2 * self.padding
+                    cy1 = cy0 + self.cell_size + 2 * self.padding
+                    sides = [(x2 - x1) * (cy - y1) - (y2 - y1) * (cx - x1) for cx, cy in ((cx0, cy0), (cx1, cy0), (cx0, cy1), (cx1, cy1))]
+                    if min(sides) <= 0 <= max(sides):
+                        cells[ix * self.n_y + iy].append(k)
+
+        self.cell_start = np.concatenate(([0], np.cumsum([len(cell) for cell in cells]))).astype(int)
+        self.cell_segments = np.array([k for cell in cells for k in cell], dtype=int)
+
+    # Cell indices of points (may be outside of the grid)
+    def cell_of(self, x, y):
+        return np.floor((np.asarray(x) - self.origin_x) / self.cell_size).astype(int), np.floor((np.asarray(y) - self.origin_y) / self.cell_size).astype(int)
+
+    # All (query, segment) pairs of queries and the cells they look at. Cells outside of the grid are empty
+    def cell_pairs(self, query_ids, ix, iy):
+
+        inside = (ix >= 0) & (ix < self.n_x) & (iy >= 0) & (iy < self.n_y)
+        query_ids, cells = query_ids[inside], ix[inside] * self.n_y + iy[inside]
+        counts = self.cell_start[cells + 1] - self.cell_start[cells]
+        total = counts.sum()
+
+        # Position in the packed lists of every pair: start of its cell's list plus its index within that list
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(query_ids, counts), self.cell_segments[np.repeat(self.cell_start[cells], counts) + offsets]
+
+    # Closest hits of rays p + t * r (t in [0, 1]), all given as (n_cars, n_rays) or broadcastable to it. Walks every ray
+    # through the cells it passes (all rays in lockstep) and stops a ray once its closest hit lies before the cell's exit.
+    # Returns t of the hits, inf where there is none. Same results as testing all segments
+    def raycast(self, px, py, rx, ry):
+
+        shape = np.broadcast(px, py, rx, ry).shape
+        px, py, rx, ry = (np.broadcast_to(a, shape).astype(float).ravel() for a in (px, py, rx, ry))
+        best = np.full(len(px), np.inf)
+        if len(self.segments) == 0:
+            return best.reshape(shape)
+
+        # Start cells, direction of stepping, and t at which the ray crosses the next cell boundary (and between boundaries)
+        ix, iy = self.cell_of(px, py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step_x, step_y = np.sign(rx).astype(int), np.sign(ry).astype(int)
+            t_max_x = np.where(rx != 0, (self.origin_x + (ix + (step_x > 0)) * self.cell_size - px) / rx, np.inf)
+            t_max_y = np.where(ry != 0, (self.origin_y + (iy + (step_y > 0)) * self.cell_size - py) / ry, np.inf)
+            t_delta_x = np.where(rx != 0, self.cell_size / np.abs(rx), np.inf)
+            t_delta_y = np.where(ry != 0, self.cell_size / np.abs(ry), np.inf)
+
+        # Walk until every ray has its closest hit or has left its own length
+        active = np.arange(len(px))
+        while len(active):
+
+            # Test the segments in the current cells
+            rays, segments = self.cell_pairs(active, ix[active], iy[active])
+            if len(rays):
+                s = self.segments[segments]
+                np.minimum.at(best, rays, ray_segment_hits(px[rays], py[rays], rx[rays], ry[rays], s[:, 0], s[:, 1], s[:, 2] - s[:, 0], s[:, 3] - s[:, 1]))
+
+            # Done if the hit is before the cell's exit (no later cell can have a closer one), or the ray ends in this cell
+            t_exit = np.minimum(t_max_x[active], t_max_y[active])
+            active = active[(best[active] > t_exit) & (t_exit < 1)]
+
+            # Step into the next cell
+            step_in_x = t_max_x[active] < t_max_y[active]
+            along_x, along_y = active[step_in_x], active[~step_in_x]
+            ix[along_x] += step_x[along_x]
+            t_max_x[along_x] += t_delta_x[along_x]
+            iy[along_y] += step_y[along_y]
+            t_max_y[along_y] += t_delta_y[along_y]
+
+        return best.reshape(shape)
+
+    # Segments near boxes (min_x, min_y, max_x, max_y, one per query): unique (box, segment) pairs of the cells the boxes overlap
+    def box_pairs(self, min_x, min_y, max_x, max_y):
+
+        ix0, iy0 = self.cell_of(min_x, min_y)
+        ix1, iy1 = self.cell_of(max_x, max_y)
+        ix0, iy0 = np.atleast_1d(ix0), np.atleast_1d(iy0)
+        ix1, iy1 = np.atleast_1d(ix1), np.atleast_1d(iy1)
+        if len(ix0) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+        # Every box looks at (up to) the same block of cells, the ones beyond its own corner cells are dropped
+        offset_x, offset_y = np.meshgrid(np.arange((ix1 - ix0).max() + 1), np.arange((iy1 - iy0).max() + 1), indexing='ij')
+        ix, iy = ix0[:, None] + offset_x.ravel(), iy0[:, None] + offset_y.ravel()
+        in_box = (ix <= ix1[:, None]) & (iy <= iy1[:, None])
+        boxes = np.broadcast_to(np.arange(len(ix0))[:, None], ix.shape)
+        boxes, segments = self.cell_pairs(boxes[in_box], ix[in_box], iy[in_box])
+
+        # Segments spanning several cells are found more than once
+        pairs = np.unique(boxes * len(self.segments) + segments)
+        return pairs // len(self.segments), pairs % len(self.segments)
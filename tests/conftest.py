@@ -0,0 +1,33 @@
+import os
+import sys
+
+# Tests import the NEAT and racegame packages from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NEAT.Genome import Genome
+from NEAT.Innovation_History import Innovation_History
+import random
+import numpy as np
+import pytest
+
+# Seeded genomes sharing one innovation history: different numbers of structural mutations give matching, disjoint and
+# excess genes between them, some genes are disabled and fitnesses (some tied) decide the better parent
+@pytest.fixture(scope="module")
+def genomes():
+
+    random.seed(7)
+    np.random.seed(7)
+    history = Innovation_History()
+    genomes = []
+    for i in range(16):
+        genome = Genome(i, history, input_space=4, output_space=2)
+        for _ in range(i % 8):
+            genome.mutate()
+        for connection in genome.connections:
+            if random.random() < 0.2:
+                connection.enabled = False
+        genome.genes = None
+        genome.fitness = random.choice([1.0, 2.0, 2.0, 3.5])
+        genomes.append(genome)
+
+    return genomes
@@ -0,0 +1,46 @@
+from NEAT.Genome import Genome
+from NEAT.Gene_Arrays import batch_compatibility
+from NEAT.config import SPECIES_CONFIG
+import itertools
+import pytest
+
+# Reference compatibility: the two-pointer walk Species.compatible used before it was vectorized
+def reference_compatibility(genome_1: Genome, genome_2: Genome):
+
+    n_match = n_disjoint = n_excess = 0
+    weight_difference = 0
+    n_1, n_2 = len(genome_1.connections), len(genome_2.connections)
+    i_1 = i_2 = 0
+
+    while i_1 < n_1 or i_2 < n_2:
+        if i_1 == n_1:
+            n_excess += 1
+            i_2 += 1
+        elif i_2 == n_2:
+            n_excess += 1
+            i_1 += 1
+        elif genome_1.connections[i_1].innovation_number == genome_2.connections[i_2].innovation_number:
+            n_match += 1
+            weight_difference += abs(genome_1.connections[i_1].weight - genome_2.connections[i_2].weight)
+            i_1 += 1
+            i_2 += 1
+        elif genome_1.connections[i_1].innovation_number < genome_2.connections[i_2].innovation_number:
+            n_disjoint += 1
+            i_1 += 1
+        else:
+            n_disjoint += 1
+            i_2 += 1
+
+    return (SPECIES_CONFIG.EXCESS_COEFFICIENT*n_excess + SPECIES_CONFIG.DISJOINT_COEFFICIENT*n_disjoint)/max(n_1, n_2, 1) + SPECIES_CONFIG.WEIGHT_COEFFICIENT*weight_difference/(n_match + 1)
+
+def test_compatibility_matches_reference(genomes):
+
+    for genome_1, genome_2 in itertools.product(genomes, repeat=2):
+        assert genome_1.gene_arrays().compatibility(genome_2.gene_arrays()) == pytest.approx(reference_compatibility(genome_1, genome_2), rel=1e-12, abs=1e-12)
+
+def test_batch_compatibility_matches_reference(genomes):
+
+    for genome in genomes:
+        expected = [reference_compatibility(genome, other) for other in genomes]
+        assert batch_compatibility(genome.gene_arrays(), [other.gene_arrays() for other in genomes]) == pytest.approx(expected, rel=1e-12, abs=1e-12)
+    assert len(batch_compatibility(genomes[0].gene_arrays(), [])) == 0
@@ -0,0 +1,159 @@
+from NEAT.Genome import Genome
+from NEAT.Population import Population
+from NEAT.Innovation_History import Innovation_History
+import itertools
+import random
+import numpy as np
+import pytest
+
+# Reference crossover: the two-pointer walk Population.crossover used before it was vectorized. Matching genes take their
+# parent from from_parent_2 (in innovation order) instead of drawing it
+def reference_crossover(parent_1: Genome, parent_2: Genome, offspring_ID: int, from_parent_2):
+
+    n_1 = len(parent_1.connections)
+    n_2 = len(parent_2.connections)
+    better = sorted([parent_1, parent_2], reverse=True, key=lambda x: (x.fitness, 1 / len(x.connections)))[0]
+    choices = iter(from_parent_2)
+    offspring_nodes = []
+    offspring_connections = []
+    i_1 = i_2 = 0
+    node_ids = set()
+
+    while i_1 < n_1 or i_2 < n_2:
+        parent_1_connection = parent_1.connections[i_1] if i_1 < n_1 else None
+        parent_2_connection = parent_2.connections[i_2] if i_2 < n_2 else None
+        selected_connection = None
+
+        if parent_1_connection and parent_2_connection:
+            if parent_1_connection.innovation_number == parent_2_connection.innovation_number:
+                idx = int(next(choices))
+                selected_connection = (parent_1_connection, parent_2_connection)[idx]
+                selected_genome = (parent_1, parent_2)[idx]
+                i_1 += 1
+                i_2 += 1
+            elif parent_2_connection.innovation_number < parent_1_connection.innovation_number:
+                if better == parent_2:
+                    selected_connection = parent_2_connection
+                    selected_genome = parent_2
+                i_2 += 1
+            else:
+                if better == parent_1:
+                    selected_connection = parent_1_connection
+                    selected_genome = parent_1
+                i_1 += 1
+        elif parent_2_connection:
+            if better == parent_2:
+                selected_connection = parent_2_connection
+                selected_genome = parent_2
+            i_2 += 1
+        else:
+            if better == parent_1:
+                selected_connection = parent_1_connection
+                selected_genome = parent_1
+            i_1 += 1
+
+        if selected_connection != None:
+            offspring_connections.append(selected_connection.clone())
+            for node_id in (selected_connection.origin_node_ID, selected_connection.target_node_ID):
+                node = selected_genome.get_node_by_id(node_id)
+                if node_id not in node_ids and node != None:
+                    offspring_nodes.append(node.clone())
+                    node_ids.add(node_id)
+
+    for node in parent_1.get_edge_nodes():
+        if not node.ID in node_ids:
+            offspring_nodes.append(node.clone())
+            node_ids.add(node.ID)
+
+    if all([not l.enabled for l in offspring_connections]):
+        random.choice(offspring_connections).enabled = True
+
+    return Genome(offspring_ID, parent_1.innovation_history, offspring_nodes, offspring_connections, parent_1.input_space, parent_1.output_space)
+
+# Genes of a genome as comparable tuples
+def connection_genes(genome: Genome):
+    return [(c.innovation_number, c.origin_node_ID, c.target_node_ID, c.weight, c.enabled, c.recurrent) for c in genome.connections]
+
+def node_genes(genome: Genome):
+    return [(n.ID, n.type, n.layer, n.activation_type, n.activation_response) for n in genome.nodes]
+
+@pytest.fixture(scope="module")
+def population():
+    return Population(16, 1, None, 4, 2, verbose=False, do_graph=False, save_stats=False)
+
+# The genome set covers what crossover and compatibility have to handle
+def test_genomes_cover_gene_cases(genomes):
+
+    def innovations(genome):
+        return [c.innovation_number for c in genome.connections]
+
+    # Unmatched genes up to the last innovation of both genomes are disjoint, beyond it they are excess
+    def unmatched(a, b, excess):
+        cut = min(max(innovations(a), default=-1), max(innovations(b), default=-1))
+        return [n for n in set(innovations(a)) ^ set(innovations(b)) if (n > cut) == excess]
+
+    pairs = list(itertools.combinations(genomes, 2))
+    assert any(set(innovations(a)) & set(innovations(b)) for a, b in pairs)
+    assert any(unmatched(a, b, excess=False) for a, b in pairs)
+    assert any(unmatched(a, b, excess=True) for a, b in pairs)
+    assert any(not c.enabled for genome in genomes for c in genome.connections)
+    assert any(a.fitness == b.fitness for a, b in pairs)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_crossover_matches_reference(genomes, population, seed):
+
+    for offspring_ID, (parent_1, parent_2) in enumerate(itertools.product(genomes, repeat=2)):
+
+        # Parent choices for the matching genes, drawn as crossover draws them
+        n_match = len(np.intersect1d(parent_1.gene_arrays().innovation_numbers, parent_2.gene_arrays().innovation_numbers))
+        np.random.seed(seed)
+        from_parent_2 = np.random.randint(0, 2, n_match).astype(bool)
+
+        np.random.seed(seed)
+        random.seed(seed)
+        offspring = population.crossover(parent_1, parent_2, offspring_ID)
+        random.seed(seed)
+        expected = reference_crossover(parent_1, parent_2, offspring_ID, from_parent_2)
+
+        assert connection_genes(offspring) == connection_genes(expected)
+        assert node_genes(offspring) == node_genes(expected)
+
+# Crossing a genome with itself gives back its genes (each matching gene, including disabled ones, from either copy)
+def test_crossover_with_itself(genomes, population):
+
+    for genome in genomes:
+        offspring = population.crossover(genome, genome, 100)
+        assert connection_genes(offspring) == connection_genes(genome) or all(not c.enabled for c in genome.connections)
+        assert node_genes(offspring) == node_genes(genome)
+
+# Offspring are copies: changing them leaves the parents alone
+def test_crossover_copies_genes(genomes, population):
+
+    parent_1, parent_2 = genomes[5], genomes[6]
+    before = connection_genes(parent_1), connection_genes(parent_2)
+    offspring = population.crossover(parent_1, parent_2, 100)
+    for connection in offspring.connections:
+        connection.weight += 1
+        connection.enabled = not connection.enabled
+    assert (connection_genes(parent_1), connection_genes(parent_2)) == before
+
+# A genome can carry the same node pair under two innovation numbers (e.g. when the pair was forgotten by an innovation
+# history reset and added again). The offspring only gets the first of them
+def test_crossover_drops_duplicate_node_pairs(population):
+
+    random.seed(3)
+    np.random.seed(3)
+    history = Innovation_History()
+    parent_1 = Genome(0, history, input_space=2, output_space=1)
+    parent_2 = Genome(1, history, input_space=2, output_space=1)
+    duplicate = parent_1.connections[0].clone()
+    duplicate.innovation_number = 1000
+    parent_1.connections.append(duplicate)
+    parent_1.genes = None
+    parent_1.fitness, parent_2.fitness = 2.0, 1.0
+
+    offspring = population.crossover(parent_1, parent_2, 2)
+    pairs = [(c.origin_node_ID, c.target_node_ID) for c in offspring.connections]
+    assert len(pairs) == len(set(pairs))
+    assert 1000 not in [c.innovation_number for c in offspring.connections]
+    assert (duplicate.origin_node_ID, duplicate.target_node_ID) in pairs
@@ -0,0 +1,57 @@
+from NEAT.Distributed_Evaluator import Distributed_Evaluator, Local_Cluster
+import os
+import time
+import pytest
+
+FAILED_FITNESS = -1
+
+# Stand-in episode function: the "network" says what to do. Normal networks score their length
+class Episode:
+
+    def max_steps(self, generation_number: int):
+        return 50
+
+    def __call__(self, network, generation_number: int):
+        if network == "raise":
+            raise ValueError("broken genome")
+        if network == "crash":
+            os._exit(1)
+        if network == "hang":
+            while True:
+                time.sleep(1)
+        return len(network), {"network": network}
+
+@pytest.fixture
+def evaluator():
+
+    evaluator = Distributed_Evaluator(Episode(), heartbeat_interval=0.1, heartbeat_timeout=1.0, task_timeout=1.5, max_retries=1, failed_fitness=FAILED_FITNESS, connect_timeout=5.0)
+    cluster = Local_Cluster(evaluator, 2).start()
+    yield evaluator
+    cluster.stop()
+    evaluator.shutdown()
+
+def test_normal_tasks(evaluator):
+    assert evaluator.evaluate(["a", "bb", "ccc"], 0) == [(1, {"network": "a"}), (2, {"network": "bb"}), (3, {"network": "ccc"})]
+
+# A raising episode, a crashing worker and a hung worker each fail their genome only; the other tasks and later evaluations still succeed
+def test_failing_tasks(evaluator):
+
+    results = evaluator.evaluate(["a", "raise", "crash", "hang", "bb"], 0)
+
+    assert results[0] == (1, {"network": "a"})
+    assert results[4] == (2, {"network": "bb"})
+    assert results[1][0] == FAILED_FITNESS and results[1][1]["failed"] and "broken genome" in results[1][1]["error"]
+    assert results[2][0] == FAILED_FITNESS and results[2][1]["failed"]
+    assert results[3][0] == FAILED_FITNESS and results[3][1]["failed"]
+
+    assert evaluator.evaluate(["ccc", "dddd"], 1) == [(3, {"network": "ccc"}), (4, {"network": "dddd"})]
+
+# Without any worker, evaluate gives up instead of blocking forever
+def test_no_workers():
+
+    evaluator = Distributed_Evaluator(Episode(), heartbeat_interval=0.1, connect_timeout=0.5)
+    try:
+        with pytest.raises(TimeoutError):
+            evaluator.evaluate(["a"], 0)
+    finally:
+        evaluator.shutdown()
@@ -0,0 +1,63 @@
+from racegame.track import load_track
+from racegame.simulation import Episode, Simulation
+from NEAT.Genome import Genome
+from NEAT.Innovation_History import Innovation_History
+import glob
+import os
+import pickle
+import random
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRACKS = sorted(glob.glob(os.path.join(ROOT, "racegame", "tracks", "*", "*.json")))
+
+# Trained genomes (they drive far, through many sectors, close to the track limits) and random ones (they crash early)
+TRAINED = ("five-layer-high-rbr", "figureinf-run-2", "obstaclerun-run-2", "racecar-run-20230705-001343", "silverstone-FSNEAT-run-1", "silverstone-FDNEAT-run-3",
+           "silverstone-transfer-hungaroring", "silverstone-transfer-monza", "silverstone-transfer-spa", "silverstone-transfer-yasmarina", "silverstone-transfer-zandvoort")
+GENERATION = 20
+
+@pytest.fixture(scope="module")
+def genomes():
+
+    genomes = []
+    for name in TRAINED:
+        with open(os.path.join(ROOT, "Results", name), 'rb') as f:
+            genomes.append(pickle.load(f))
+
+    random.seed(0)
+    np.random.seed(0)
+    history = Innovation_History()
+    for i in range(6):
+        genome = Genome(1000 + i, history, input_space=11, output_space=2)
+        for _ in range(5):
+            genome.mutate()
+        genomes.append(genome)
+
+    for i, genome in enumerate(genomes):
+        genome.ID = i
+        genome.build_network()
+    return genomes
+
+# Fitnesses of single cars (Episode, one Car at a time)
+def episode_fitness(episode: Episode, genomes: list):
+    return [episode(genome.network, GENERATION)[0] for genome in genomes]
+
+# Fitnesses of all cars driving at once (Simulation, one CarFleet)
+def fleet_fitness(episode: Episode, genomes: list):
+    simulation = Simulation(episode)
+    simulation.population = type('Population', (), {'generation_number': GENERATION})()
+    simulation.determine_fitness(genomes)
+    return [genome.fitness for genome in genomes]
+
+# Single cars and the fleet follow the same physics, radar and rules. Sector sets (single cars) and the coherent radar (fleet)
+# only leave out track limits that cannot matter, so all of them must give exactly the same fitness
+@pytest.mark.parametrize("path", TRACKS, ids=[os.path.basename(path) for path in TRACKS])
+def test_fleet_matches_single_cars(path, genomes):
+
+    track = load_track(path)
+    expected = episode_fitness(Episode(track, sector_sets=False), genomes)
+
+    assert episode_fitness(Episode(track, sector_sets=True), genomes) == expected
+    assert fleet_fitness(Episode(track, coherent_radar=False), genomes) == expected
+    assert fleet_fitness(Episode(track, coherent_radar=True), genomes) == expected
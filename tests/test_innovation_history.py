@@ -0,0 +1,106 @@
+from NEAT.Genome import Genome
+from NEAT.Population import Population
+from NEAT.Innovation_History import Innovation_History
+from NEAT.Gene_Arrays import batch_compatibility
+import itertools
+import pickle
+import random
+import numpy as np
+import pytest
+
+# Innovations as comparable tuples, by key
+def entries(history: Innovation_History):
+    return {key: (i.type, i.innovation_ID, i.origin_node_ID, i.target_node_ID, i.node_id, i.connection_id) for key, i in history.innovations.items()}
+
+def counters(history: Innovation_History):
+    return history.next_innovation_id, history.next_node_id, history.next_connection_id
+
+def pairs(genome: Genome):
+    return [(c.origin_node_ID, c.target_node_ID) for c in genome.connections]
+
+@pytest.fixture
+def evolved():
+
+    random.seed(9)
+    np.random.seed(9)
+    history = Innovation_History()
+    genomes = [Genome(i, history, input_space=3, output_space=2) for i in range(10)]
+    for genome in genomes:
+        for _ in range(6):
+            genome.add_node()
+            genome.mutate()
+
+    return history, genomes
+
+def test_save_load_round_trip(evolved, tmp_path):
+
+    history, _ = evolved
+    path = str(tmp_path / "innovations.npz")
+    history.save(path)
+    loaded = Innovation_History()
+    loaded.load(path)
+
+    assert entries(loaded) == entries(history)
+    assert counters(loaded) == counters(history)
+
+    unpickled = pickle.loads(pickle.dumps(history))
+    assert entries(unpickled) == entries(history)
+    assert counters(unpickled) == counters(history)
+
+# Compact keeps every innovation a live genome carries (so they keep matching), drops the others and never reuses numbers
+def test_compact_keeps_live_innovations(evolved):
+
+    history, genomes = evolved
+    before = entries(history)
+    next_ids = counters(history)
+    live = genomes[:4]
+    history.compact(live)
+
+    for genome in live:
+        for connection in genome.connections:
+            assert history.exist_innovation('connection', connection.origin_node_ID, connection.target_node_ID).innovation_ID == connection.innovation_number
+        for node in genome.get_hidden_nodes():
+            assert node.ID in history.node_splits()
+    assert set(entries(history).items()) < set(before.items())
+    assert counters(history) == next_ids
+
+# Reset forgets connection innovations only: splitting the same connection again gives the same node
+def test_reset_keeps_node_innovations(evolved):
+
+    history, _ = evolved
+    nodes = {key: entry for key, entry in entries(history).items() if entry[0] == 'node'}
+    history.reset()
+
+    assert entries(history) == nodes
+    for (_, origin, target), entry in nodes.items():
+        assert history.get_innovation('node', origin, target).node_id == entry[4]
+
+# After a reset, live genomes keep their numbers and new genes for the same node pair get new ones. Genomes still hold every
+# node pair once (with unique, sorted innovations), and crossover and compatibility cope with the mixed numbering
+def test_mixed_numbering_after_reset(evolved):
+
+    history, genomes = evolved
+    history.reset()
+    for genome in genomes:
+        for _ in range(6):
+            genome.add_node()
+            genome.mutate()
+        genome.fitness = random.random()
+
+    # Some node pair does carry two numbers
+    numbers_by_pair = {}
+    for genome in genomes:
+        for connection in genome.connections:
+            numbers_by_pair.setdefault((connection.origin_node_ID, connection.target_node_ID), set()).add(connection.innovation_number)
+    assert any(len(numbers) > 1 for numbers in numbers_by_pair.values())
+
+    population = Population(10, 1, None, 3, 2, verbose=False, do_graph=False, save_stats=False)
+    offspring = [population.crossover(a, b, 100 + i) for i, (a, b) in enumerate(itertools.permutations(genomes, 2))]
+    for genome in genomes + offspring:
+        numbers = genome.gene_arrays().innovation_numbers
+        assert len(set(pairs(genome))) == len(genome.connections)
+        assert len(np.unique(numbers)) == len(numbers) and np.all(np.diff(numbers) > 0)
+
+    for genome in genomes:
+        distances = batch_compatibility(genome.gene_arrays(), [other.gene_arrays() for other in genomes])
+        assert np.all(np.isfinite(distances)) and distances[genomes.index(genome)] == 0
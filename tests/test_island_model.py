@@ -0,0 +1,101 @@
+from NEAT.Genome import Genome
+from NEAT.Innovation_History import Innovation_History
+from NEAT.Island_Model import Island_Model, pack_migrant, unpack_migrant
+import os
+import random
+import numpy as np
+import pytest
+
+INPUTS, OUTPUTS = 4, 2
+
+# Seeded genomes of one island, with hidden nodes (also splits of split nodes) and some disabled genes
+@pytest.fixture
+def island():
+
+    random.seed(5)
+    np.random.seed(5)
+    history = Innovation_History()
+    genomes = []
+    for i in range(6):
+        genome = Genome(i, history, input_space=INPUTS, output_space=OUTPUTS)
+        for _ in range(3 + 2 * i):
+            genome.add_node()
+            genome.mutate()
+        genomes.append(genome)
+
+    return history, genomes
+
+def migrate(genome: Genome, source: Innovation_History, destination: Innovation_History, genome_id: int = 100):
+    return unpack_migrant(pack_migrant(genome, source), destination, genome_id, INPUTS, OUTPUTS)
+
+def innovations(genome: Genome):
+    return [connection.innovation_number for connection in genome.connections]
+
+# Same structure: same node types, same genes (up to node IDs) and the same network outputs
+def test_migration_keeps_structure(island):
+
+    history, genomes = island
+    destination = Innovation_History()
+    rng = np.random.default_rng(0)
+    for genome in genomes:
+        immigrant = migrate(genome, history, destination)
+
+        assert sorted(node.type for node in immigrant.nodes) == sorted(node.type for node in genome.nodes)
+        assert sorted((c.weight, c.enabled, c.recurrent) for c in immigrant.connections) == sorted((c.weight, c.enabled, c.recurrent) for c in genome.connections)
+        assert immigrant.fitness == None
+
+        genome.build_network()
+        immigrant.build_network()
+        for inputs in rng.uniform(-1, 1, (5, INPUTS)):
+            np.testing.assert_allclose(immigrant.feed_forward(inputs), genome.feed_forward(inputs), rtol=1e-12, atol=1e-12)
+
+# The same structure gets the same numbers in the receiving history: migrating twice gives the same genes, and migrating
+# back home gives the original node IDs and innovation numbers
+def test_migration_numbers_are_consistent(island):
+
+    history, genomes = island
+    destination = Innovation_History()
+    first = [migrate(genome, history, destination) for genome in genomes]
+    second = [migrate(genome, history, destination) for genome in genomes]
+    for a, b in zip(first, second):
+        assert sorted(node.ID for node in a.nodes) == sorted(node.ID for node in b.nodes)
+        assert innovations(a) == innovations(b)
+
+    # Every node pair has one innovation number in the receiving history, over all immigrants
+    numbers = {}
+    for immigrant in first:
+        for connection in immigrant.connections:
+            assert numbers.setdefault((connection.origin_node_ID, connection.target_node_ID), connection.innovation_number) == connection.innovation_number
+
+    for genome in genomes:
+        home = migrate(genome, history, history)
+        assert sorted(node.ID for node in home.nodes) == sorted(node.ID for node in genome.nodes)
+        assert innovations(home) == innovations(genome)
+
+# A migrant carrying the same node pair twice (e.g. after an innovation history reset) arrives with unique innovations, keeping the enabled gene
+def test_migration_drops_duplicate_pairs(island):
+
+    history, genomes = island
+    genome = genomes[3]
+    duplicate = genome.connections[0].clone()
+    duplicate.innovation_number = history.next_innovation_id + 100
+    duplicate.enabled = not genome.connections[0].enabled
+    genome.connections.append(duplicate)
+
+    immigrant = migrate(genome, history, Innovation_History())
+
+    assert len(set(innovations(immigrant))) == len(immigrant.connections) == len(genome.connections) - 1
+    assert len(set(immigrant.gene_arrays().innovation_numbers.tolist())) == len(immigrant.connections)
+    pairs = {}
+    for connection in immigrant.connections:
+        pairs.setdefault((connection.origin_node_ID, connection.target_node_ID), []).append(connection)
+    assert all(len(connections) == 1 for connections in pairs.values())
+    assert sum(not c.enabled for c in immigrant.connections) == sum(not c.enabled for c in genome.connections[1:-1])
+
+# An island process that dies makes the island model raise instead of waiting forever
+def dying_population(index: int):
+    os._exit(1)
+
+def test_dead_island_raises():
+    with pytest.raises(RuntimeError):
+        Island_Model(2, dying_population).run()
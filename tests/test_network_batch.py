@@ -0,0 +1,67 @@
+from NEAT.Genome import Genome
+from NEAT.Connection import Connection
+from NEAT.Innovation_History import Innovation_History
+from NEAT.Network import Network
+from NEAT.Network_Batch import Network_Batch
+import random
+import numpy as np
+import pytest
+
+# Give a genome a recurrent self-loop on one of its nodes
+def add_self_loop(genome: Genome, node_type: str, weight: float):
+    node = genome.nodes_by_type[node_type][0]
+    innovation = genome.innovation_history.get_innovation('connection', node.ID, node.ID)
+    genome.add_connection_gene(Connection(weight, node.ID, node.ID, innovation.innovation_ID, recurrent=True))
+
+# Seeded genomes of different shapes: some with hidden nodes, and two with a recurrent self-loop (on an output and on a hidden node)
+@pytest.fixture
+def batch_genomes():
+
+    random.seed(11)
+    np.random.seed(11)
+    history = Innovation_History()
+    genomes = []
+    for i in range(7):
+        genome = Genome(i, history, input_space=4, output_space=2)
+        for _ in range(i):
+            genome.mutate()
+        genomes.append(genome)
+
+    add_self_loop(genomes[1], "output", 0.9)
+    while not genomes[5].nodes_by_type.get("hidden"):
+        genomes[5].add_node()
+    add_self_loop(genomes[5], "hidden", -0.7)
+
+    return genomes
+
+# Run batch and single networks side by side for a number of steps, on the same random observations
+def assert_same_steps(batch: Network_Batch, networks: list[Network], rng, n_steps: int):
+    for _ in range(n_steps):
+        observations = rng.uniform(-1, 1, (len(networks), 4))
+        expected = np.array([network.feed_forward(row) for network, row in zip(networks, observations)])
+        np.testing.assert_allclose(batch.feed_forward(observations), expected, rtol=1e-12, atol=1e-12)
+
+# The batch gives every agent the same actions as its own network, also after keep drops agents (recurrent state survives repacking)
+def test_batch_matches_single_networks(batch_genomes):
+
+    assert any(np.any(Network(genome).recurrent) for genome in batch_genomes)
+
+    # Separate networks for the batch and for reference
+    batch = Network_Batch([Network(genome) for genome in batch_genomes])
+    networks = [Network(genome) for genome in batch_genomes]
+    rng = np.random.default_rng(0)
+    assert_same_steps(batch, networks, rng, 5)
+
+    # Drop some agents (keeping both recurrent ones), then drop one of the recurrent ones too
+    for keep_mask in ([True, True, False, True, False, True, True], [False, True, True, False, True]):
+        batch.keep(keep_mask)
+        networks = [network for network, keep in zip(networks, keep_mask) if keep]
+        assert batch.n_agents == len(networks)
+        assert_same_steps(batch, networks, rng, 5)
+
+# Dropping all agents leaves an empty batch
+def test_batch_keeps_nothing(batch_genomes):
+
+    batch = Network_Batch([Network(genome) for genome in batch_genomes])
+    batch.keep([False] * len(batch_genomes))
+    assert batch.n_agents == 0
@@ -0,0 +1,75 @@
+from racegame.track import Track, load_track
+from racegame.simulation import Episode, Simulation
+from racegame.distance_field import load_distance_field
+from racegame.radar_table import load_radar_table
+from NEAT.Population import Population
+from NEAT.Parallel_Evaluator import Parallel_Evaluator
+import argparse
+import pickle
+import time
+
+# Evolve cars on a track. Runs without a display; an observer (e.g. a window) can watch the simulation every timestep
+def train(track: Track, population_size: int, max_generations: int, workers: int = 0, steady_state: bool = False, observer: callable = None, inject_genomes: list = None, field_resolution: float = None, sphere_traced_radar: bool = False, table_resolution: float = None, **population_settings):
+
+    # Optional signed distance field of the track (cached next to the track file) for approximate crash tests and radar
+    distance_field = load_distance_field(track, field_resolution) if field_resolution else None
+
+    # Optional radar lookup table of the track (stored in its compiled bundle) for an approximate radar
+    radar_table = load_radar_table(track, table_resolution) if table_resolution else None
+
+    # Episode rules (shared with parallel workers) and the simulation of a whole generation at once
+    episode = Episode(track, distance_field = distance_field, sphere_traced_radar = sphere_traced_radar, radar_table = radar_table)
+    simulation = Simulation(episode, observer)
+
+    # With workers, every genome drives its own headless episode in a worker process (nothing is observed during the generation)
+    evaluator = Parallel_Evaluator(episode, workers) if workers else None
+
+    # Create population (or well, NEAT instance)
+    population = Population(population_size, max_generations, simulation.determine_fitness, 11, 2, inject_genomes = inject_genomes, evaluator = evaluator, **population_settings)
+    simulation.population = population
+
+    # Run NEAT (steady-state mode keeps the workers busy instead of waiting for the slowest episode every generation)
+    if steady_state and evaluator:
+        population.run_steady_state(workers)
+    else:
+        population.run()
+
+    # Below is what will happen AFTER NEAT is finished. So, save best genome to a file using Pickle
+    with open("./Results/racecar-run-" + time.strftime("%Y%m%d-%H%M%S"), 'wb') as genome_dump_file:
+        pickle.dump(population.best_genome, genome_dump_file)
+
+    return population
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = "Train race cars with NEAT")
+    parser.add_argument("--track", default = "./racegame/tracks/Obstaclerun/obstacle_run.json", help = "track json file")
+    parser.add_argument("--population", type = int, default = 40, help = "population size")
+    parser.add_argument("--generations", type = int, default = 50, help = "max number of generations")
+    parser.add_argument("--workers", type = int, default = 0, help = "worker processes (0 = all cars in this process)")
+    parser.add_argument("--steady-state", action = "store_true", help = "steady-state evolution (needs workers)")
+    parser.add_argument("--inject", nargs = "*", default = [], help = "pickled genomes to inject into the first generation")
+    parser.add_argument("--distance-field", type = float, default = None, metavar = "RESOLUTION", help = "crash tests in a signed distance field of the track with this resolution (px)")
+    parser.add_argument("--sphere-radar", action = "store_true", help = "sphere trace the radar over the distance field (needs --distance-field)")
+    parser.add_argument("--radar-table", type = float, default = None, metavar = "RESOLUTION", help = "look the radar up in a table of the track with this resolution (px, 2 degree beam directions)")
+    parser.add_argument("--render", action = "store_true", help = "draw the simulation in a window")
+    parser.add_argument("--no-graph", action = "store_true", help = "do not show graphs after the run")
+    parser.add_argument("--quiet", action = "store_true", help = "do not print statistics every generation")
+    args = parser.parse_args()
+
+    # Load track and genomes to inject
+    track = load_track(args.track)
+    inject_genomes = []
+    for path in args.inject:
+        with open(path, 'rb') as f:
+            inject_genomes.append(pickle.load(f))
+
+    # Only import pyglet when drawing
+    observer = None
+    if args.render:
+        from main import GameWindow
+        from racegame.config import windowHeight, windowWidth
+        window = GameWindow(track, windowWidth, windowHeight, "Driving a race-car around a track with NEAT!", resizable=False)
+        observer = window.game.observe
+
+    train(track, args.population, args.generations, args.workers, args.steady_state, observer, inject_genomes or None, args.distance_field, args.sphere_radar, args.radar_table, do_graph = not args.no_graph, verbose = not args.quiet)
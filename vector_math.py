@@ -1,7 +1,6 @@
 import numpy as np
 import math as m
 import pygame
-import pyglet
 
 vec2 = pygame.math.Vector2
 
@@ -11,6 +10,10 @@ def calc_angle(vector):
         return 0
     return m.degrees(m.atan2(vector.y, vector.x))
 
+# Calculate absolute angles of many vectors. Uses math.atan2 like calc_angle (numpy's arctan2 can differ in the last bit)
+def calc_angles(x, y):
+    return np.degrees(np.fromiter(map(m.atan2, y, x), dtype=float, count=len(x)))
+
 # Transform radians to degrees
 def rad_to_deg(alpha):
     return alpha / m.pi * 180
@@ -25,72 +28,28 @@ def unit_vector_from_angle(theta):
 
     return vec2(m.cos(theta_rad), m.sin(theta_rad))
 
-# Check if two lines collide or not
-def lines_collided(x1, y1, x2, y2, x3, y3, x4, y4):
-
-    # Yeah this below is a mess but somehow it gave errors sometimes if I did not do this
-    # Should probably debug some more
-    x1 += 0.01
-    x2 -= 0.01
-    x3 += 0.01
-    x4 -= 0.01
-    y1 += 0.01
-    y2 -= 0.01
-    y3 += 0.01
-    y4 -= 0.01
-    uA = ((x4 - x3) * (y1 - y3) - (y4 - y3) * (x1 - x3)) / ((y4 - y3) * (x2 - x1) - (x4 - x3) * (y2 - y1))
-    uB = ((x2 - x1) * (y1 - y3) - (y2 - y1) * (x1 - x3)) / ((y4 - y3) * (x2 - x1) - (x4 - x3) * (y2 - y1))
-    if 0 <= uA <= 1 and 0 <= uB <= 1:
-        return True
-    return False
-
-# Get actual collision point between two lines
-def get_collision_point(x1, y1, x2, y2, x3, y3, x4, y4):
-
-    # Yeah this below is a mess but somehow it gave errors sometimes if I did not do this
-    # Should probably debug some more
-    x1 += 0.01
-    x2 -= 0.01
-    x3 += 0.01
-    x4 -= 0.01
-    y1 += 0.01
-    y2 -= 0.01
-    y3 += 0.01
-    y4 -= 0.01
-    uA = ((x4 - x3) * (y1 - y3) - (y4 - y3) * (x1 - x3)) / ((y4 - y3) * (x2 - x1) - (x4 - x3) * (y2 - y1))
-    uB = ((x2 - x1) * (y1 - y3) - (y2 - y1) * (x1 - x3)) / ((y4 - y3) * (x2 - x1) - (x4 - x3) * (y2 - y1))
-    if 0 <= uA <= 1 and 0 <= uB <= 1:
-        intersectionX = x1 + (uA * (x2 - x1))
-        intersectionY = y1 + (uA * (y2 - y1))
-        return vec2(intersectionX, intersectionY)
-    return None
-
-# Check if a car collides with a track limit
-def do_collide(track_limit, car):
-    w = car.w
-    h = car.l
-
-    forward_vector = car.heading
-    sideways_vector = vec2(car.heading).rotate(90)
-    position = vec2(car.x, car.y)
+# Rotate many vectors at once by angles in degrees. Same steps as pygame's Vector2.rotate (angle reduced in radians,
+# exact quarter turns special-cased), so the results are identical to rotating them one by one
+def rotate_vectors(x, y, theta, epsilon = 1e-6):
 
-    corners = []
-    corner_multipliers = [[1, 1], [1, -1], [-1, -1], [-1, 1]]
+    # Angle in radians, in [0, 2 pi)
+    alpha = np.fmod(theta * m.pi / 180, 2 * m.pi)
+    alpha = np.where(alpha < 0, alpha + 2 * m.pi, alpha)
 
-    if track_limit['x'] == track_limit['x2']:
-        track_limit['x'] += 1
-    if track_limit['y'] == track_limit['y2']:
-        track_limit['y'] += 1
+    # General rotation
+    cos_alpha = np.cos(alpha)
+    sin_alpha = np.sin(alpha)
+    rotated_x = cos_alpha * x - sin_alpha * y
+    rotated_y = sin_alpha * x + cos_alpha * y
 
-    for i in range(4):
-        corners.append(position + (sideways_vector * w / 2 * corner_multipliers[i][0]) + (forward_vector * h / 2 * corner_multipliers[i][1]))
+    # Quarter turns (0, 90, 180, 270 and 360 degrees) are exact
+    quarter_turn = np.fmod(alpha + epsilon, m.pi / 2) < 2 * epsilon
+    if np.any(quarter_turn):
+        quarter = ((alpha + epsilon) / (m.pi / 2)).astype(int) % 4
+        rotated_x = np.where(quarter_turn, np.choose(quarter, [x, -y, -x, y]), rotated_x)
+        rotated_y = np.where(quarter_turn, np.choose(quarter, [y, x, -y, -x]), rotated_y)
 
-    for i in range(4):
-        j = i + 1
-        j = j % 4
-        if lines_collided(track_limit['x'], track_limit['y'], track_limit['x2'], track_limit['y2'], corners[i].x, corners[i].y, corners[j].x, corners[j].y):
-            return True
-    return False
+    return rotated_x, rotated_y
 
 # Get Euclidean distance between two points
 def dist(x1, y1, x2, y2):